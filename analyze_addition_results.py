@@ -9,6 +9,9 @@ import numpy as np
 from scipy import stats
 import os
 
+from rescore_results import rescore_data
+from scoring import result_columns
+
 # Model display names and colors (consistent with analyze_results.py)
 MODEL_NAMES = {
     "claude-opus-4-5-20251101": "Opus 4.5",
@@ -64,6 +67,20 @@ def load_addition_results(model_shorthand, filler=None):
     return data
 
 
+def load_addition_columns(model_shorthand, filler=None):
+    """Per-problem arrays for a run (see scoring.result_columns): its .npz, or built from the JSON."""
+    filler_suffix = f"_f{filler}" if filler else ""
+    columns_path = f"eval_results/addition_eval_{model_shorthand}{filler_suffix}.npz"
+    if os.path.exists(columns_path):
+        with np.load(columns_path) as columns:
+            return dict(columns)
+
+    data = load_addition_results(model_shorthand, filler=filler)
+    if not data or not data.get("results"):
+        return None
+    return result_columns(data["results"])
+
+
 def plot_accuracy_by_addends(filler=300):
     """Plot accuracy vs number of addends for all models with f=300."""
     fig, ax = plt.subplots(figsize=(12, 7))
@@ -213,6 +230,8 @@ def load_multihop_results(model_shorthand, filler=None):
     with open(filepath) as f:
         data = json.load(f)
 
+    # Re-scored in memory if an older answer scorer scored it
+    rescore_data(data)
     return data
 
 
@@ -324,48 +343,33 @@ def plot_error_distribution(filler=300, addend_counts=[4, 5, 6]):
     Plot error distribution for Gemini 3 Pro, showing how often the model
     is close vs wildly off.
 
-    Creates separate plots for each n in addend_counts.
+    Creates separate plots for each n in addend_counts. Predictions are parsed the way
+    eval_addition.py scored them (scoring.parse_prediction).
     """
     model_short = "gemini-3-pro"
     model_display = "Gemini 3 Pro"
 
-    data = load_addition_results(model_short, filler=filler)
-    if not data:
+    columns = load_addition_columns(model_short, filler=filler)
+    if columns is None:
         print(f"No data found for {model_short} with filler={filler}")
         return
 
-    results = data.get("results", [])
-
     for n_addends in addend_counts:
         # Filter results for this addend count
-        n_results = [r for r in results if r.get("num_addends") == n_addends]
+        in_group = columns["num_addends"] == n_addends
 
-        if not n_results:
+        if not in_group.any():
             print(f"No results found for n={n_addends}")
             continue
 
-        # Compute errors (predicted - correct)
-        errors = []
-        parse_failures = 0
-        for r in n_results:
-            correct = r.get("correct_answer")
-            predicted_str = r.get("predicted_answer", "")
-
-            # Try to parse predicted answer as integer
-            try:
-                predicted = int(predicted_str.strip())
-                error = predicted - correct
-                errors.append(error)
-            except (ValueError, TypeError):
-                parse_failures += 1
-                continue
-
-        if not errors:
+        # Errors (predicted - correct) of the predictions that parsed (as scored, see docstring)
+        errors = columns["signed_error"][in_group & ~columns["parse_failed"]]
+        parse_failures = int(np.sum(in_group & columns["parse_failed"]))
+
+        if len(errors) == 0:
             print(f"No valid errors computed for n={n_addends}")
             continue
 
-        errors = np.array(errors)
-
         # Statistics
         n_correct = np.sum(errors == 0)
         n_total = len(errors)
@@ -11,7 +11,10 @@ from scipy import stats
 import seaborn as sns
 import os
 import glob
-from eval_multi_hop import normalize_answer
+import argparse
+from scoring import normalize_answer
+from profiling import profiled
+from rescore_results import rescore_data
 from collections import Counter
 
 # Load results
@@ -39,6 +42,14 @@ def wilson_score_interval(successes, n, confidence=0.95):
     return max(0, center - margin), min(1, center + margin)
 
 
+def load_eval_file(filepath):
+    """An eval results file, re-scored in memory if an older answer scorer scored it (see rescore_data)."""
+    with open(filepath) as f:
+        data = json.load(f)
+    rescore_data(data)
+    return data
+
+
 def load_individual_results(model_shorthand, repeat=None, filler=None):
     """Load individual problem results from eval file."""
     suffix = f"_r{repeat}" if repeat else ""
@@ -49,10 +60,7 @@ def load_individual_results(model_shorthand, repeat=None, filler=None):
     if not os.path.exists(filepath):
         return None
 
-    with open(filepath) as f:
-        data = json.load(f)
-
-    return data.get("results", [])
+    return load_eval_file(filepath).get("results", [])
 
 
 def paired_t_test(results_baseline, results_repeat):
@@ -866,10 +874,7 @@ def load_filler_results(model_shorthand, filler):
     if not os.path.exists(filepath):
         return None
 
-    with open(filepath) as f:
-        data = json.load(f)
-
-    return data.get("results", [])
+    return load_eval_file(filepath).get("results", [])
 
 
 def load_filler_summary(model_shorthand, filler):
@@ -880,10 +885,7 @@ def load_filler_summary(model_shorthand, filler):
     if not os.path.exists(filepath):
         return None
 
-    with open(filepath) as f:
-        data = json.load(f)
-
-    return data.get("summary", {})
+    return load_eval_file(filepath).get("summary", {})
 
 
 def plot_performance_vs_f():
@@ -1147,9 +1149,7 @@ def plot_mapping_comparison():
     config_data = {}
     for label, filepath in configs:
         if os.path.exists(filepath):
-            with open(filepath) as f:
-                data = json.load(f)
-            config_data[label] = data.get("summary", {})
+            config_data[label] = load_eval_file(filepath).get("summary", {})
         else:
             print(f"Warning: {filepath} not found")
             config_data[label] = None
@@ -1494,25 +1494,30 @@ def plot_filler_effect():
 
 
 def main():
-    os.makedirs("eval_results", exist_ok=True)
+    parser = argparse.ArgumentParser(description="Generate plots and tables from eval_results")
+    parser.add_argument("--profile", nargs="?", const="profiles/analyze_results.prof", default=None, metavar="PROF_FILE",
+                        help="Run under cProfile and save pstats to PROF_FILE (default: profiles/analyze_results.prof)")
+    args = parser.parse_args()
 
+    os.makedirs("eval_results", exist_ok=True)
 
-    print("Generating visualizations...")
-    plot_accuracy_by_hops()
-    plot_repeat_effect()
-    plot_hop_decay()
-    plot_repeat_effect_by_hops()
-    plot_all_models_2_3_hop()
-    plot_filler_effect()
-    plot_performance_vs_r()
-    plot_significance_matrix_by_hop()
-    plot_performance_vs_f()
-    plot_significance_matrix_by_hop_filler()
-    plot_mapping_comparison()
-
-    create_summary_table()
-    # analyze_performance_by_category("gemini-3-pro")
-    # calculate_costs()
+    with profiled(args.profile):
+        print("Generating visualizations...")
+        plot_accuracy_by_hops()
+        plot_repeat_effect()
+        plot_hop_decay()
+        plot_repeat_effect_by_hops()
+        plot_all_models_2_3_hop()
+        plot_filler_effect()
+        plot_performance_vs_r()
+        plot_significance_matrix_by_hop()
+        plot_performance_vs_f()
+        plot_significance_matrix_by_hop_filler()
+        plot_mapping_comparison()
+
+        create_summary_table()
+        # analyze_performance_by_category("gemini-3-pro")
+        # calculate_costs()
 
 
 if __name__ == "__main__":
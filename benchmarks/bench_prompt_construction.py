@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for per-problem prompt construction in eval_multi_hop.py.
+
+Compares rebuilding the few-shot prefix for every problem (the old behaviour, including re-rendering the
+filler string and mapping tables) against reusing the prefix that run_evaluation now builds once per config
+together with the memoized filler and mapping tables.
+No API requests are sent. Run from the repo root:
+
+    python benchmarks/bench_prompt_construction.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import eval_multi_hop as E
+
+CONFIGS = [
+    ("default", {}),
+    ("repeat 5, filler 300", {"repeat_problem": 5, "filler_tokens": 300}),
+    ("include mappings", {"include_mappings": True}),
+]
+
+MODELS = ["claude-opus-4-5-20251101", "gpt-4.1-2025-04-14"]
+
+
+def build_messages(problem, model, prefix, config):
+    """The per-problem part of evaluate_problem's request construction."""
+    user_text = E.build_user_message(problem, **config)
+    if model in E.OPENAI_CHAT_MODELS:
+        return [*prefix, {"role": "user", "content": user_text + "\n\nAnswer:"}]
+    return [*prefix, {"role": "user", "content": user_text}, {"role": "assistant", "content": "Answer:"}]
+
+
+def time_per_problem(problems, fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for problem in problems:
+            fn(problem)
+        best = min(best, (time.perf_counter() - start) / len(problems))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark few-shot prompt construction")
+    parser.add_argument("--input", "-i", type=str, default="data/problems_all.jsonl")
+    parser.add_argument("--num-problems", "-n", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=5, help="Take the best of this many passes")
+    args = parser.parse_args()
+
+    all_problems = E.load_problems(args.input)
+    few_shot_problems, _ = E.select_few_shot_problems(all_problems)
+    problems = all_problems[: args.num_problems]
+
+    print(f"{'Config':<22}  {'Model':<26}  {'Rebuild/problem':>15}  {'Shared/problem':>14}  {'Speedup':>7}")
+    for name, config in CONFIGS:
+        for model in MODELS:
+
+            def rebuild(problem):
+                E.filler_text.cache_clear()
+                E.mapping_table_body.cache_clear()
+                E.mapping_tables_text_for_chain.cache_clear()
+                prefix = E.build_few_shot_prefix(few_shot_problems, model, **config)
+                return build_messages(problem, model, prefix, config)
+
+            shared_prefix = E.build_few_shot_prefix(few_shot_problems, model, **config)
+
+            def shared(problem):
+                return build_messages(problem, model, shared_prefix, config)
+
+            assert rebuild(problems[0]) == shared(problems[0])
+            before = time_per_problem(problems, rebuild, args.repeats)
+            after = time_per_problem(problems, shared, args.repeats)
+            print(
+                f"{name:<22}  {model:<26}  {before * 1e6:>13.1f}us  {after * 1e6:>12.1f}us  {before / after:>6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Determinism check for generate_dataset.generate_all_problems.
+
+Generates the full and --only-salient-facts problem sets serially and with each --workers count, serializes
+them the way save_dataset does, and compares the SHA-256 of the bytes: every worker count must match the
+serial run, and the serial run must match the digest recorded below (the output before generation was
+parallelized). The worker counts always use the process pool, even below generate_dataset.MIN_PARALLEL_WORK.
+Exit status 1 on any mismatch. Also reports how long each run takes. Run from the repo root:
+
+    python benchmarks/check_generation_determinism.py
+    python benchmarks/check_generation_determinism.py --workers 2 4 8
+
+A change that is meant to alter the generated problems should update EXPECTED_DIGESTS in the same commit.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_dataset
+from problems import problem_json
+
+EXPECTED_DIGESTS = {
+    "all": "0933af91cba8022ed5394cead86cc9933eda1f1af42d37bbb61df94704c4bb8e",
+    "salient": "ed7cfcfe561deb8040422ae7395d663231475c05f99b520ba3b7bbe0678736f4",
+}
+
+
+def digest(hop_lists):
+    """SHA-256 of the problems serialized as save_dataset writes them, hop level by hop level."""
+    h = hashlib.sha256()
+    for problems in hop_lists:
+        for problem in problems:
+            h.update((problem_json(problem) + "\n").encode("utf-8"))
+    return h.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that dataset generation is deterministic across worker counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4], help="Worker counts to compare with serial")
+    args = parser.parse_args()
+    # Compare the pool itself, not the serial fallback for small fact tables
+    generate_dataset.MIN_PARALLEL_WORK = 0
+
+    failures = 0
+    for name, only_salient_facts in [("all", False), ("salient", True)]:
+        for workers in [1, *args.workers]:
+            start = time.perf_counter()
+            hop_lists = generate_dataset.generate_all_problems(only_salient_facts=only_salient_facts, workers=workers)
+            elapsed = time.perf_counter() - start
+            result = digest(hop_lists)
+            ok = result == EXPECTED_DIGESTS[name]
+            failures += not ok
+            counts = "/".join(str(len(problems)) for problems in hop_lists)
+            print(
+                f"{name:<8} workers={workers:<3} {elapsed * 1000:7.0f}ms  {counts} problems (1/2/3/4-hop)  "
+                f"{result[:16]}  {'ok' if ok else 'MISMATCH'}"
+            )
+
+    if failures:
+        print(f"\n{failures} run(s) differ from the recorded output")
+        sys.exit(1)
+    print("\nAll runs match the recorded output")
+
+
+if __name__ == "__main__":
+    main()
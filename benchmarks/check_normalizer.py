@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Differential check and benchmark for the multi-hop answer scorer (scoring.py).
+
+Scores (prediction, gold answer) pairs with check_answer and the gold answer's aliases, and with a verbatim
+copy of the original normalizer, which rewrote alias spellings inline. Predictions are every stored
+prediction in eval_results/*.json plus the gold answers and alias spellings with the decorations models
+add ("Answer:", "The", parentheticals, punctuation, accents), so every normalization path gets exercised.
+A pair the original accepted but check_answer rejects is a lost match (exit status 1); pairs only
+check_answer accepts are listed for review. Also reports how long each normalizer takes. Run from the
+repo root:
+
+    python benchmarks/check_normalizer.py
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from functools import lru_cache
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scoring
+from generate_dataset_constants import ANSWER_ALIASES, US_STATE_FLOWERS, US_STATE_MOTTOS
+from unidecode import unidecode
+
+DECORATIONS = [
+    "{}",
+    "Answer: {}",
+    "The {}",
+    "  {}.  ",
+    "{} (approximately)",
+    "[{}]",
+    "It's {}!",
+    "{}, D.C.",
+    "Sir {}",
+    "Northern {}",
+    "Ça {}",
+]
+
+
+def reference_normalize_answer(answer_str: str, skip_middle_name_normalization: bool = False) -> str:
+    """scoring.normalize_answer before it was compiled and its rewrites became aliases (kept verbatim)."""
+    answer_str = answer_str.strip().lower()
+    answer_str = unidecode(answer_str)
+
+    # Remove common prefixes
+    for prefix in ["answer:", "the answer is", "it is", "it's"]:
+        if answer_str.startswith(prefix):
+            answer_str = answer_str[len(prefix) :].strip()
+
+    answer_str = answer_str.replace("t.s.", "t. s.")
+    answer_str = answer_str.replace("j.j.", "j. j.")
+    answer_str = answer_str.removeprefix("mr. ").strip()
+    answer_str = answer_str.removeprefix("sir. ").strip()
+    answer_str = answer_str.removeprefix("mr ").strip()
+    answer_str = answer_str.removeprefix("sir ").strip()
+    answer_str = answer_str.removeprefix("lord ").strip()
+
+    # Remove parenthetical explanations (e.g., "Cardinal (Northern Cardinal)" -> "Cardinal")
+    answer_str = re.sub(r"\s*\([^)]*\)", "", answer_str).strip()
+
+    answer_str = answer_str.replace("robert bruce merrifield", "bruce merrifield").strip()
+    answer_str = answer_str.replace("oscar arias sanchez", "oscar arias").strip()
+    answer_str = answer_str.replace("john boyd orr", "boyd orr").strip()
+    answer_str = answer_str.replace("hermann emil fischer", "emil fischer").strip()
+    answer_str = answer_str.replace("petrus debye", "peter debye").strip()
+    answer_str = answer_str.replace("adolf otto reinhold windaus", "adolf windaus").strip()
+    answer_str = answer_str.replace("william randal cremer", "randal cremer").strip()
+    answer_str = answer_str.replace("rigoberta menchu tum", "rigoberta menchu").strip()
+
+    answer_str = answer_str.replace("fatti maschi,", "fatti maschii,").strip()
+
+    answer_str = answer_str.replace("washington, d.c.", "district of columbia").strip()
+    answer_str = answer_str.replace("d.c.", "district of columbia").strip()
+
+    answer_str = answer_str.replace("audemus jura nostra defendere", "we dare defend our rights").strip()
+    answer_str = answer_str.replace("and ", "").strip()
+
+    answer_str = answer_str.replace("-", "").strip()
+    answer_str = answer_str.replace(",", "").strip()
+    answer_str = answer_str.replace(".", "").strip()
+    answer_str = answer_str.replace("'", "").strip()  # Remove apostrophes
+    answer_str = answer_str.replace("`", "").strip()  # Remove backticks (Hawaiian ʻokina after unidecode)
+
+    # some overkill here
+    answer_str = answer_str.strip(".,!?;:").strip()
+    answer_str = answer_str.removeprefix("the ").strip()
+    answer_str = answer_str.removeprefix("[").removesuffix("]").strip()
+    answer_str = answer_str.strip(".,!?;:").strip()
+    answer_str = answer_str.removeprefix("the ").strip()
+
+    answer_str = answer_str.removeprefix("northern").strip()
+    answer_str = answer_str.removeprefix("western").strip()
+    answer_str = answer_str.removeprefix("eastern").strip()
+    answer_str = answer_str.removeprefix("southern").strip()
+    answer_str = answer_str.removeprefix("american").strip()
+    answer_str = answer_str.replace("hawaiian hibiscus", "hibiscus")
+    answer_str = answer_str.replace("white hawthorn blossom", "hawthorn")
+    answer_str = answer_str.replace("common meadow violet", "violet")
+    answer_str = answer_str.replace("yucca flower", "yucca")
+
+    if (not skip_middle_name_normalization) and (answer_str not in REFERENCE_NON_NAME_SET):
+        # Remove middle names from person names (conservative, only affects 3+ word names)
+        answer_str = scoring.remove_middle_names(answer_str)
+
+    return answer_str
+
+
+REFERENCE_NON_NAME_SET = set(
+    reference_normalize_answer(x, skip_middle_name_normalization=True)
+    for x in [*US_STATE_MOTTOS.values(), *US_STATE_FLOWERS.values()]
+)
+reference_normalize = lru_cache(maxsize=None)(reference_normalize_answer)
+
+
+def collect_golds():
+    """{(gold answer, mapping_id of its last step): stored predictions for it} over the datasets and eval results."""
+    golds = {}
+    for path in sorted(glob.glob("data/*problems_*.jsonl")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    problem = json.loads(line)
+                    golds.setdefault((problem["answer"], problem["chain"][-1]["mapping_id"]), set())
+    for path in sorted(glob.glob("eval_results/*.json")):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for r in data.get("results", []) if isinstance(data, dict) else []:
+            if r.get("predicted_answer") is not None and r.get("chain"):
+                key = (r["correct_answer"], r["chain"][-1]["mapping_id"])
+                golds.setdefault(key, set()).add(str(r["predicted_answer"]))
+    for mapping_id, values in [("state_to_motto", US_STATE_MOTTOS.values()), ("state_to_flower", US_STATE_FLOWERS.values())]:
+        for value in values:
+            golds.setdefault((value, mapping_id), set())
+    return golds
+
+
+def decorated(answers):
+    return {template.format(answer) for answer in answers for template in DECORATIONS}
+
+
+def reference_check_answer(predicted, correct):
+    """check_answer before answer aliases, using the original normalizer."""
+    pred_norm = reference_normalize(str(predicted))
+    if pred_norm == reference_normalize(str(correct)):
+        return True
+    try:
+        return int(pred_norm) == int(correct)
+    except ValueError:
+        return False
+
+
+def time_pass(fn, answers):
+    start = time.perf_counter()
+    for answer in answers:
+        fn(answer)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare alias-based answer scoring with the original normalizer")
+    parser.add_argument("--show", type=int, default=20, help="Print at most this many differences of each kind")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    golds = collect_golds()
+    # Every gold answer is also tried against every alias-table spelling, so aliases that used to collide
+    # with another answer's rewrite show up
+    alias_spellings = decorated(
+        {value for aliases in ANSWER_ALIASES.values() for value in aliases}
+        | {spelling for aliases in ANSWER_ALIASES.values() for spellings in aliases.values() for spelling in spellings}
+    )
+    lost, gained = [], []
+    pairs = 0
+    for (correct, mapping_id), predictions in golds.items():
+        aliases = scoring.accepted_answers(correct, mapping_id)
+        for predicted in predictions | decorated([correct]) | alias_spellings:
+            pairs += 1
+            expected = reference_check_answer(predicted, correct)
+            actual = scoring.check_answer(predicted, correct, aliases)
+            if expected and not actual:
+                lost.append((predicted, correct, mapping_id))
+            elif actual and not expected:
+                gained.append((predicted, correct, mapping_id))
+    print(f"Checked {pairs:,} (prediction, gold) pairs: {len(lost)} lost matches, {len(gained)} new matches")
+    for label, differences in [("lost", lost), ("new", gained)]:
+        for predicted, correct, mapping_id in sorted(differences, key=str)[: args.show]:
+            print(f"  {label}: {predicted!r} for {correct!r} ({mapping_id})")
+
+    # Re-scoring normalizes the same strings over and over (gold answers, common predictions), so time a
+    # pass with an empty memo and one with a warm memo
+    answers = sorted({str(correct) for correct, _ in golds} | alias_spellings | set().union(*golds.values()))
+    answers += sorted(decorated({str(correct) for correct, _ in golds}))
+    scoring.normalize_answer.cache_clear()
+    original = time_pass(reference_normalize_answer, answers)
+    cold = time_pass(scoring.normalize_answer, answers)
+    warm = time_pass(scoring.normalize_answer, answers)
+    per_call = 1e6 / len(answers)
+    print(f"original:         {original * per_call:6.2f} us/answer")
+    print(f"compiled (cold):  {cold * per_call:6.2f} us/answer ({original / cold:.1f}x)")
+    print(f"compiled (memo):  {warm * per_call:6.2f} us/answer ({original / warm:.1f}x)")
+    if lost:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
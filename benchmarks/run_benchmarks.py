@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the harness hot paths, compared against a committed baseline.
+
+Each benchmark is a setup function registered with @benchmark; it does its (untimed) preparation and
+returns the callable to time. The best of several timed passes is compared with benchmarks/baseline.json
+(itself a best of BASELINE_REPEAT passes). A benchmark more than --tolerance slower is timed again in up to
+RETIME_ROUNDS rounds after the rest of the suite, against a threshold scaled by the suite's median slowdown
+(a slow machine as a whole), before it is reported as a regression (exit status 1). Slowdowns under
+--min-slowdown per call are reported as noise, since the microsecond-scale entries vary by more than the
+tolerance between runs. After an intentional change, refresh the baseline with --save-baseline and commit it.
+No API requests are sent. Run from the repo root:
+
+    python benchmarks/run_benchmarks.py                  # compare with the baseline
+    python benchmarks/run_benchmarks.py -k cache         # only benchmarks whose name contains "cache"
+    python benchmarks/run_benchmarks.py --save-baseline  # record new baseline timings
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import eval_multi_hop as E
+import scoring
+from response_cache import ResponseCache
+
+BASELINE_FILE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+# Timed passes behind each saved baseline entry (at least --repeat)
+BASELINE_REPEAT = 10
+# Rounds of re-timing for benchmarks slower than --tolerance; one that stays slow in every round is a regression
+RETIME_ROUNDS = 3
+# Compared benchmarks needed before the suite's median slowdown is taken as the machine's (not with a narrow -k)
+MIN_SUITE_FOR_SPEED_FACTOR = 5
+CACHE_SIZES = [10_000, 100_000, 1_000_000]
+# Cache files for the load/save benchmarks; removed when the run exits
+SCRATCH_DIR = tempfile.TemporaryDirectory(prefix="bench_cache_")
+
+BENCHMARKS = {}
+
+
+class SkipBenchmark(Exception):
+    """Raised by a setup function when its inputs are unavailable (e.g. no stored eval results)."""
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def load_dataset(path="data/problems_all.jsonl"):
+    if not os.path.exists(path):
+        raise SkipBenchmark(f"{path} not found (run generate_dataset.py)")
+    return E.load_problems(path)
+
+
+def stored_predictions():
+    """(predicted, correct) pairs from every stored eval result, or from the dataset if there are none."""
+    pairs = []
+    for path in sorted(glob.glob("eval_results/eval_*.json")):
+        with open(path, encoding="utf-8") as f:
+            for r in json.load(f).get("results", []):
+                if "predicted_answer" in r:
+                    pairs.append((r["predicted_answer"], r["correct_answer"]))
+    if pairs:
+        return pairs
+    # No stored runs: score each gold answer against itself and against its neighbour's answer
+    problems = load_dataset()
+    return [(f"Answer: {p['answer']}", q["answer"]) for p, q in zip(problems, problems[1:] + problems[:1])] + [
+        (str(p["answer"]), p["answer"]) for p in problems
+    ]
+
+
+# --- Scoring ---
+
+
+# normalize_answer is memoized; the cold benchmarks clear the memo on every pass
+
+
+@benchmark("normalize_answer: all stored predictions")
+def bench_normalize_answer():
+    predictions = [str(predicted) for predicted, _ in stored_predictions()]
+
+    def normalize_all():
+        scoring.normalize_answer.cache_clear()
+        return [scoring.normalize_answer(p) for p in predictions]
+
+    return normalize_all
+
+
+@benchmark("check_answer: all stored predictions")
+def bench_check_answer():
+    pairs = stored_predictions()
+
+    def check_all():
+        scoring.normalize_answer.cache_clear()
+        return [scoring.check_answer(predicted, correct) for predicted, correct in pairs]
+
+    return check_all
+
+
+@benchmark("check_answer: all stored predictions, memoized")
+def bench_check_answer_memoized():
+    pairs = stored_predictions()
+    return lambda: [scoring.check_answer(predicted, correct) for predicted, correct in pairs]
+
+
+@benchmark("score_answers: all stored predictions x10")
+def bench_score_answers():
+    # A sweep re-scores the same pairs across many configs
+    predictions, corrects = map(list, zip(*stored_predictions() * 10))
+
+    def score_all():
+        scoring.normalize_answer.cache_clear()
+        return scoring.score_answers(predictions, corrects)
+
+    return score_all
+
+
+# --- Prompt construction ---
+
+PROMPT_CONFIGS = [
+    ("default", {}),
+    ("repeat 5", {"repeat_problem": 5}),
+    ("filler 300", {"filler_tokens": 300}),
+    ("repeat 5 + filler 300", {"repeat_problem": 5, "filler_tokens": 300}),
+    ("mappings", {"include_mappings": True}),
+]
+
+
+def register_prompt_benchmarks():
+    for label, config in PROMPT_CONFIGS:
+
+        @benchmark(f"build_user_message: {label} (200 problems)")
+        def bench_user_message(config=config):
+            problems = load_dataset()[:200]
+            return lambda: [E.build_user_message(p, **config) for p in problems]
+
+        @benchmark(f"build_few_shot_messages: {label} (k=10)")
+        def bench_few_shot(config=config):
+            problems = load_dataset()
+            few_shot = list(enumerate(problems[:10]))
+            return lambda: E.build_few_shot_messages(few_shot, cache=True, **config)
+
+
+register_prompt_benchmarks()
+
+
+# --- Response cache ---
+
+
+@benchmark("ResponseCache.make_cache_key: k=10 request")
+def bench_make_cache_key():
+    problems = load_dataset()
+    few_shot = list(enumerate(problems[:10]))
+    messages = E.build_few_shot_messages(few_shot, cache=True) + [
+        {"role": "user", "content": E.build_user_message(problems[10])},
+        {"role": "assistant", "content": "Answer:"},
+    ]
+    key_dict = {"model": "claude-opus-4-5-20251101", "max_tokens": 50, "messages": messages}
+    cache = ResponseCache(None)
+    return lambda: cache.make_cache_key(key_dict)
+
+
+def make_cache_file(entries):
+    cache = ResponseCache(None)
+    cache.cache = {cache.make_cache_key({"i": i}): {"response": f"Answer {i}"} for i in range(entries)}
+    cache.cache_file = os.path.join(SCRATCH_DIR.name, f"cache_{entries}.json")
+    cache.unsaved_count = 1
+    cache._save_cache_sync()
+    return cache
+
+
+def register_cache_benchmarks():
+    for entries in CACHE_SIZES:
+
+        @benchmark(f"ResponseCache.load_cache: {entries:,} entries")
+        def bench_load(entries=entries):
+            cache = make_cache_file(entries)
+
+            def load():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    cache.load_cache()
+
+            return load
+
+        @benchmark(f"ResponseCache._save_cache_sync: {entries:,} entries")
+        def bench_save(entries=entries):
+            cache = make_cache_file(entries)
+
+            def save():
+                cache.unsaved_count = 1
+                cache._save_cache_sync()
+
+            return save
+
+
+register_cache_benchmarks()
+
+
+# --- Dataset generation and analysis ---
+
+
+@benchmark("generate_all_problems")
+def bench_generate_all_problems():
+    import generate_dataset
+
+    return lambda: generate_dataset.generate_all_problems()
+
+
+@benchmark("analyze_results loaders: all stored runs")
+def bench_analyze_loaders():
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            import analyze_results
+    except (ImportError, FileNotFoundError) as e:
+        raise SkipBenchmark(f"analyze_results unavailable ({e})")
+    runs = []
+    for path in sorted(glob.glob("eval_results/eval_*_all*.json")):
+        model, _, suffix = os.path.basename(path)[len("eval_") : -len(".json")].partition("_all")
+        filler = int(suffix[2:]) if suffix.startswith("_f") and suffix[2:].isdigit() else None
+        runs.append((model, filler))
+    if not runs:
+        raise SkipBenchmark("no eval_results/eval_*_all*.json files")
+
+    def load():
+        for model, filler in runs:
+            analyze_results.load_filler_results(model, filler)
+            analyze_results.load_filler_summary(model, filler)
+
+    return load
+
+
+def time_benchmark(fn, repeat):
+    """Best seconds per call over `repeat` passes, each long enough (>= 0.2s) to time reliably."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def format_seconds(seconds):
+    for unit, scale in [("s", 1), ("ms", 1e-3), ("us", 1e-6)]:
+        if seconds >= scale:
+            return f"{seconds / scale:.3g}{unit}"
+    return f"{seconds / 1e-9:.3g}ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the harness benchmark suite against the baseline")
+    parser.add_argument("-k", "--filter", type=str, default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes per benchmark (best is kept)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Slowdown vs baseline reported as a regression")
+    parser.add_argument(
+        "--min-slowdown",
+        type=float,
+        default=20e-6,
+        help="Slowdowns smaller than this many seconds per call are reported as noise (default: 20us)",
+    )
+    parser.add_argument("--baseline", type=str, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the timings as the new baseline")
+    args = parser.parse_args()
+
+    os.chdir(REPO_ROOT)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    timings = {}
+    slow = {}
+    regressions = []
+    width = max(len(name) for name in BENCHMARKS)
+
+    def print_row(name, seconds, status=""):
+        ratio = seconds / baseline[name]
+        print(f"{name:<{width}}  {format_seconds(seconds):>9}  {format_seconds(baseline[name]):>9}  {ratio - 1:+.0%}{status}")
+
+    print(f"{'benchmark':<{width}}  {'time':>9}  {'baseline':>9}  change")
+    for name, setup in BENCHMARKS.items():
+        if args.filter and args.filter not in name:
+            continue
+        try:
+            fn = setup()
+        except SkipBenchmark as e:
+            print(f"{name:<{width}}  {'skipped':>9}  {'':>9}  {e}")
+            continue
+        repeat = max(args.repeat, BASELINE_REPEAT) if args.save_baseline else args.repeat
+        seconds = timings[name] = time_benchmark(fn, repeat)
+
+        if name not in baseline:
+            print(f"{name:<{width}}  {format_seconds(seconds):>9}  {'--':>9}  new")
+        elif seconds > baseline[name] * (1 + args.tolerance):
+            # Timed again after the rest of the suite, so a passing slowdown of the machine isn't a regression
+            slow[name] = fn
+            print_row(name, seconds, "  slow, re-timing at the end")
+        else:
+            print_row(name, seconds)
+
+    # A machine that is slower as a whole (shared or throttled CPUs) shows up as a slow median; scale the
+    # threshold by it, so only benchmarks slower than the rest of the suite are reported
+    ratios = [seconds / baseline[name] for name, seconds in timings.items() if name in baseline]
+    speed_factor = max(1.0, statistics.median(ratios)) if len(ratios) >= MIN_SUITE_FOR_SPEED_FACTOR else 1.0
+    if speed_factor > 1:
+        print(f"\nThe suite's median is {speed_factor - 1:.0%} slower than the baseline; thresholds are scaled by it")
+    threshold = {name: baseline[name] * speed_factor * (1 + args.tolerance) for name in slow}
+
+    for retime_round in range(1, RETIME_ROUNDS + 1):
+        if not slow:
+            break
+        print(f"\nRe-timing {len(slow)} slow benchmark(s) with {BASELINE_REPEAT} passes ({retime_round}/{RETIME_ROUNDS})")
+        for name, fn in list(slow.items()):
+            seconds = timings[name] = min(timings[name], time_benchmark(fn, BASELINE_REPEAT))
+            if seconds <= threshold[name]:
+                del slow[name]
+                print_row(name, seconds)
+            elif seconds - baseline[name] < args.min_slowdown:
+                del slow[name]
+                print_row(name, seconds, "  noise")
+            elif retime_round == RETIME_ROUNDS:
+                regressions.append(name)
+                print_row(name, seconds, "  REGRESSION")
+            else:
+                print_row(name, seconds, "  still slow")
+
+    if args.save_baseline:
+        # Keep entries for benchmarks that were filtered out or skipped this time
+        results = {**baseline, **timings}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "machine": {"python": platform.python_version(), "platform": platform.platform()},
+                    "results": dict(sorted(results.items())),
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"\nBaseline saved to: {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} benchmark(s) more than {args.tolerance:.0%} slower than the baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
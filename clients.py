@@ -0,0 +1,177 @@
+"""
+Provider clients, request formats and the response cache shared by eval_multi_hop.py and eval_addition.py.
+
+Importing this module loads API keys from ~/.anthropic_api_key, ~/.openai_api_key and ~/.openrouter_api_key
+(unless already set in the environment). Provider clients are created on first use (see get_client), so runs
+served from the cache never import the SDKs or set up their HTTP clients.
+"""
+
+import os
+
+from request_timing import record_first_byte
+from response_cache import ResponseCache
+from tracing import TRACER
+
+# Load API keys
+API_KEY_VARS = {"anthropic": "ANTHROPIC_API_KEY", "openai": "OPENAI_API_KEY", "openrouter": "OPENROUTER_API_KEY"}
+for _provider, _key_var in API_KEY_VARS.items():
+    if _key_var not in os.environ:
+        try:
+            with open(os.path.expanduser(f"~/.{_provider}_api_key"), "r") as f:
+                os.environ[_key_var] = f.read().strip()
+        except FileNotFoundError:
+            ...
+
+CLIENTS = {}
+
+# Set by use_base_url; passed on to --workers processes
+BASE_URL = None
+
+# Set by --offline: score cached responses only and never contact a provider
+OFFLINE = False
+
+# Loaded on first use by open_response_cache (use_base_url installs an in-memory one instead)
+response_cache = None
+
+# OpenAI models (chat API)
+OPENAI_CHAT_MODELS = {
+    "gpt-3.5-turbo-0125",
+    "gpt-4-0314",
+    "gpt-4-0613",
+    "gpt-4-0125-preview",
+    "gpt-4-turbo-2024-04-09",
+    "gpt-4-1106-preview",
+    "gpt-4o-2024-08-06",
+    "gpt-4o-2024-05-13",
+    "gpt-4.1-2025-04-14",
+    "gpt-5.1-2025-11-13",
+    "gpt-5.2-2025-12-11",
+}
+
+# OpenRouter models
+OPENROUTER_MODELS = {
+    "deepseek/deepseek-chat-v3-0324",
+    "deepseek/deepseek-v3.2",
+    "qwen/qwen3-235b-a22b",
+    "qwen/qwen3-235b-a22b-2507",
+    "qwen/qwen3-coder",
+    "qwen/qwen3-32b",
+    "moonshotai/kimi-k2",
+    "google/gemini-2.5-pro",
+    "google/gemini-3-pro-preview",
+}
+
+# Gemini models (require special handling - no native thinking disable)
+GEMINI_MODELS = {
+    "google/gemini-2.5-pro",
+    "google/gemini-3-pro-preview",
+}
+
+
+class NotCachedOffline(Exception):
+    """Raised instead of sending a request when --offline is set."""
+
+
+def get_client(provider):
+    """
+    The client for provider ("anthropic", "openai" or "openrouter"), created on first use.
+    The response hook records time to first byte (response headers) for the per-problem timing breakdown.
+    """
+    if provider not in CLIENTS:
+        api_key = os.environ.get(API_KEY_VARS[provider]) or ("mock" if BASE_URL else None)
+        if provider == "anthropic":
+            from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+
+            CLIENTS[provider] = AsyncAnthropic(
+                api_key=api_key,
+                base_url=BASE_URL,
+                http_client=DefaultAsyncHttpxClient(event_hooks={"response": [record_first_byte]}),
+            )
+        else:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            if BASE_URL:
+                base_url = f"{BASE_URL}/v1"
+            else:
+                base_url = "https://openrouter.ai/api/v1" if provider == "openrouter" else None
+            CLIENTS[provider] = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=DefaultAsyncHttpxClient(event_hooks={"response": [record_first_byte]}),
+            )
+    return CLIENTS[provider]
+
+
+def open_response_cache(cache_file):
+    """Load the on-disk response cache (the eval script's CACHE_FILE) the first time it is needed."""
+    global response_cache
+    if response_cache is None:
+        response_cache = ResponseCache(cache_file)
+    return response_cache
+
+
+def use_base_url(base_url):
+    """
+    Point every provider client at base_url (e.g. mock_llm_server.py) instead of the real APIs.
+    Responses from it are kept in an in-memory cache so they never mix with the on-disk one.
+    """
+    global BASE_URL, response_cache
+    BASE_URL = base_url
+    CLIENTS.clear()
+    response_cache = ResponseCache(None)
+
+
+def uses_openai_format(model):
+    """Whether requests to model go through a chat completions API (OpenAI or OpenRouter)."""
+    return model in OPENAI_CHAT_MODELS or model in OPENROUTER_MODELS or model in GEMINI_MODELS
+
+
+def request_prefix(build_few_shot_messages, few_shot_problems, model, cache=True, **message_kwargs):
+    """
+    The messages of build_few_shot_messages(few_shot_problems, **message_kwargs) in the final request format
+    for model, as used by both eval scripts' build_few_shot_prefix.
+
+    Anthropic models get content blocks with cache_control on the prefix (unless cache is False),
+    OpenAI/OpenRouter models get plain string content (with "Answer:" in the user turn unless the model
+    supports prefill). The result is a tuple that is computed once per config and shared by every problem,
+    so it must not be modified.
+    """
+    is_gemini = model in GEMINI_MODELS
+    is_openai_format = uses_openai_format(model)
+    messages = build_few_shot_messages(
+        few_shot_problems,
+        cache=cache and not is_openai_format,
+        # Gemini supports prefill, other OpenRouter/OpenAI models don't
+        for_openai_chat=is_openai_format and not is_gemini,
+        **message_kwargs,
+    )
+    if is_openai_format:
+        messages = [
+            {"role": msg["role"], "content": msg["content"][0]["text"] if isinstance(msg["content"], list) else msg["content"]}
+            for msg in messages
+        ]
+    return tuple(messages)
+
+
+async def warm_up_prompt_cache(problems_to_eval, make_task, model, cost_tracker, verbose):
+    """
+    Send requests one at a time until one actually hits the API, so the shared few-shot prefix is written
+    to the provider's prompt cache before the fan-out reads from it. OpenAI and OpenRouter cache prefixes
+    implicitly, with no cache write for the fan-out to wait for, so nothing is warmed up for them.
+    Returns the results of the problems sent.
+    """
+    warmup_results = []
+    warmup_span = TRACER.begin("prompt cache warm-up")
+    if not uses_openai_format(model):
+        for problem_idx, problem in problems_to_eval:
+            result = await make_task(problem_idx, problem)
+            warmup_results.append(result)
+            if not result.get("cached", False):
+                if verbose:
+                    print(
+                        f"Prompt cache warm-up: problem {problem_idx + 1} sent alone "
+                        f"(cache write tokens so far: {cost_tracker['cache_creation_tokens']:,})"
+                    )
+                break
+    TRACER.end(warmup_span, problems=len(warmup_results))
+    return warmup_results
@@ -0,0 +1,208 @@
+"""
+Shared token and cost accounting for API calls across Anthropic, OpenAI and OpenRouter, with an optional spend cap.
+"""
+
+import asyncio
+import json
+
+# Pricing per million tokens (USD, list prices as of late 2025; OpenRouter prices are approximate and vary by
+# provider). OpenAI and OpenRouter don't bill cache writes separately, so cache_write equals the input price.
+PRICING = {
+    # Anthropic models
+    # Opus 4.5 list price; earlier versions of this table charged it Opus 4's 15/75, so older results report 3x its cost
+    "claude-opus-4-5-20251101": {"input": 5.0, "output": 25.0, "cache_read": 0.5, "cache_write": 6.25},
+    "claude-opus-4-20250514": {"input": 15.0, "output": 75.0, "cache_read": 1.5, "cache_write": 18.75},
+    "claude-sonnet-4-20250514": {"input": 3.0, "output": 15.0, "cache_read": 0.3, "cache_write": 3.75},
+    "claude-sonnet-4-5-20250929": {"input": 3.0, "output": 15.0, "cache_read": 0.3, "cache_write": 3.75},
+    "claude-3-5-haiku-20241022": {"input": 0.8, "output": 4.0, "cache_read": 0.08, "cache_write": 1.0},
+    # OpenAI models
+    "gpt-3.5-turbo-0125": {"input": 0.5, "output": 1.5, "cache_read": 0.5, "cache_write": 0.5},
+    "gpt-4-0314": {"input": 30.0, "output": 60.0, "cache_read": 30.0, "cache_write": 30.0},
+    "gpt-4-0613": {"input": 30.0, "output": 60.0, "cache_read": 30.0, "cache_write": 30.0},
+    "gpt-4-0125-preview": {"input": 10.0, "output": 30.0, "cache_read": 10.0, "cache_write": 10.0},
+    "gpt-4-1106-preview": {"input": 10.0, "output": 30.0, "cache_read": 10.0, "cache_write": 10.0},
+    "gpt-4-turbo-2024-04-09": {"input": 10.0, "output": 30.0, "cache_read": 10.0, "cache_write": 10.0},
+    "gpt-4o-2024-05-13": {"input": 5.0, "output": 15.0, "cache_read": 5.0, "cache_write": 5.0},
+    "gpt-4o-2024-08-06": {"input": 2.5, "output": 10.0, "cache_read": 1.25, "cache_write": 2.5},
+    "gpt-4.1-2025-04-14": {"input": 2.0, "output": 8.0, "cache_read": 0.5, "cache_write": 2.0},
+    "gpt-5.1-2025-11-13": {"input": 1.25, "output": 10.0, "cache_read": 0.125, "cache_write": 1.25},
+    "gpt-5.2-2025-12-11": {"input": 1.75, "output": 14.0, "cache_read": 0.175, "cache_write": 1.75},
+    # OpenRouter models
+    "deepseek/deepseek-chat-v3-0324": {"input": 0.27, "output": 1.1, "cache_read": 0.07, "cache_write": 0.27},
+    "deepseek/deepseek-v3.2": {"input": 0.28, "output": 0.42, "cache_read": 0.028, "cache_write": 0.28},
+    "qwen/qwen3-235b-a22b": {"input": 0.13, "output": 0.6, "cache_read": 0.13, "cache_write": 0.13},
+    "qwen/qwen3-235b-a22b-2507": {"input": 0.13, "output": 0.6, "cache_read": 0.13, "cache_write": 0.13},
+    "qwen/qwen3-coder": {"input": 0.22, "output": 0.95, "cache_read": 0.22, "cache_write": 0.22},
+    "qwen/qwen3-32b": {"input": 0.1, "output": 0.3, "cache_read": 0.1, "cache_write": 0.1},
+    "moonshotai/kimi-k2": {"input": 0.6, "output": 2.5, "cache_read": 0.15, "cache_write": 0.6},
+    "google/gemini-2.5-pro": {"input": 1.25, "output": 10.0, "cache_read": 0.31, "cache_write": 1.25},
+    "google/gemini-3-pro-preview": {"input": 2.0, "output": 12.0, "cache_read": 0.2, "cache_write": 2.0},
+}
+
+
+def new_cost_tracker():
+    """Create an empty cost tracker dict (the format stored in result summaries as "cost_tracker")."""
+    return {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_read_tokens": 0,
+        "cache_creation_tokens": 0,
+        "api_calls": 0,
+        "cost_usd": 0.0,
+        "unpriced_calls": 0,
+    }
+
+
+def usage_token_counts(usage):
+    """
+    Extract token counts from a response.usage object of any provider.
+    Anthropic reports cached tokens separately from input_tokens; OpenAI/OpenRouter include cached
+    tokens in prompt_tokens, so they are subtracted out here to make the two comparable.
+    """
+    if usage is None:
+        return None
+    if hasattr(usage, "input_tokens"):
+        # Anthropic
+        return {
+            "input_tokens": usage.input_tokens or 0,
+            "output_tokens": usage.output_tokens or 0,
+            "cache_read_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+            "cache_creation_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        }
+    # OpenAI chat completions (also used by OpenRouter)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+    return {
+        "input_tokens": prompt_tokens - cached_tokens,
+        "output_tokens": getattr(usage, "completion_tokens", None) or 0,
+        "cache_read_tokens": cached_tokens,
+        "cache_creation_tokens": 0,
+    }
+
+
+def estimate_cost(model, token_counts):
+    """Estimate the USD cost of the given token counts, or None if the model has no pricing entry."""
+    pricing = PRICING.get(model)
+    if pricing is None:
+        return None
+    return (
+        token_counts["input_tokens"] * pricing["input"] / 1_000_000
+        + token_counts["output_tokens"] * pricing["output"] / 1_000_000
+        + token_counts["cache_read_tokens"] * pricing["cache_read"] / 1_000_000
+        + token_counts["cache_creation_tokens"] * pricing["cache_write"] / 1_000_000
+    )
+
+
+def record_usage(tracker, model, response):
+    """Add the usage of one API response to a cost tracker dict. Returns the cost of this call (or None)."""
+    tracker["api_calls"] += 1
+    token_counts = usage_token_counts(getattr(response, "usage", None))
+    if token_counts is None:
+        tracker["unpriced_calls"] += 1
+        return None
+    for key, value in token_counts.items():
+        tracker[key] += value
+
+    # OpenRouter reports the billed amount directly when usage accounting is enabled
+    cost = getattr(response.usage, "cost", None)
+    if not isinstance(cost, (int, float)):
+        cost = estimate_cost(model, token_counts)
+    if cost is None:
+        tracker["unpriced_calls"] += 1
+        return None
+    tracker["cost_usd"] += cost
+    return cost
+
+
+def estimate_request_cost(model, tracker, request, max_tokens):
+    """
+    Guess what the next request will cost: the running average once some calls have completed,
+    otherwise ~4 characters per input token plus max_tokens of output.
+    """
+    priced_calls = tracker["api_calls"] - tracker["unpriced_calls"]
+    if priced_calls > 0:
+        return tracker["cost_usd"] / priced_calls
+    pricing = PRICING.get(model)
+    if pricing is None:
+        return 0.0
+    input_tokens = len(json.dumps(request, ensure_ascii=False)) / 4
+    return input_tokens * pricing["input"] / 1_000_000 + max_tokens * pricing["output"] / 1_000_000
+
+
+def prompt_cache_stats(tracker):
+    """Summarize provider-side prompt caching from a cost tracker (Anthropic input_tokens excludes cached tokens)."""
+    cache_read = tracker["cache_read_tokens"]
+    cache_write = tracker["cache_creation_tokens"]
+    total_input = tracker["input_tokens"] + cache_read + cache_write
+    return {
+        "read_write_ratio": cache_read / cache_write if cache_write else None,
+        "hit_rate": cache_read / total_input if total_input else None,
+    }
+
+
+def print_cost_summary(model, tracker):
+    """Print the cost and token counts of a run, and how much of its input was read from the prompt cache."""
+    if model in PRICING:
+        print(f"\nEstimated cost: ${tracker['cost_usd']:.4f} ({tracker['api_calls']} API calls)")
+        print(f"  Input tokens: {tracker['input_tokens']:,}")
+        print(f"  Output tokens: {tracker['output_tokens']:,}")
+        print(f"  Cache read tokens: {tracker['cache_read_tokens']:,}")
+        print(f"  Cache creation tokens: {tracker['cache_creation_tokens']:,}")
+    else:
+        print(f"\nNo pricing for {model}; tokens used: {tracker['input_tokens']:,} in, {tracker['output_tokens']:,} out")
+    stats = prompt_cache_stats(tracker)
+    if stats["read_write_ratio"] is not None:
+        print(
+            f"Prompt cache: read/write ratio {stats['read_write_ratio']:.1f}, "
+            f"{stats['hit_rate']:.1%} of input tokens read from cache"
+        )
+
+
+class SpendCapReached(Exception):
+    """Raised instead of sending a request once --max-spend would be exceeded."""
+
+
+class SpendCap:
+    """
+    Refuses new paid requests once spent plus in-flight estimates would exceed max_spend (USD).
+    A request that doesn't fit waits for in-flight ones to finish (their real cost may be lower than
+    reserved) and is only skipped once nothing is in flight and it still doesn't fit.
+
+    With --workers, requests of the worker processes are reserved here too (see sharding.ParentSpendCap),
+    and worker_spend holds what each worker has spent so far, until its cost tracker is merged into the parent's.
+    """
+
+    def __init__(self, max_spend=None):
+        self.max_spend = max_spend
+        self.reserved = 0.0
+        self.in_flight = 0
+        self.skipped = 0
+        self.worker_spend = {}
+        self._condition = asyncio.Condition()
+
+    async def reserve(self, tracker, estimate_fn):
+        """Reserve budget for one request. Returns the reserved amount, or None (and counts a skip) if over the cap."""
+        if self.max_spend is None:
+            return 0.0
+        async with self._condition:
+            while True:
+                estimate = estimate_fn()
+                spent = tracker["cost_usd"] + sum(self.worker_spend.values())
+                if spent + self.reserved + estimate <= self.max_spend:
+                    self.reserved += estimate
+                    self.in_flight += 1
+                    return estimate
+                if self.in_flight == 0:
+                    self.skipped += 1
+                    return None
+                await self._condition.wait()
+
+    async def release(self, estimate):
+        """Release a reservation once the request has finished (its real cost is in the tracker)."""
+        if self.max_spend is None:
+            return
+        async with self._condition:
+            self.in_flight -= 1
+            self.reserved = max(0.0, self.reserved - estimate) if self.in_flight else 0.0
+            self._condition.notify_all()
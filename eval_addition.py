@@ -4,135 +4,52 @@ Evaluation script for addition problems using Claude WITHOUT reasoning (few-shot
 """
 
 import json
-import re
 import os
+import sys
 import asyncio
 import random
-from typing import List, Dict, Any, Optional
-from anthropic import AsyncAnthropic
-from openai import AsyncOpenAI
-from response_cache import ResponseCache
-
-# Load API keys
-if "ANTHROPIC_API_KEY" not in os.environ:
-    key_path = os.path.expanduser("~/.anthropic_api_key")
-    try:
-        with open(key_path, "r") as f:
-            os.environ["ANTHROPIC_API_KEY"] = f.read().strip()
-    except FileNotFoundError:
-        ...
-
-if "OPENAI_API_KEY" not in os.environ:
-    key_path = os.path.expanduser("~/.openai_api_key")
-    try:
-        with open(key_path, "r") as f:
-            os.environ["OPENAI_API_KEY"] = f.read().strip()
-    except FileNotFoundError:
-        ...
-
-if "OPENROUTER_API_KEY" not in os.environ:
-    key_path = os.path.expanduser("~/.openrouter_api_key")
-    try:
-        with open(key_path, "r") as f:
-            os.environ["OPENROUTER_API_KEY"] = f.read().strip()
-    except FileNotFoundError:
-        ...
-
-# Initialize clients
-anthropic_client = AsyncAnthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-openai_client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-openrouter_client = AsyncOpenAI(
-    api_key=os.environ.get("OPENROUTER_API_KEY"),
-    base_url="https://openrouter.ai/api/v1",
+import time
+from functools import lru_cache
+from typing import List, Dict, Any
+from telemetry import Telemetry
+from tracing import TRACER, RUN_TRACK, problem_track
+from problems import chain_dicts, load_problems
+from profiling import LoopLagMonitor, profiled
+from sharding import SharedRateBudget, evaluate_sharded, install_uvloop
+from request_timing import new_timing, print_timing_summary, start_api_timing, start_attempt, timing_percentiles
+import clients
+from clients import (
+    GEMINI_MODELS,
+    OPENAI_CHAT_MODELS,
+    OPENROUTER_MODELS,
+    NotCachedOffline,
+    get_client,
+    request_prefix,
+    warm_up_prompt_cache,
 )
+from cost_tracker import (
+    SpendCap,
+    SpendCapReached,
+    estimate_request_cost,
+    new_cost_tracker,
+    print_cost_summary,
+    prompt_cache_stats,
+    record_usage,
+)
+from scoring import parse_prediction, result_columns, was_skipped
+
+# Response cache file of this script (opened with clients.open_response_cache)
+CACHE_FILE = "caches/cache_addition.json"
+
+# Cost tracking (all providers) and optional spend cap (set from --max-spend)
+COST_TRACKER = new_cost_tracker()
+SPEND_CAP = SpendCap()
+
+# Live progress/status files for the current run (configured in run_evaluation)
+TELEMETRY = Telemetry()
 
-# Initialize cache
-response_cache = ResponseCache("caches/cache_addition.json")
-
-# OpenAI models (chat API)
-OPENAI_CHAT_MODELS = {
-    "gpt-3.5-turbo-0125",
-    "gpt-4-0314",
-    "gpt-4-0613",
-    "gpt-4-0125-preview",
-    "gpt-4-turbo-2024-04-09",
-    "gpt-4-1106-preview",
-    "gpt-4o-2024-08-06",
-    "gpt-4o-2024-05-13",
-    "gpt-4.1-2025-04-14",
-    "gpt-5.1-2025-11-13",
-    "gpt-5.2-2025-12-11",
-}
-
-# OpenRouter models
-OPENROUTER_MODELS = {
-    "deepseek/deepseek-chat-v3-0324",
-    "deepseek/deepseek-v3.2",
-    "qwen/qwen3-235b-a22b",
-    "qwen/qwen3-235b-a22b-2507",
-    "qwen/qwen3-coder",
-    "qwen/qwen3-32b",
-    "moonshotai/kimi-k2",
-    "google/gemini-2.5-pro",
-    "google/gemini-3-pro-preview",
-}
-
-# Gemini models (require special handling - no native thinking disable)
-GEMINI_MODELS = {
-    "google/gemini-2.5-pro",
-    "google/gemini-3-pro-preview",
-}
-
-# Cost tracking
-COST_TRACKER = {
-    "input_tokens": 0,
-    "output_tokens": 0,
-    "cache_read_tokens": 0,
-    "cache_creation_tokens": 0,
-}
-
-# Pricing per million tokens
-PRICING = {
-    "claude-opus-4-5-20251101": {
-        "input": 15.0,
-        "output": 75.0,
-        "cache_read": 1.5,
-        "cache_write": 18.75,
-    },
-    "claude-opus-4-20250514": {
-        "input": 15.0,
-        "output": 75.0,
-        "cache_read": 1.5,
-        "cache_write": 18.75,
-    },
-    "claude-sonnet-4-20250514": {
-        "input": 3.0,
-        "output": 15.0,
-        "cache_read": 0.3,
-        "cache_write": 3.75,
-    },
-    "claude-sonnet-4-5-20250929": {
-        "input": 3.0,
-        "output": 15.0,
-        "cache_read": 0.3,
-        "cache_write": 3.75,
-    },
-    "claude-3-5-haiku-20241022": {
-        "input": 0.8,
-        "output": 4.0,
-        "cache_read": 0.08,
-        "cache_write": 1.0,
-    },
-}
-
-
-def load_problems(filepath):
-    """Load problems from JSONL file."""
-    problems = []
-    with open(filepath, "r", encoding="utf-8") as f:
-        for line in f:
-            problems.append(json.loads(line))
-    return problems
+# Limit on request starts per second (set from --max-rps; shared with --workers processes)
+RATE_BUDGET = None
 
 
 def select_few_shot_problems(problems, k_shot=10):
@@ -165,6 +82,12 @@ def get_substitute_few_shot_index(target_index, few_shot_indices, num_problems):
     return None
 
 
+@lru_cache(maxsize=None)
+def filler_text(filler_tokens: int) -> str:
+    """Filler string counting from 1 to filler_tokens (identical for every message, so built once)."""
+    return " ".join(str(i) for i in range(1, filler_tokens + 1))
+
+
 def build_user_message(
     problem,
     repeat_problem: None | int = None,
@@ -195,8 +118,7 @@ def build_user_message(
 
     # Add filler tokens if specified
     if filler_tokens is not None:
-        filler = " ".join(str(i) for i in range(1, filler_tokens + 1))
-        out += f"\n\nFiller: {filler}"
+        out += f"\n\nFiller: {filler_text(filler_tokens)}"
 
     return out
 
@@ -242,51 +164,19 @@ def build_few_shot_messages(
     return messages
 
 
-def normalize_answer(answer_str: str) -> Optional[int]:
+def build_few_shot_prefix(few_shot_problems, model, cache: bool = True, **message_kwargs):
     """
-    Normalize answer string for comparison.
-    Remove common prefixes, strip, and try to parse as int.
-    Returns None if doesn't parse as int.
+    build_few_shot_messages(few_shot_problems, **message_kwargs) in the final request format for model
+    (see clients.request_prefix). Computed once per config and shared by every problem: don't modify it.
     """
-    answer_str = answer_str.strip().lower()
-
-    # Remove common prefixes
-    for prefix in ["answer:", "the answer is", "it is", "it's", "=", "equals"]:
-        if answer_str.startswith(prefix):
-            answer_str = answer_str[len(prefix):].strip()
-
-    # Remove trailing punctuation
-    answer_str = answer_str.strip(".,!?;:")
-
-    # Remove any remaining whitespace
-    answer_str = answer_str.strip()
-
-    # Try to extract a number from the string
-    # First try direct parsing
-    try:
-        return int(answer_str)
-    except ValueError:
-        pass
-
-    # Try to find a number in the string
-    match = re.search(r'^-?\d+', answer_str)
-    if match:
-        try:
-            return int(match.group())
-        except ValueError:
-            pass
-
-    return None
-
+    return request_prefix(build_few_shot_messages, few_shot_problems, model, cache=cache, **message_kwargs)
 
-def check_answer(predicted: str, correct: int) -> bool:
-    """Check if predicted answer matches correct answer."""
-    pred_norm = normalize_answer(str(predicted))
 
-    if pred_norm is None:
-        return False
+def save_result_columns(results, path):
+    """Write result_columns(results) as a compressed .npz (load with numpy.load)."""
+    import numpy as np
 
-    return pred_norm == correct
+    np.savez_compressed(path, **result_columns(results))
 
 
 async def evaluate_problem(
@@ -300,49 +190,51 @@ async def evaluate_problem(
     repeat_problem: None | int = None,
     verbosity: int = 2,
     filler_tokens: None | int = None,
+    few_shot_prefix: None | tuple = None,
 ):
-    """Evaluate a single problem."""
+    """Evaluate a single problem.
+
+    few_shot_prefix is the shared output of build_few_shot_prefix for base_few_shot_problems; it is built
+    here only when not given or when this problem needs a substituted few-shot set.
+    """
+    task_start = time.perf_counter()
+    timing = new_timing()
+    track = problem_track(problem_index)
+    TRACER.name_track(track, f"problem {problem_index}")
+    build_span = TRACER.begin("build prompt", track)
+
     # Determine model type
     is_openai_chat = model in OPENAI_CHAT_MODELS
     is_gemini = model in GEMINI_MODELS
     is_openrouter = model in OPENROUTER_MODELS or is_gemini
+    provider = "openrouter" if is_openrouter else "openai" if is_openai_chat else "anthropic"
 
-    # Check if we need to modify few-shot set
-    few_shot_problems = base_few_shot_problems
-    modified_few_shot = False
-
+    # Check if we need to modify few-shot set (a modified set is not shared, so it isn't marked for caching)
     if problem_index in base_few_shot_indices:
-        modified_few_shot = True
+        few_shot_problems = base_few_shot_problems
         substitute_index = get_substitute_few_shot_index(problem_index, base_few_shot_indices, len(all_problems))
         if substitute_index is not None:
             few_shot_problems = [
                 ((substitute_index, all_problems[substitute_index]) if idx == problem_index else (idx, prob))
                 for idx, prob in base_few_shot_problems
             ]
+        few_shot_prefix = build_few_shot_prefix(
+            few_shot_problems, model, repeat_problem=repeat_problem, filler_tokens=filler_tokens, cache=False
+        )
+    elif few_shot_prefix is None:
+        few_shot_prefix = build_few_shot_prefix(
+            base_few_shot_problems, model, repeat_problem=repeat_problem, filler_tokens=filler_tokens
+        )
 
     # Gemini supports prefill, other OpenRouter/OpenAI models don't
     disable_prefill = (is_openai_chat or is_openrouter) and not is_gemini
 
-    # Build messages
-    few_shot_messages = build_few_shot_messages(
-        few_shot_problems,
-        repeat_problem=repeat_problem,
-        cache=not modified_few_shot and not is_openai_chat and not is_openrouter,
-        filler_tokens=filler_tokens,
-        for_openai_chat=disable_prefill,
-    )
-
     max_tokens = 100
 
     # Build messages/cache_key based on model type
     if is_openai_chat or is_openrouter:
-        # For OpenAI/OpenRouter: use chat format
-        openai_messages = []
-        for msg in few_shot_messages:
-            content = msg["content"]
-            if isinstance(content, list):
-                content = content[0]["text"]
-            openai_messages.append({"role": msg["role"], "content": content})
+        # For OpenAI/OpenRouter: use chat format (prefix is already in OpenAI format)
+        openai_messages = list(few_shot_prefix)
         # Add current problem
         current_user_text = build_user_message(
             problem,
@@ -380,7 +272,8 @@ async def evaluate_problem(
             cache_key = {"model": model, "max_tokens": max_tokens, "messages": openai_messages}
     else:
         # For Anthropic: use original format with prefill
-        messages = few_shot_messages + [
+        messages = [
+            *few_shot_prefix,
             {
                 "role": "user",
                 "content": build_user_message(
@@ -393,10 +286,19 @@ async def evaluate_problem(
         ]
         cache_key = {"model": model, "max_tokens": max_tokens, "messages": messages}
 
+    TRACER.end(build_span)
+
     # Check cache
-    cached_response = await response_cache.get(cache_key)
+    with TRACER.span("cache lookup", track):
+        cached_response = await clients.response_cache.get(cache_key)
+    cost_estimate = None
+    api_start = None
 
+    wait_start = time.perf_counter()
+    wait_span = TRACER.begin("semaphore wait", track)
     async with semaphore:
+        timing["semaphore_wait_s"] = time.perf_counter() - wait_start
+        TRACER.end(wait_span)
         try:
             response_text = ""
 
@@ -408,20 +310,43 @@ async def evaluate_problem(
                 if verbosity >= 2:
                     print(f"Starting problem {problem_index + 1}: {problem.get('type', 'unknown')}")
 
+                if clients.OFFLINE:
+                    raise NotCachedOffline("Skipped: response not cached and --offline is set")
+
+                cost_estimate = await SPEND_CAP.reserve(
+                    COST_TRACKER, lambda: estimate_request_cost(model, COST_TRACKER, cache_key, max_tokens)
+                )
+                if cost_estimate is None:
+                    raise SpendCapReached(f"Skipped: --max-spend budget of ${SPEND_CAP.max_spend:.2f} reached")
+
                 max_retries = 8
+                api_start = start_api_timing(timing)
+                TELEMETRY.request_started()
                 for retry in range(max_retries):
+                    if RATE_BUDGET is not None:
+                        await RATE_BUDGET.acquire()
+                    start_attempt(timing)
                     try:
+                        attempt_span = TRACER.begin(
+                            "api attempt", track, problem=problem_index, provider=provider, retry=retry
+                        )
                         if is_openrouter:
                             # OpenRouter API
                             if is_gemini:
                                 gemini_max_retries = 5
                                 for gemini_retry in range(gemini_max_retries):
+                                    if gemini_retry > 0 and RATE_BUDGET is not None:
+                                        await RATE_BUDGET.acquire()
+                                    start_attempt(timing)
+                                    gemini_span = TRACER.begin("gemini attempt", track, attempt=gemini_retry)
                                     response = await asyncio.wait_for(
-                                        openrouter_client.chat.completions.create(
+                                        get_client("openrouter").chat.completions.create(
                                             **cache_key,
                                         ),
                                         timeout=120.0,
                                     )
+                                    record_usage(COST_TRACKER, model, response)
+                                    TRACER.end(gemini_span)
                                     assert response.choices is not None
                                     choice = response.choices[0]
                                     assert choice is not None
@@ -447,29 +372,32 @@ async def evaluate_problem(
                                 else:
                                     if verbosity >= 2:
                                         print(f"  Gemini returned empty/thinking response after {gemini_max_retries} retries")
+                                timing["gemini_retries"] += gemini_retry
                             else:
                                 response = await asyncio.wait_for(
-                                    openrouter_client.chat.completions.create(
+                                    get_client("openrouter").chat.completions.create(
                                         **cache_key,
                                         temperature=0.0,
                                     ),
                                     timeout=120.0,
                                 )
+                                record_usage(COST_TRACKER, model, response)
                                 response_text = response.choices[0].message.content.strip()
                         elif is_openai_chat:
                             # OpenAI chat API
                             response = await asyncio.wait_for(
-                                openai_client.chat.completions.create(
+                                get_client("openai").chat.completions.create(
                                     **cache_key,
                                     temperature=0.0,
                                 ),
                                 timeout=120.0,
                             )
+                            record_usage(COST_TRACKER, model, response)
                             response_text = response.choices[0].message.content.strip()
                         else:
                             # Anthropic API
                             response = await asyncio.wait_for(
-                                anthropic_client.messages.create(
+                                get_client("anthropic").messages.create(
                                     model=model,
                                     max_tokens=max_tokens,
                                     messages=messages,
@@ -479,47 +407,63 @@ async def evaluate_problem(
                                 timeout=120.0,
                             )
 
-                            # Track costs (Anthropic only)
-                            if hasattr(response, "usage"):
-                                COST_TRACKER["input_tokens"] += response.usage.input_tokens
-                                COST_TRACKER["output_tokens"] += response.usage.output_tokens
-                                if hasattr(response.usage, "cache_read_input_tokens"):
-                                    COST_TRACKER["cache_read_tokens"] += response.usage.cache_read_input_tokens or 0
-                                if hasattr(response.usage, "cache_creation_input_tokens"):
-                                    COST_TRACKER["cache_creation_tokens"] += response.usage.cache_creation_input_tokens or 0
+                            record_usage(COST_TRACKER, model, response)
 
                             for block in response.content:
                                 if block.type == "text":
                                     response_text = block.text
 
+                        TRACER.end(attempt_span, outcome="ok")
+
                         # Cache response
-                        await response_cache.set(cache_key, {"response": response_text})
+                        await clients.response_cache.set(cache_key, {"response": response_text})
                         break  # Success, exit retry loop
 
                     except asyncio.TimeoutError:
+                        TRACER.end(attempt_span, outcome="timeout")
                         if retry < max_retries - 1:
-                            print(f"TIMEOUT on problem {problem_index + 1}, retrying ({retry + 1}/{max_retries})...")
-                            await asyncio.sleep(5 * (retry + 1))
+                            if verbosity >= 1:
+                                print(f"TIMEOUT on problem {problem_index + 1}, retrying ({retry + 1}/{max_retries})...")
+                            timing["timeout_retries"] += 1
+                            timing["backoff_s"] += 5 * (retry + 1)
+                            with TRACER.span("backoff", track, reason="timeout"):
+                                await asyncio.sleep(5 * (retry + 1))
                         else:
                             print(f"TIMEOUT on problem {problem_index + 1} after {max_retries} retries")
                             raise Exception("API call timed out after retries")
 
                     except Exception as e:
+                        TRACER.end(attempt_span, outcome=type(e).__name__)
                         if "rate_limit" in str(e).lower() or "429" in str(e):
                             if retry < max_retries - 1:
                                 wait_time = 0.1 * (2**retry)
-                                print(
-                                    f"Rate limited on problem {problem_index + 1}, waiting {wait_time}s ({retry + 1}/{max_retries})..."
-                                )
-                                await asyncio.sleep(wait_time)
+                                if verbosity >= 1:
+                                    print(
+                                        f"Rate limited on problem {problem_index + 1}, waiting {wait_time}s ({retry + 1}/{max_retries})..."
+                                    )
+                                TELEMETRY.record_rate_limit()
+                                timing["rate_limit_retries"] += 1
+                                timing["backoff_s"] += wait_time
+                                with TRACER.span("backoff", track, reason="rate_limit"):
+                                    await asyncio.sleep(wait_time)
                             else:
                                 raise
                         else:
                             raise
 
-            # Check answer
+                await SPEND_CAP.release(cost_estimate)
+                cost_estimate = None
+                timing["api_s"] = time.perf_counter() - api_start - timing["backoff_s"]
+                TELEMETRY.request_finished()
+                api_start = None
+
+            # Check answer (check_addition_answer, keeping the parsed value for the result record)
             correct_answer = problem["answer"]
-            is_correct = check_answer(response_text, correct_answer)
+            scoring_start = time.perf_counter()
+            with TRACER.span("scoring", track):
+                parsed_answer = parse_prediction(response_text)
+                is_correct = parsed_answer == correct_answer
+            timing["scoring_s"] = time.perf_counter() - scoring_start
 
             result = {
                 "problem_index": problem_index,
@@ -528,10 +472,14 @@ async def evaluate_problem(
                 "question": problem.get("question", problem.get("problem", "")),
                 "correct_answer": correct_answer,
                 "predicted_answer": response_text.strip(),
+                "parsed_answer": parsed_answer,
+                "parse_failed": parsed_answer is None,
+                "signed_error": parsed_answer - correct_answer if parsed_answer is not None else None,
                 "is_correct": is_correct,
                 "response": response_text,
                 "cached": cached_response is not None,
-                "chain": problem.get("chain", []),
+                "chain": chain_dicts(problem.get("chain", [])),
+                "timing": timing,
             }
 
             status = "CORRECT" if is_correct else "INCORRECT"
@@ -541,13 +489,21 @@ async def evaluate_problem(
                     f"Problem {problem_index + 1}: {status} ('{response_text.strip()}' vs '{correct_answer}') {cache_status}"
                 )
 
+            timing["total_s"] = time.perf_counter() - task_start
             return result
 
         except Exception as e:
             import traceback
 
+            if cost_estimate is not None:
+                await SPEND_CAP.release(cost_estimate)
             error_msg = str(e)
-            print(f"Error on problem {problem_index + 1}: {error_msg}")
+            if not isinstance(e, (SpendCapReached, NotCachedOffline)) or verbosity >= 3:
+                print(f"Error on problem {problem_index + 1}: {error_msg}")
+            if api_start is not None:
+                timing["api_s"] = time.perf_counter() - api_start - timing["backoff_s"]
+                TELEMETRY.request_finished()
+            timing["total_s"] = time.perf_counter() - task_start
             return {
                 "problem_index": problem_index,
                 "type": problem.get("type", "unknown"),
@@ -555,9 +511,15 @@ async def evaluate_problem(
                 "question": problem.get("question", problem.get("problem", "")),
                 "correct_answer": problem["answer"],
                 "predicted_answer": None,
+                "parsed_answer": None,
+                "parse_failed": True,
+                "signed_error": None,
                 "is_correct": False,
                 "error": error_msg,
                 "cached": False,
+                "skipped_spend_cap": isinstance(e, SpendCapReached),
+                "skipped_offline": isinstance(e, NotCachedOffline),
+                "timing": timing,
             }
 
 
@@ -574,8 +536,22 @@ async def run_evaluation(
     seed_for_n: int = 42,
     addend_filter: int | None = None,
     filler_tokens: None | int = None,
+    prompt_cache_warmup: bool = True,
+    max_spend: float | None = None,
+    status_file: str | None = None,
+    prometheus_file: str | None = None,
+    progress: bool = False,
+    trace_file: str | None = None,
+    monitor_loop_lag: bool = False,
+    workers: int = 1,
+    max_rps: float | None = None,
+    use_uvloop: bool = False,
 ):
     """Run evaluation on all problems."""
+    global RATE_BUDGET
+    SPEND_CAP.max_spend = max_spend
+    RATE_BUDGET = SharedRateBudget(max_rps) if max_rps else None
+    clients.open_response_cache(CACHE_FILE)
     all_problems = load_problems(input_file)
 
     # Select few-shot examples from ALL problems (before any filtering)
@@ -619,30 +595,88 @@ async def run_evaluation(
             print(f"  Filler tokens: {filler_tokens}")
 
     semaphore = asyncio.Semaphore(concurrency)
+    if trace_file:
+        TRACER.enable()
+
+    TELEMETRY.configure(
+        len(problems_to_eval),
+        labels={
+            "script": "addition",
+            "model": model,
+            "config": os.path.splitext(os.path.basename(output_file))[0] if output_file else "unsaved",
+        },
+        cost_tracker=COST_TRACKER,
+        status_file=status_file,
+        prometheus_file=prometheus_file,
+        progress=progress,
+    )
+    # The progress line replaces the per-problem prints, which also cost CPU at high concurrency
+    problem_verbosity = 0 if progress else verbosity
 
-    tasks = [
-        evaluate_problem(
-            problem,
-            problem_idx,
-            semaphore,
-            few_shot_problems,
-            few_shot_indices,
-            all_problems,
-            model,
-            repeat_problem=repeat_problem,
-            verbosity=verbosity,
-            filler_tokens=filler_tokens,
+    # The few-shot prefix is the same for every problem in this config, so build it once
+    few_shot_prefix = build_few_shot_prefix(
+        few_shot_problems, model, repeat_problem=repeat_problem, filler_tokens=filler_tokens
+    )
+
+    # evaluate_problem arguments other than the problem itself (also sent to --workers processes)
+    problem_args = (few_shot_problems, few_shot_indices, all_problems, model)
+    problem_kwargs = {
+        "repeat_problem": repeat_problem,
+        "verbosity": problem_verbosity,
+        "filler_tokens": filler_tokens,
+        "few_shot_prefix": few_shot_prefix,
+    }
+
+    async def make_task(problem_idx, problem):
+        result = await evaluate_problem(problem, problem_idx, semaphore, *problem_args, **problem_kwargs)
+        if was_skipped(result):
+            TELEMETRY.total -= 1
+        else:
+            TELEMETRY.problem_done(result)
+        return result
+
+    telemetry_task = asyncio.create_task(TELEMETRY.run()) if TELEMETRY.enabled else None
+    loop_lag_monitor = LoopLagMonitor() if monitor_loop_lag else None
+    loop_lag_task = asyncio.create_task(loop_lag_monitor.run()) if loop_lag_monitor is not None else None
+
+    # Write the shared few-shot prefix to the provider's prompt cache before the fan-out reads from it
+    warmup_results = []
+    if prompt_cache_warmup:
+        warmup_results = await warm_up_prompt_cache(
+            problems_to_eval, make_task, model, COST_TRACKER, verbose=verbosity >= 1 and not progress
         )
-        for problem_idx, problem in problems_to_eval
-    ]
 
-    results = await asyncio.gather(*tasks)
+    warmed_indices = {r["problem_index"] for r in warmup_results}
+    remaining = [(idx, p) for idx, p in problems_to_eval if idx not in warmed_indices]
+    with TRACER.span("fan-out", RUN_TRACK, problems=len(remaining), concurrency=concurrency):
+        if workers > 1:
+            results = warmup_results + await evaluate_sharded(
+                sys.modules[__name__], remaining, workers, concurrency, problem_args, problem_kwargs, use_uvloop
+            )
+        else:
+            results = warmup_results + list(await asyncio.gather(*[make_task(idx, p) for idx, p in remaining]))
+
+    if telemetry_task is not None:
+        telemetry_task.cancel()
+        TELEMETRY.emit(final=True)
 
     # Save cache
-    await response_cache.save_cache(force=True)
+    await clients.response_cache.save_cache(force=True)
+
+    loop_lag_stats = None
+    if loop_lag_task is not None:
+        loop_lag_task.cancel()
+        loop_lag_stats = loop_lag_monitor.summary()
+
+    if trace_file:
+        TRACER.save(trace_file)
+        if verbosity >= 1:
+            print(f"Trace saved to: {trace_file} (open in https://ui.perfetto.dev)")
 
-    # Sort by index
-    results = sorted(results, key=lambda x: x["problem_index"])
+    # Sort by index, dropping problems never sent (--max-spend, --offline): they have no verdict and are only
+    # counted in the summary
+    skipped_offline = sum(1 for r in results if r.get("skipped_offline"))
+    results = sorted((r for r in results if not was_skipped(r)), key=lambda x: x["problem_index"])
 
     # Calculate statistics
     correct_count = sum(1 for r in results if r["is_correct"])
@@ -659,6 +693,8 @@ async def run_evaluation(
         if r["is_correct"]:
             addend_stats[num_addends]["correct"] += 1
 
+    timing_stats = timing_percentiles(results)
+
     if verbosity >= 1:
         print(f"\n{'='*60}")
         print(f"EVALUATION COMPLETE")
@@ -677,20 +713,13 @@ async def run_evaluation(
             addend_acc = stats["correct"] / stats["total"] if stats["total"] > 0 else 0
             print(f"  {num_addends} addends: {stats['correct']}/{stats['total']} ({addend_acc:.2%})")
 
-        # Print cost estimate
-        if model in PRICING:
-            pricing = PRICING[model]
-            cost = (
-                COST_TRACKER["input_tokens"] * pricing["input"] / 1_000_000
-                + COST_TRACKER["output_tokens"] * pricing["output"] / 1_000_000
-                + COST_TRACKER["cache_read_tokens"] * pricing["cache_read"] / 1_000_000
-                + COST_TRACKER["cache_creation_tokens"] * pricing["cache_write"] / 1_000_000
-            )
-            print(f"\nEstimated cost: ${cost:.4f}")
-            print(f"  Input tokens: {COST_TRACKER['input_tokens']:,}")
-            print(f"  Output tokens: {COST_TRACKER['output_tokens']:,}")
-            print(f"  Cache read tokens: {COST_TRACKER['cache_read_tokens']:,}")
-            print(f"  Cache creation tokens: {COST_TRACKER['cache_creation_tokens']:,}")
+        print_cost_summary(model, COST_TRACKER)
+        if SPEND_CAP.skipped:
+            print(f"Skipped {SPEND_CAP.skipped} uncached problems after reaching --max-spend ${max_spend:.2f}")
+        if skipped_offline:
+            print(f"Skipped {skipped_offline} uncached problems (--offline)")
+
+        print_timing_summary(timing_stats, loop_lag_stats)
 
     # Save results
     if output_file:
@@ -711,6 +740,12 @@ async def run_evaluation(
                         "filler_tokens": filler_tokens,
                         "addend_stats": {str(k): v for k, v in addend_stats.items()},
                         "cost_tracker": COST_TRACKER,
+                        "max_spend": max_spend,
+                        "skipped_spend_cap": SPEND_CAP.skipped,
+                        "skipped_offline": skipped_offline,
+                        "prompt_cache": prompt_cache_stats(COST_TRACKER),
+                        "timing": timing_stats,
+                        "event_loop_lag": loop_lag_stats,
                     },
                     "results": results,
                 },
@@ -718,8 +753,10 @@ async def run_evaluation(
                 indent=2,
                 ensure_ascii=False,
             )
+        columns_file = os.path.splitext(output_file)[0] + ".npz"
+        save_result_columns(results, columns_file)
         if verbosity >= 1:
-            print(f"\nResults saved to: {output_file}")
+            print(f"\nResults saved to: {output_file} (columns: {columns_file})")
 
     return results
 
@@ -775,6 +812,29 @@ if __name__ == "__main__":
                         help="Only evaluate problems with this many addends (e.g., --addends 4)")
     parser.add_argument("--filler-tokens", "-f", type=int, default=None,
                         help="Number of filler tokens (counting 1 to N) to add after the problem")
+    parser.add_argument("--no-cache-warmup", action="store_true",
+                        help="Skip the single warm-up request that populates the prompt cache before fanning out")
+    parser.add_argument("--progress", action="store_true",
+                        help="Show a single-line live progress display instead of per-problem output")
+    parser.add_argument("--status-file", type=str, default=None,
+                        help="Periodically write a JSON status file (progress, throughput, 429 rate, spend, ETA)")
+    parser.add_argument("--prometheus-file", type=str, default=None,
+                        help="Periodically write metrics in Prometheus text format (for node_exporter's textfile collector)")
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Write a Chrome trace-event file of the run (spans per problem; open in Perfetto)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Shard problems across this many processes, each with its own event loop (concurrency is split)")
+    parser.add_argument("--max-rps", type=float, default=None,
+                        help="Global limit on API request starts per second, shared by all --workers processes")
+    parser.add_argument("--uvloop", action="store_true", help="Run the event loop(s) on uvloop if it is installed")
+    parser.add_argument("--offline", action="store_true",
+                        help="Score cached responses only; uncached problems are skipped and no provider is contacted")
+    parser.add_argument("--base-url", type=str, default=None,
+                        help="Send all API requests to this server (e.g. mock_llm_server.py) with an in-memory cache")
+    parser.add_argument("--profile", nargs="?", const=f"profiles/eval_addition.prof", default=None, metavar="PROF_FILE",
+                        help="Run under cProfile (pstats saved to PROF_FILE) and report event-loop lag")
+    parser.add_argument("--max-spend", type=float, default=None,
+                        help="Stop sending uncached requests once this many USD would be exceeded (cached ones still score)")
 
     args = parser.parse_args()
 
@@ -805,19 +865,39 @@ if __name__ == "__main__":
         print(f"  Input: {args.input}")
         print(f"  Output: {args.output}")
 
-    asyncio.run(
-        run_evaluation(
-            args.input,
-            args.output,
-            args.num_problems,
-            args.concurrency,
-            model,
-            repeat_problem=args.repeat_problem,
-            verbosity=args.verbosity,
-            k_shot=args.k_shot,
-            randomize_n=args.randomize_n,
-            seed_for_n=args.seed_for_n,
-            addend_filter=args.addends,
-            filler_tokens=args.filler_tokens,
+    if args.workers > 1 and args.trace:
+        parser.error("--trace only records spans from a single process; drop --workers")
+    if args.uvloop and not install_uvloop():
+        print("Warning: uvloop is not installed, using the default asyncio event loop")
+        args.uvloop = False
+    if args.base_url:
+        clients.use_base_url(args.base_url.rstrip("/"))
+    clients.OFFLINE = args.offline
+
+    with profiled(args.profile):
+        asyncio.run(
+            run_evaluation(
+                args.input,
+                args.output,
+                args.num_problems,
+                args.concurrency,
+                model,
+                repeat_problem=args.repeat_problem,
+                verbosity=args.verbosity,
+                k_shot=args.k_shot,
+                randomize_n=args.randomize_n,
+                seed_for_n=args.seed_for_n,
+                addend_filter=args.addends,
+                filler_tokens=args.filler_tokens,
+                prompt_cache_warmup=not args.no_cache_warmup,
+                max_spend=args.max_spend,
+                status_file=args.status_file,
+                prometheus_file=args.prometheus_file,
+                progress=args.progress,
+                trace_file=args.trace,
+                monitor_loop_lag=args.profile is not None,
+                workers=args.workers,
+                max_rps=args.max_rps,
+                use_uvloop=args.uvloop,
+            )
         )
-    )
@@ -4,138 +4,69 @@ Evaluation script for multi-hop reasoning problems using Claude WITHOUT reasonin
 """
 
 import json
-import re
 import os
+import sys
 import asyncio
 import random
-from typing import List, Dict, Any, Optional
-from anthropic import AsyncAnthropic
-from openai import AsyncOpenAI
-from response_cache import ResponseCache
-from unidecode import unidecode
-from generate_dataset import US_STATE_MOTTOS, US_STATE_FLOWERS
+import time
+from functools import lru_cache
+from typing import List, Dict, Any
+from telemetry import Telemetry
+from tracing import TRACER, RUN_TRACK, problem_track
+from problems import chain_dicts, load_problems
+from profiling import LoopLagMonitor, profiled
+from sharding import SharedRateBudget, evaluate_sharded, install_uvloop
+from request_timing import new_timing, print_timing_summary, start_api_timing, start_attempt, timing_percentiles
+from sampling import (
+    ALLOCATIONS,
+    EarlyStopper,
+    stratified_order,
+    stratified_sample,
+    stratum_key,
+    stratum_stds_from_results,
+)
+import clients
+from clients import (
+    GEMINI_MODELS,
+    OPENAI_CHAT_MODELS,
+    OPENROUTER_MODELS,
+    NotCachedOffline,
+    get_client,
+    request_prefix,
+    warm_up_prompt_cache,
+)
+from cost_tracker import (
+    SpendCap,
+    SpendCapReached,
+    estimate_request_cost,
+    new_cost_tracker,
+    print_cost_summary,
+    prompt_cache_stats,
+    record_usage,
+)
+from scoring import (
+    check_answer,
+    compute_hop_stats,
+    compute_stratified_stats,
+    normalizer_version,
+    problem_aliases,
+    score_answers,
+    was_skipped,
+)
 from generate_dataset_constants import MAPPING_REGISTRY
 
-# Load API keys
-if "ANTHROPIC_API_KEY" not in os.environ:
-    key_path = os.path.expanduser("~/.anthropic_api_key")
-    try:
-        with open(key_path, "r") as f:
-            os.environ["ANTHROPIC_API_KEY"] = f.read().strip()
-    except FileNotFoundError:
-        ...
-
-if "OPENAI_API_KEY" not in os.environ:
-    key_path = os.path.expanduser("~/.openai_api_key")
-    try:
-        with open(key_path, "r") as f:
-            os.environ["OPENAI_API_KEY"] = f.read().strip()
-    except FileNotFoundError:
-        ...
-
-if "OPENROUTER_API_KEY" not in os.environ:
-    key_path = os.path.expanduser("~/.openrouter_api_key")
-    try:
-        with open(key_path, "r") as f:
-            os.environ["OPENROUTER_API_KEY"] = f.read().strip()
-    except FileNotFoundError:
-        ...
-
-# Initialize clients
-anthropic_client = AsyncAnthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-openai_client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-openrouter_client = AsyncOpenAI(
-    api_key=os.environ.get("OPENROUTER_API_KEY"),
-    base_url="https://openrouter.ai/api/v1",
-)
+# Response cache file of this script (opened with clients.open_response_cache)
+CACHE_FILE = "caches/cache_multi_hop.json"
+
+# Cost tracking (all providers) and optional spend cap (set from --max-spend)
+COST_TRACKER = new_cost_tracker()
+SPEND_CAP = SpendCap()
 
-# Initialize cache
-response_cache = ResponseCache("caches/cache_multi_hop.json")
-
-# OpenAI models (chat API)
-OPENAI_CHAT_MODELS = {
-    "gpt-3.5-turbo-0125",
-    "gpt-4-0314",
-    "gpt-4-0613",
-    "gpt-4-0125-preview",
-    "gpt-4-turbo-2024-04-09",
-    "gpt-4-1106-preview",
-    "gpt-4o-2024-08-06",
-    "gpt-4o-2024-05-13",
-    "gpt-4.1-2025-04-14",
-    "gpt-5.1-2025-11-13",
-    "gpt-5.2-2025-12-11",
-}
-
-# OpenRouter models
-OPENROUTER_MODELS = {
-    "deepseek/deepseek-chat-v3-0324",
-    "deepseek/deepseek-v3.2",
-    "qwen/qwen3-235b-a22b",
-    "qwen/qwen3-235b-a22b-2507",
-    "qwen/qwen3-coder",
-    "qwen/qwen3-32b",
-    "moonshotai/kimi-k2",
-    "google/gemini-2.5-pro",
-    "google/gemini-3-pro-preview",
-}
-
-# Gemini models (require special handling - no native thinking disable)
-GEMINI_MODELS = {
-    "google/gemini-2.5-pro",
-    "google/gemini-3-pro-preview",
-}
-
-# Cost tracking
-COST_TRACKER = {
-    "input_tokens": 0,
-    "output_tokens": 0,
-    "cache_read_tokens": 0,
-    "cache_creation_tokens": 0,
-}
-
-# Pricing per million tokens (as of late 2024/2025)
-PRICING = {
-    "claude-opus-4-5-20251101": {
-        "input": 15.0,
-        "output": 75.0,
-        "cache_read": 1.5,
-        "cache_write": 18.75,
-    },
-    "claude-opus-4-20250514": {
-        "input": 15.0,
-        "output": 75.0,
-        "cache_read": 1.5,
-        "cache_write": 18.75,
-    },
-    "claude-sonnet-4-20250514": {
-        "input": 3.0,
-        "output": 15.0,
-        "cache_read": 0.3,
-        "cache_write": 3.75,
-    },
-    "claude-sonnet-4-5-20250929": {
-        "input": 3.0,
-        "output": 15.0,
-        "cache_read": 0.3,
-        "cache_write": 3.75,
-    },
-    "claude-3-5-haiku-20241022": {
-        "input": 0.8,
-        "output": 4.0,
-        "cache_read": 0.08,
-        "cache_write": 1.0,
-    },
-}
-
-
-def load_problems(filepath):
-    """Load problems from JSONL file."""
-    problems = []
-    with open(filepath, "r", encoding="utf-8") as f:
-        for line in f:
-            problems.append(json.loads(line))
-    return problems
+# Live progress/status files for the current run (configured in run_evaluation)
+TELEMETRY = Telemetry()
+
+# Limit on request starts per second (set from --max-rps; shared with --workers processes)
+RATE_BUDGET = None
 
 
 def select_few_shot_problems(problems, k_shot=10):
@@ -168,6 +99,16 @@ def get_substitute_few_shot_index(target_index, few_shot_indices, num_problems):
     return None
 
 
+@lru_cache(maxsize=None)
+def mapping_table_body(mapping_id: str) -> str:
+    """
+    Render the rows of a mapping ("Hydrogen: 1\nHelium: 2\n..."), once per process.
+    Mappings in MAPPING_REGISTRY are never modified after import, so the rendering can be reused.
+    """
+    data = MAPPING_REGISTRY[mapping_id]["data"]
+    return "\n".join(f"{key}: {value}" for key, value in data.items())
+
+
 def format_mapping_as_table(mapping_id: str, table_num: int) -> str:
     """
     Format a mapping as a key-value list table.
@@ -180,15 +121,9 @@ def format_mapping_as_table(mapping_id: str, table_num: int) -> str:
     if mapping_id not in MAPPING_REGISTRY:
         return f"=== Table {table_num}: Unknown mapping '{mapping_id}' ==="
 
-    mapping_info = MAPPING_REGISTRY[mapping_id]
-    data = mapping_info["data"]
-    title = mapping_info["title"]
-
-    lines = [f"=== Table {table_num}: {title} ==="]
-    for key, value in data.items():
-        lines.append(f"{key}: {value}")
-
-    return "\n".join(lines)
+    header = f"=== Table {table_num}: {MAPPING_REGISTRY[mapping_id]['title']} ==="
+    body = mapping_table_body(mapping_id)
+    return f"{header}\n{body}" if body else header
 
 
 def get_problem_mappings(problem: Dict[str, Any]) -> List[str]:
@@ -211,17 +146,21 @@ def build_mapping_tables_text(problem: Dict[str, Any]) -> str:
     Each step in the chain gets its own table instance (even if same mapping type).
     """
     chain = problem.get("chain", [])
-    tables = []
-    table_num = 1
+    return mapping_tables_text_for_chain(tuple(filter(None, [step.get("mapping_id") for step in chain])))
 
-    for step in chain:
-        mapping_id = step.get("mapping_id")
-        if mapping_id:
-            table_text = format_mapping_as_table(mapping_id, table_num)
-            tables.append(table_text)
-            table_num += 1
 
-    return "\n\n".join(tables)
+@lru_cache(maxsize=None)
+def mapping_tables_text_for_chain(mapping_ids: tuple) -> str:
+    """Table block for a chain signature (the mapping_id of each step); many problems share one."""
+    return "\n\n".join(
+        format_mapping_as_table(mapping_id, table_num) for table_num, mapping_id in enumerate(mapping_ids, start=1)
+    )
+
+
+@lru_cache(maxsize=None)
+def filler_text(filler_tokens: int) -> str:
+    """Filler string counting from 1 to filler_tokens (identical for every message, so built once)."""
+    return " ".join(str(i) for i in range(1, filler_tokens + 1))
 
 
 def build_user_message(
@@ -279,8 +218,7 @@ def build_user_message(
 
     # Add filler tokens if specified
     if filler_tokens is not None:
-        filler = " ".join(str(i) for i in range(1, filler_tokens + 1))
-        out += f"\n\nFiller: {filler}"
+        out += f"\n\nFiller: {filler_text(filler_tokens)}"
 
     return out
 
@@ -334,143 +272,12 @@ def build_few_shot_messages(
     return messages
 
 
-def remove_middle_names(name_str: str) -> str:
+def build_few_shot_prefix(few_shot_problems, model, cache: bool = True, **message_kwargs):
     """
-    Remove middle names from a person's name (conservative approach).
-    Only applied to names with 3+ words where all words are alphabetic.
-    Preserves suffixes like Jr., Sr., I, II, III.
+    build_few_shot_messages(few_shot_problems, **message_kwargs) in the final request format for model
+    (see clients.request_prefix). Computed once per config and shared by every problem: don't modify it.
     """
-    words = name_str.split()
-    if len(words) < 3:
-        return name_str
-    if len(words) > 4:
-        return name_str
-
-    # Only apply to names that look like person names (all words are alphabetic)
-    # Allow apostrophes and hyphens which are common in names
-    if not all(word.replace("'", "").replace("-", "").isalpha() for word in words):
-        return name_str
-
-    # Preserve common suffixes
-    suffixes = {"jr", "sr", "i", "ii", "iii", "iv", "v"}
-    if words[-1] in suffixes and len(words) in [3, 4]:
-        if len(words) == 4:
-            return f"{words[0]} {words[-2]} {words[-1]}"
-        else:
-            # Only 3 words with suffix (e.g., "John Smith Jr"), don't modify
-            return name_str
-    if len(words) > 3:
-        return name_str
-
-    if len(words) == 3:
-        return f"{words[0]} {words[2]}"
-
-    raise ValueError("shoudn't be reachable")
-
-
-def normalize_answer(answer_str: str, skip_middle_name_normalization: bool = False) -> str:
-    """Normalize answer string for comparison."""
-    answer_str = answer_str.strip().lower()
-    answer_str = unidecode(answer_str)
-
-    # Remove common prefixes
-    for prefix in ["answer:", "the answer is", "it is", "it's"]:
-        if answer_str.startswith(prefix):
-            answer_str = answer_str[len(prefix) :].strip()
-
-    answer_str = answer_str.replace("t.s.", "t. s.")
-    answer_str = answer_str.replace("j.j.", "j. j.")
-    answer_str = answer_str.removeprefix("mr. ").strip()
-    answer_str = answer_str.removeprefix("sir. ").strip()
-    answer_str = answer_str.removeprefix("mr ").strip()
-    answer_str = answer_str.removeprefix("sir ").strip()
-    answer_str = answer_str.removeprefix("lord ").strip()
-
-    # Remove parenthetical explanations (e.g., "Cardinal (Northern Cardinal)" -> "Cardinal")
-    answer_str = re.sub(r"\s*\([^)]*\)", "", answer_str).strip()
-
-    answer_str = answer_str.replace("robert bruce merrifield", "bruce merrifield").strip()
-    answer_str = answer_str.replace("oscar arias sanchez", "oscar arias").strip()
-    answer_str = answer_str.replace("john boyd orr", "boyd orr").strip()
-    answer_str = answer_str.replace("hermann emil fischer", "emil fischer").strip()
-    answer_str = answer_str.replace("petrus debye", "peter debye").strip()
-    answer_str = answer_str.replace("adolf otto reinhold windaus", "adolf windaus").strip()
-    answer_str = answer_str.replace("william randal cremer", "randal cremer").strip()
-    answer_str = answer_str.replace("rigoberta menchu tum", "rigoberta menchu").strip()
-
-    answer_str = answer_str.replace("fatti maschi,", "fatti maschii,").strip()
-
-    answer_str = answer_str.replace("washington, d.c.", "district of columbia").strip()
-    answer_str = answer_str.replace("d.c.", "district of columbia").strip()
-
-    answer_str = answer_str.replace("audemus jura nostra defendere", "we dare defend our rights").strip()
-    answer_str = answer_str.replace("and ", "").strip()
-
-    answer_str = answer_str.replace("-", "").strip()
-    answer_str = answer_str.replace(",", "").strip()
-    answer_str = answer_str.replace(".", "").strip()
-    answer_str = answer_str.replace("'", "").strip()  # Remove apostrophes
-    answer_str = answer_str.replace("`", "").strip()  # Remove backticks (Hawaiian ʻokina after unidecode)
-
-    # some overkill here
-    answer_str = answer_str.strip(".,!?;:").strip()
-    answer_str = answer_str.removeprefix("the ").strip()
-    answer_str = answer_str.removeprefix("[").removesuffix("]").strip()
-    answer_str = answer_str.strip(".,!?;:").strip()
-    answer_str = answer_str.removeprefix("the ").strip()
-
-    answer_str = answer_str.removeprefix("northern").strip()
-    answer_str = answer_str.removeprefix("western").strip()
-    answer_str = answer_str.removeprefix("eastern").strip()
-    answer_str = answer_str.removeprefix("southern").strip()
-    answer_str = answer_str.removeprefix("american").strip()
-    answer_str = answer_str.replace("hawaiian hibiscus", "hibiscus")
-    answer_str = answer_str.replace("white hawthorn blossom", "hawthorn")
-    answer_str = answer_str.replace("common meadow violet", "violet")
-    answer_str = answer_str.replace("yucca flower", "yucca")
-
-    if (not skip_middle_name_normalization) and (answer_str not in NORMALIZED_NON_NAME_SET):
-        # Remove middle names from person names (conservative, only affects 3+ word names)
-        answer_str = remove_middle_names(answer_str)
-
-    return answer_str
-
-
-NORMALIZED_NON_NAME_SET = set(
-    normalize_answer(x, skip_middle_name_normalization=True)
-    for x in [*US_STATE_MOTTOS.values(), *US_STATE_FLOWERS.values()]
-)
-
-
-def check_answer(predicted: str, correct) -> bool:
-    """Check if predicted answer matches correct answer."""
-    pred_norm = normalize_answer(str(predicted))
-    correct_norm = normalize_answer(str(correct))
-
-    # Direct match (includes middle name removal since it's in normalize_answer)
-    if pred_norm == correct_norm:
-        return True
-
-    # For numeric answers, try parsing
-    try:
-        pred_num = int(pred_norm)
-        correct_num = int(correct)
-        if pred_num == correct_num:
-            return True
-    except ValueError:
-        pass
-
-    return False
-
-    # # Check if correct answer is contained in prediction (for names)
-    # if correct_norm in pred_norm:
-    #     return True
-
-    # # Check if prediction is contained in correct (handles partial matches)
-    # if pred_norm in correct_norm and len(pred_norm) > 3:
-    #     return True
-
-    # return False
+    return request_prefix(build_few_shot_messages, few_shot_problems, model, cache=cache, **message_kwargs)
 
 
 async def evaluate_problem(
@@ -486,52 +293,55 @@ async def evaluate_problem(
     include_mappings: bool = False,
     mapping_position: str = "before",
     filler_tokens: None | int = None,
+    early_stopper: None | EarlyStopper = None,
+    few_shot_prefix: None | tuple = None,
 ):
-    """Evaluate a single problem."""
+    """Evaluate a single problem.
+
+    few_shot_prefix is the shared output of build_few_shot_prefix for base_few_shot_problems; it is built
+    here only when not given or when this problem needs a substituted few-shot set.
+    """
+    task_start = time.perf_counter()
+    timing = new_timing()
+    track = problem_track(problem_index)
+    TRACER.name_track(track, f"problem {problem_index}")
+    build_span = TRACER.begin("build prompt", track)
+
     # Determine model type
     is_openai_chat = model in OPENAI_CHAT_MODELS
     is_gemini = model in GEMINI_MODELS
     is_openrouter = model in OPENROUTER_MODELS or is_gemini
+    provider = "openrouter" if is_openrouter else "openai" if is_openai_chat else "anthropic"
 
-    # Check if we need to modify few-shot set
-    few_shot_problems = base_few_shot_problems
-    modified_few_shot = False
+    prefix_kwargs = dict(
+        repeat_problem=repeat_problem,
+        include_mappings=include_mappings,
+        mapping_position=mapping_position,
+        filler_tokens=filler_tokens,
+    )
 
+    # Check if we need to modify few-shot set (a modified set is not shared, so it isn't marked for caching)
     if problem_index in base_few_shot_indices:
-        modified_few_shot = True
+        few_shot_problems = base_few_shot_problems
         substitute_index = get_substitute_few_shot_index(problem_index, base_few_shot_indices, len(all_problems))
         if substitute_index is not None:
             few_shot_problems = [
                 ((substitute_index, all_problems[substitute_index]) if idx == problem_index else (idx, prob))
                 for idx, prob in base_few_shot_problems
             ]
+        few_shot_prefix = build_few_shot_prefix(few_shot_problems, model, cache=False, **prefix_kwargs)
+    elif few_shot_prefix is None:
+        few_shot_prefix = build_few_shot_prefix(base_few_shot_problems, model, **prefix_kwargs)
 
     # Gemini supports prefill, other OpenRouter/OpenAI models don't
     disable_prefill = (is_openai_chat or is_openrouter) and not is_gemini
 
-    # Build messages
-    few_shot_messages = build_few_shot_messages(
-        few_shot_problems,
-        repeat_problem=repeat_problem,
-        cache=not modified_few_shot and not is_openai_chat and not is_openrouter,
-        include_mappings=include_mappings,
-        mapping_position=mapping_position,
-        filler_tokens=filler_tokens,
-        for_openai_chat=disable_prefill,
-    )
-
     max_tokens = 100
 
     # Build messages/cache_key based on model type
     if is_openai_chat or is_openrouter:
-        # For OpenAI/OpenRouter: use chat format
-        # Convert messages to OpenAI format (simple string content)
-        openai_messages = []
-        for msg in few_shot_messages:
-            content = msg["content"]
-            if isinstance(content, list):
-                content = content[0]["text"]
-            openai_messages.append({"role": msg["role"], "content": content})
+        # For OpenAI/OpenRouter: use chat format (prefix is already in OpenAI format)
+        openai_messages = list(few_shot_prefix)
         # Add current problem
         current_user_text = build_user_message(
             problem,
@@ -573,7 +383,8 @@ async def evaluate_problem(
             cache_key = {"model": model, "max_tokens": max_tokens, "messages": openai_messages}
     else:
         # For Anthropic: use original format with prefill
-        messages = few_shot_messages + [
+        messages = [
+            *few_shot_prefix,
             {
                 "role": "user",
                 "content": build_user_message(
@@ -588,10 +399,19 @@ async def evaluate_problem(
         ]
         cache_key = {"model": model, "max_tokens": max_tokens, "messages": messages}
 
+    TRACER.end(build_span)
+
     # Check cache
-    cached_response = await response_cache.get(cache_key)
+    with TRACER.span("cache lookup", track):
+        cached_response = await clients.response_cache.get(cache_key)
+    cost_estimate = None
+    api_start = None
 
+    wait_start = time.perf_counter()
+    wait_span = TRACER.begin("semaphore wait", track)
     async with semaphore:
+        timing["semaphore_wait_s"] = time.perf_counter() - wait_start
+        TRACER.end(wait_span)
         try:
             response_text = ""
 
@@ -600,24 +420,52 @@ async def evaluate_problem(
                     print(f"[CACHED] Problem {problem_index + 1}")
                 response_text = cached_response.get("response", "")
             else:
+                # Sequential early stopping: this hop level is already precise enough, don't pay for more
+                if early_stopper is not None and early_stopper.should_stop(problem.get("hops")):
+                    early_stopper.calls_saved += 1
+                    return {"problem_index": problem_index, "skipped_early_stop": True, "cached": False}
+
                 if verbosity >= 2:
                     print(f"Starting problem {problem_index + 1}: {problem.get('type', 'unknown')}")
 
+                if clients.OFFLINE:
+                    raise NotCachedOffline("Skipped: response not cached and --offline is set")
+
+                cost_estimate = await SPEND_CAP.reserve(
+                    COST_TRACKER, lambda: estimate_request_cost(model, COST_TRACKER, cache_key, max_tokens)
+                )
+                if cost_estimate is None:
+                    raise SpendCapReached(f"Skipped: --max-spend budget of ${SPEND_CAP.max_spend:.2f} reached")
+
                 max_retries = 8
+                api_start = start_api_timing(timing)
+                TELEMETRY.request_started()
                 for retry in range(max_retries):
+                    if RATE_BUDGET is not None:
+                        await RATE_BUDGET.acquire()
+                    start_attempt(timing)
                     try:
+                        attempt_span = TRACER.begin(
+                            "api attempt", track, problem=problem_index, provider=provider, retry=retry
+                        )
                         if is_openrouter:
                             # OpenRouter API
                             if is_gemini:
                                 # Gemini: retry until non-empty and no thinking
                                 gemini_max_retries = 5
                                 for gemini_retry in range(gemini_max_retries):
+                                    if gemini_retry > 0 and RATE_BUDGET is not None:
+                                        await RATE_BUDGET.acquire()
+                                    start_attempt(timing)
+                                    gemini_span = TRACER.begin("gemini attempt", track, attempt=gemini_retry)
                                     response = await asyncio.wait_for(
-                                        openrouter_client.chat.completions.create(
+                                        get_client("openrouter").chat.completions.create(
                                             **cache_key,  # temperature is in cache_key for Gemini
                                         ),
                                         timeout=120.0,
                                     )
+                                    record_usage(COST_TRACKER, model, response)
+                                    TRACER.end(gemini_span)
                                     assert response.choices is not None
                                     choice = response.choices[0]
                                     assert choice is not None
@@ -643,29 +491,32 @@ async def evaluate_problem(
                                 else:
                                     if verbosity >= 2:
                                         print(f"  Gemini returned empty/thinking response after {gemini_max_retries} retries")
+                                timing["gemini_retries"] += gemini_retry
                             else:
                                 response = await asyncio.wait_for(
-                                    openrouter_client.chat.completions.create(
+                                    get_client("openrouter").chat.completions.create(
                                         **cache_key,
                                         temperature=0.0,
                                     ),
                                     timeout=120.0,
                                 )
+                                record_usage(COST_TRACKER, model, response)
                                 response_text = response.choices[0].message.content.strip()
                         elif is_openai_chat:
                             # OpenAI chat API
                             response = await asyncio.wait_for(
-                                openai_client.chat.completions.create(
+                                get_client("openai").chat.completions.create(
                                     **cache_key,
                                     temperature=0.0,
                                 ),
                                 timeout=120.0,
                             )
+                            record_usage(COST_TRACKER, model, response)
                             response_text = response.choices[0].message.content.strip()
                         else:
                             # Anthropic API
                             response = await asyncio.wait_for(
-                                anthropic_client.messages.create(
+                                get_client("anthropic").messages.create(
                                     model=model,
                                     max_tokens=max_tokens,
                                     messages=messages,
@@ -675,47 +526,62 @@ async def evaluate_problem(
                                 timeout=120.0,
                             )
 
-                            # Track costs (Anthropic only)
-                            if hasattr(response, "usage"):
-                                COST_TRACKER["input_tokens"] += response.usage.input_tokens
-                                COST_TRACKER["output_tokens"] += response.usage.output_tokens
-                                if hasattr(response.usage, "cache_read_input_tokens"):
-                                    COST_TRACKER["cache_read_tokens"] += response.usage.cache_read_input_tokens or 0
-                                if hasattr(response.usage, "cache_creation_input_tokens"):
-                                    COST_TRACKER["cache_creation_tokens"] += response.usage.cache_creation_input_tokens or 0
+                            record_usage(COST_TRACKER, model, response)
 
                             for block in response.content:
                                 if block.type == "text":
                                     response_text = block.text
 
+                        TRACER.end(attempt_span, outcome="ok")
+
                         # Cache response
-                        await response_cache.set(cache_key, {"response": response_text})
+                        await clients.response_cache.set(cache_key, {"response": response_text})
                         break  # Success, exit retry loop
 
                     except asyncio.TimeoutError:
+                        TRACER.end(attempt_span, outcome="timeout")
                         if retry < max_retries - 1:
-                            print(f"TIMEOUT on problem {problem_index + 1}, retrying ({retry + 1}/{max_retries})...")
-                            await asyncio.sleep(5 * (retry + 1))
+                            if verbosity >= 1:
+                                print(f"TIMEOUT on problem {problem_index + 1}, retrying ({retry + 1}/{max_retries})...")
+                            timing["timeout_retries"] += 1
+                            timing["backoff_s"] += 5 * (retry + 1)
+                            with TRACER.span("backoff", track, reason="timeout"):
+                                await asyncio.sleep(5 * (retry + 1))
                         else:
                             print(f"TIMEOUT on problem {problem_index + 1} after {max_retries} retries")
                             raise Exception("API call timed out after retries")
 
                     except Exception as e:
+                        TRACER.end(attempt_span, outcome=type(e).__name__)
                         if "rate_limit" in str(e).lower() or "429" in str(e):
                             if retry < max_retries - 1:
                                 wait_time = 0.1 * (2**retry)
-                                print(
-                                    f"Rate limited on problem {problem_index + 1}, waiting {wait_time}s ({retry + 1}/{max_retries})..."
-                                )
-                                await asyncio.sleep(wait_time)
+                                if verbosity >= 1:
+                                    print(
+                                        f"Rate limited on problem {problem_index + 1}, waiting {wait_time}s ({retry + 1}/{max_retries})..."
+                                    )
+                                TELEMETRY.record_rate_limit()
+                                timing["rate_limit_retries"] += 1
+                                timing["backoff_s"] += wait_time
+                                with TRACER.span("backoff", track, reason="rate_limit"):
+                                    await asyncio.sleep(wait_time)
                             else:
                                 raise
                         else:
                             raise
 
+                await SPEND_CAP.release(cost_estimate)
+                cost_estimate = None
+                timing["api_s"] = time.perf_counter() - api_start - timing["backoff_s"]
+                TELEMETRY.request_finished()
+                api_start = None
+
             # Check answer
             correct_answer = problem["answer"]
-            is_correct = check_answer(response_text, correct_answer)
+            scoring_start = time.perf_counter()
+            with TRACER.span("scoring", track):
+                is_correct = check_answer(response_text, correct_answer, problem_aliases(problem))
+            timing["scoring_s"] = time.perf_counter() - scoring_start
 
             # print(f"{normalize_answer(str(response_text))=} {normalize_answer(str(correct_answer))=}")
 
@@ -729,7 +595,8 @@ async def evaluate_problem(
                 "is_correct": is_correct,
                 "response": response_text,
                 "cached": cached_response is not None,
-                "chain": problem.get("chain", []),
+                "chain": chain_dicts(problem.get("chain", [])),
+                "timing": timing,
             }
 
             status = "CORRECT" if is_correct else "INCORRECT"
@@ -739,13 +606,21 @@ async def evaluate_problem(
                     f"Problem {problem_index + 1}: {status} ('{response_text.strip()}' vs '{correct_answer}') {cache_status}"
                 )
 
+            timing["total_s"] = time.perf_counter() - task_start
             return result
 
         except Exception as e:
             import traceback
 
+            if cost_estimate is not None:
+                await SPEND_CAP.release(cost_estimate)
             error_msg = str(e)
-            print(f"Error on problem {problem_index + 1}: {error_msg}")
+            if not isinstance(e, (SpendCapReached, NotCachedOffline)) or verbosity >= 3:
+                print(f"Error on problem {problem_index + 1}: {error_msg}")
+            if api_start is not None:
+                timing["api_s"] = time.perf_counter() - api_start - timing["backoff_s"]
+                TELEMETRY.request_finished()
+            timing["total_s"] = time.perf_counter() - task_start
             return {
                 "problem_index": problem_index,
                 "type": problem.get("type", "unknown"),
@@ -756,6 +631,9 @@ async def evaluate_problem(
                 "is_correct": False,
                 "error": error_msg,
                 "cached": False,
+                "skipped_spend_cap": isinstance(e, SpendCapReached),
+                "skipped_offline": isinstance(e, NotCachedOffline),
+                "timing": timing,
             }
 
 
@@ -774,8 +652,36 @@ async def run_evaluation(
     seed_for_n: int = 42,
     hop_filter: int | None = None,
     filler_tokens: None | int = None,
+    prompt_cache_warmup: bool = True,
+    max_spend: float | None = None,
+    status_file: str | None = None,
+    prometheus_file: str | None = None,
+    progress: bool = False,
+    trace_file: str | None = None,
+    monitor_loop_lag: bool = False,
+    workers: int = 1,
+    max_rps: float | None = None,
+    use_uvloop: bool = False,
+    target_ci_width: float | None = None,
+    min_per_hop: int = 30,
+    stratify: bool = False,
+    allocation: str = "proportional",
+    stratum_stds: dict | None = None,
 ):
-    """Run evaluation on all problems."""
+    """
+    Run evaluation on all problems.
+    With stratify and max_problems set, the max_problems are drawn by stratified random sampling over
+    hop x type family (allocation: proportional, equal or neyman using stratum_stds from past runs),
+    and the summary reports population-weighted hop-level and overall accuracy.
+    With target_ci_width set, problems run in a randomized order stratified by hop and type, and no new
+    requests are sent for a hop level once its Wilson interval is narrower than target_ci_width.
+    """
+    global RATE_BUDGET
+    if target_ci_width is not None and workers > 1:
+        raise ValueError("target_ci_width needs one process to see every result; use workers=1")
+    SPEND_CAP.max_spend = max_spend
+    RATE_BUDGET = SharedRateBudget(max_rps) if max_rps else None
+    clients.open_response_cache(CACHE_FILE)
     all_problems = load_problems(input_file)
 
     # Select few-shot examples from ALL problems (before any filtering)
@@ -804,9 +710,15 @@ async def run_evaluation(
 
     # Determine problems to evaluate (from the filtered set)
     # problems_with_indices is a list of (original_index, problem) tuples
+    stratum_sizes = None
     if max_problems:
         available = [(idx, p) for idx, p in problems_with_indices if idx not in few_shot_indices]
-        if randomize_n:
+        if stratify:
+            available, stratum_sizes = stratified_sample(
+                available, lambda x: stratum_key(x[1]), max_problems, allocation, stratum_stds, seed=seed_for_n
+            )
+            available.sort(key=lambda x: x[0])
+        elif randomize_n:
             # Randomly select max_problems, excluding few-shot examples
             rng = random.Random(seed_for_n)
             rng.shuffle(available)
@@ -815,57 +727,145 @@ async def run_evaluation(
         # Exclude few-shot from evaluation
         problems_to_eval = [(idx, p) for idx, p in problems_with_indices if idx not in few_shot_indices]
 
+    early_stopper = None
+    if target_ci_width is not None:
+        problems_to_eval = stratified_order(
+            problems_to_eval, lambda x: (x[1].get("hops"), x[1].get("type")), seed=seed_for_n
+        )
+        early_stopper = EarlyStopper(
+            {p.get("hops") for _, p in problems_to_eval}, target_ci_width, min_per_stratum=min_per_hop
+        )
+
     if verbosity >= 1:
         print(f"\nEvaluating {len(problems_to_eval)} problems with concurrency={concurrency}...")
         if include_mappings:
             print(f"  Including mapping tables (position: {mapping_position})")
-        if randomize_n and max_problems:
+        if stratum_sizes is not None:
+            print(f"  Stratified selection over {len(stratum_sizes)} strata ({allocation} allocation, seed={seed_for_n})")
+        elif randomize_n and max_problems:
             print(f"  Randomized selection (seed={seed_for_n})")
         if filler_tokens:
             print(f"  Filler tokens: {filler_tokens}")
+        if early_stopper is not None:
+            print(f"  Early stopping at Wilson interval width < {target_ci_width} per hop (min {min_per_hop} each)")
 
     semaphore = asyncio.Semaphore(concurrency)
+    if trace_file:
+        TRACER.enable()
+
+    TELEMETRY.configure(
+        len(problems_to_eval),
+        labels={
+            "script": "multi_hop",
+            "model": model,
+            "config": os.path.splitext(os.path.basename(output_file))[0] if output_file else "unsaved",
+        },
+        cost_tracker=COST_TRACKER,
+        status_file=status_file,
+        prometheus_file=prometheus_file,
+        progress=progress,
+    )
+    # The progress line replaces the per-problem prints, which also cost CPU at high concurrency
+    problem_verbosity = 0 if progress else verbosity
 
-    tasks = [
-        evaluate_problem(
-            problem,
-            problem_idx,
-            semaphore,
-            few_shot_problems,
-            few_shot_indices,
-            all_problems,
-            model,
-            repeat_problem=repeat_problem,
-            verbosity=verbosity,
-            include_mappings=include_mappings,
-            mapping_position=mapping_position,
-            filler_tokens=filler_tokens,
+    # The few-shot prefix is the same for every problem in this config, so build it once
+    few_shot_prefix = build_few_shot_prefix(
+        few_shot_problems,
+        model,
+        repeat_problem=repeat_problem,
+        include_mappings=include_mappings,
+        mapping_position=mapping_position,
+        filler_tokens=filler_tokens,
+    )
+
+    # evaluate_problem arguments other than the problem itself (also sent to --workers processes)
+    problem_args = (few_shot_problems, few_shot_indices, all_problems, model)
+    problem_kwargs = {
+        "repeat_problem": repeat_problem,
+        "verbosity": problem_verbosity,
+        "include_mappings": include_mappings,
+        "mapping_position": mapping_position,
+        "filler_tokens": filler_tokens,
+        "few_shot_prefix": few_shot_prefix,
+    }
+
+    async def make_task(problem_idx, problem):
+        result = await evaluate_problem(
+            problem, problem_idx, semaphore, *problem_args, early_stopper=early_stopper, **problem_kwargs
+        )
+        if early_stopper is not None and "error" not in result and not was_skipped(result):
+            early_stopper.record(problem.get("hops"), result["is_correct"])
+        if was_skipped(result):
+            TELEMETRY.total -= 1
+        else:
+            TELEMETRY.problem_done(result)
+        return result
+
+    telemetry_task = asyncio.create_task(TELEMETRY.run()) if TELEMETRY.enabled else None
+    loop_lag_monitor = LoopLagMonitor() if monitor_loop_lag else None
+    loop_lag_task = asyncio.create_task(loop_lag_monitor.run()) if loop_lag_monitor is not None else None
+
+    # Write the shared few-shot prefix to the provider's prompt cache before the fan-out reads from it
+    warmup_results = []
+    if prompt_cache_warmup:
+        warmup_results = await warm_up_prompt_cache(
+            problems_to_eval, make_task, model, COST_TRACKER, verbose=verbosity >= 1 and not progress
         )
-        for problem_idx, problem in problems_to_eval
-    ]
 
-    results = await asyncio.gather(*tasks)
+    warmed_indices = {r["problem_index"] for r in warmup_results}
+    remaining = [(idx, p) for idx, p in problems_to_eval if idx not in warmed_indices]
+    with TRACER.span("fan-out", RUN_TRACK, problems=len(remaining), concurrency=concurrency):
+        if workers > 1:
+            results = warmup_results + await evaluate_sharded(
+                sys.modules[__name__], remaining, workers, concurrency, problem_args, problem_kwargs, use_uvloop
+            )
+        else:
+            results = warmup_results + list(await asyncio.gather(*[make_task(idx, p) for idx, p in remaining]))
+
+    if telemetry_task is not None:
+        telemetry_task.cancel()
+        TELEMETRY.emit(final=True)
 
     # Save cache
-    await response_cache.save_cache(force=True)
+    await clients.response_cache.save_cache(force=True)
+
+    loop_lag_stats = None
+    if loop_lag_task is not None:
+        loop_lag_task.cancel()
+        loop_lag_stats = loop_lag_monitor.summary()
 
-    # Sort by index
-    results = sorted(results, key=lambda x: x["problem_index"])
+    if trace_file:
+        TRACER.save(trace_file)
+        if verbosity >= 1:
+            print(f"Trace saved to: {trace_file} (open in https://ui.perfetto.dev)")
+
+    # Sort by index, dropping problems never sent (early stopping, --max-spend, --offline): they have no
+    # verdict and are only counted in the summary
+    skipped_offline = sum(1 for r in results if r.get("skipped_offline"))
+    results = sorted((r for r in results if not was_skipped(r)), key=lambda x: x["problem_index"])
+
+    # Score the run in one batch, each distinct (response, answer) pair once; the verdicts evaluate_problem
+    # returned only drive the live progress and early stopping
+    scored = [r for r in results if "error" not in r]
+    verdicts = score_answers(
+        [r["response"] for r in scored],
+        [r["correct_answer"] for r in scored],
+        [problem_aliases(all_problems[r["problem_index"]]) for r in scored],
+    )
+    for r, is_correct in zip(scored, verdicts.tolist()):
+        r["is_correct"] = is_correct
 
     # Calculate statistics
     correct_count = sum(1 for r in results if r["is_correct"])
     cached_count = sum(1 for r in results if r.get("cached", False))
     accuracy = correct_count / len(results) if results else 0
 
-    # Calculate by hop level
-    hop_stats = {}
-    for r in results:
-        hop = r.get("hops", "unknown")
-        if hop not in hop_stats:
-            hop_stats[hop] = {"total": 0, "correct": 0}
-        hop_stats[hop]["total"] += 1
-        if r["is_correct"]:
-            hop_stats[hop]["correct"] += 1
+    hop_stats = compute_hop_stats(results)
+    stratified_stats = None
+    if stratum_sizes is not None:
+        stratified_stats = compute_stratified_stats(results, stratum_sizes, allocation, hop_stats)
+
+    timing_stats = timing_percentiles(results)
 
     if verbosity >= 1:
         print(f"\n{'='*60}")
@@ -885,20 +885,26 @@ async def run_evaluation(
             hop_acc = stats["correct"] / stats["total"] if stats["total"] > 0 else 0
             print(f"  {hop}-hop: {stats['correct']}/{stats['total']} ({hop_acc:.2%})")
 
-        # Print cost estimate
-        if model in PRICING:
-            pricing = PRICING[model]
-            cost = (
-                COST_TRACKER["input_tokens"] * pricing["input"] / 1_000_000
-                + COST_TRACKER["output_tokens"] * pricing["output"] / 1_000_000
-                + COST_TRACKER["cache_read_tokens"] * pricing["cache_read"] / 1_000_000
-                + COST_TRACKER["cache_creation_tokens"] * pricing["cache_write"] / 1_000_000
-            )
-            print(f"\nEstimated cost: ${cost:.4f}")
-            print(f"  Input tokens: {COST_TRACKER['input_tokens']:,}")
-            print(f"  Output tokens: {COST_TRACKER['output_tokens']:,}")
-            print(f"  Cache read tokens: {COST_TRACKER['cache_read_tokens']:,}")
-            print(f"  Cache creation tokens: {COST_TRACKER['cache_creation_tokens']:,}")
+        if stratified_stats is not None:
+            print(f"\nWeighted estimates ({allocation} allocation):")
+            for name, est in [("overall", stratified_stats["overall"])] + [
+                (f"{hop}-hop", est) for hop, est in sorted(stratified_stats["by_hop"].items())
+            ]:
+                if est["accuracy"] is not None:
+                    print(f"  {name}: {est['accuracy']:.2%} (95% CI {est['ci'][0]:.2%} - {est['ci'][1]:.2%})")
+
+        print_cost_summary(model, COST_TRACKER)
+        if SPEND_CAP.skipped:
+            print(f"Skipped {SPEND_CAP.skipped} uncached problems after reaching --max-spend ${max_spend:.2f}")
+        if skipped_offline:
+            print(f"Skipped {skipped_offline} uncached problems (--offline)")
+        if early_stopper is not None:
+            print(f"Early stopping saved {early_stopper.calls_saved} API calls")
+            for hop in sorted(early_stopper.counts, key=str):
+                low, high = early_stopper.interval(hop)
+                print(f"  {hop}-hop: [{low:.3f}, {high:.3f}] (width {high - low:.3f})")
+
+        print_timing_summary(timing_stats, loop_lag_stats)
 
     # Save results
     if output_file:
@@ -920,7 +926,16 @@ async def run_evaluation(
                         "hop_filter": hop_filter,
                         "filler_tokens": filler_tokens,
                         "hop_stats": {str(k): v for k, v in hop_stats.items()},
+                        "normalizer_version": normalizer_version(),
                         "cost_tracker": COST_TRACKER,
+                        "max_spend": max_spend,
+                        "skipped_spend_cap": SPEND_CAP.skipped,
+                        "skipped_offline": skipped_offline,
+                        "prompt_cache": prompt_cache_stats(COST_TRACKER),
+                        "timing": timing_stats,
+                        "event_loop_lag": loop_lag_stats,
+                        "early_stopping": early_stopper.summary() if early_stopper is not None else None,
+                        "stratified": stratified_stats,
                     },
                     "results": results,
                 },
@@ -991,11 +1006,48 @@ if __name__ == "__main__":
                         help="Only evaluate problems with this many hops (e.g., --hop 4)")
     parser.add_argument("--filler-tokens", "-f", type=int, default=None,
                         help="Number of filler tokens (counting 1 to N) to add after the problem")
+    parser.add_argument("--no-cache-warmup", action="store_true",
+                        help="Skip the single warm-up request that populates the prompt cache before fanning out")
+    parser.add_argument("--progress", action="store_true",
+                        help="Show a single-line live progress display instead of per-problem output")
+    parser.add_argument("--status-file", type=str, default=None,
+                        help="Periodically write a JSON status file (progress, throughput, 429 rate, spend, ETA)")
+    parser.add_argument("--prometheus-file", type=str, default=None,
+                        help="Periodically write metrics in Prometheus text format (for node_exporter's textfile collector)")
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Write a Chrome trace-event file of the run (spans per problem; open in Perfetto)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Shard problems across this many processes, each with its own event loop (concurrency is split)")
+    parser.add_argument("--max-rps", type=float, default=None,
+                        help="Global limit on API request starts per second, shared by all --workers processes")
+    parser.add_argument("--uvloop", action="store_true", help="Run the event loop(s) on uvloop if it is installed")
+    parser.add_argument("--offline", action="store_true",
+                        help="Score cached responses only; uncached problems are skipped and no provider is contacted")
+    parser.add_argument("--base-url", type=str, default=None,
+                        help="Send all API requests to this server (e.g. mock_llm_server.py) with an in-memory cache")
+    parser.add_argument("--profile", nargs="?", const=f"profiles/eval_multi_hop.prof", default=None, metavar="PROF_FILE",
+                        help="Run under cProfile (pstats saved to PROF_FILE) and report event-loop lag")
+    parser.add_argument("--max-spend", type=float, default=None,
+                        help="Stop sending uncached requests once this many USD would be exceeded (cached ones still score)")
+    parser.add_argument("--target-ci-width", type=float, default=None,
+                        help="Early stopping: stop sending requests for a hop level once its 95%% Wilson interval is narrower than this")
+    parser.add_argument("--min-per-hop", type=int, default=30,
+                        help="Minimum problems per hop level before early stopping can kick in (default: 30)")
+    parser.add_argument("--stratify", action="store_true",
+                        help="With -n, draw a stratified random sample over hop x type family (seeded by --seed-for-n)")
+    parser.add_argument("--allocation", type=str, default="proportional", choices=ALLOCATIONS,
+                        help="How --stratify splits -n across strata (neyman needs --variance-from)")
+    parser.add_argument("--variance-from", type=str, nargs="+", default=None,
+                        help="Past eval results files used to estimate per-stratum variance for Neyman allocation")
 
     args = parser.parse_args()
 
     model = parse_model_name(args.model)
 
+    if args.allocation == "neyman" and not args.variance_from:
+        parser.error("--allocation neyman requires --variance-from with past results files")
+    stratum_stds = stratum_stds_from_results(args.variance_from) if args.variance_from else None
+
     # Handle --only-salient-facts flag
     if args.only_salient_facts:
         if args.input != "data/problems_all.jsonl":
@@ -1010,15 +1062,20 @@ if __name__ == "__main__":
         hop_suffix = f"_{args.hop}hop" if args.hop else ""
         n_suffix = f"_n{args.num_problems}" if args.num_problems else ""
         rand_suffix = f"_rand{args.seed_for_n}" if args.randomize_n and args.num_problems else ""
+        if args.stratify and args.num_problems:
+            rand_suffix = f"_strat{args.allocation}{args.seed_for_n}"
         filler_suffix = f"_f{args.filler_tokens}" if args.filler_tokens else ""
-        args.output = f"{output_prefix}eval_{args.model}{hop_suffix}{n_suffix}{rand_suffix}{repeat_suffix}{filler_suffix}{mapping_suffix}.json"
+        ci_suffix = f"_ci{args.target_ci_width:g}" if args.target_ci_width else ""
+        args.output = f"{output_prefix}eval_{args.model}{hop_suffix}{n_suffix}{rand_suffix}{repeat_suffix}{filler_suffix}{mapping_suffix}{ci_suffix}.json"
 
     if args.verbosity >= 1:
         print(f"Configuration:")
         print(f"  Model: {model}")
         print(f"  Concurrency: {args.concurrency}")
         print(f"  Max problems: {args.num_problems if args.num_problems else 'all'}")
-        if args.randomize_n and args.num_problems:
+        if args.stratify and args.num_problems:
+            print(f"  Stratified selection: {args.allocation} allocation (seed={args.seed_for_n})")
+        elif args.randomize_n and args.num_problems:
             print(f"  Randomize selection: True (seed={args.seed_for_n})")
         if args.hop:
             print(f"  Hop filter: {args.hop}-hop only")
@@ -1032,21 +1089,48 @@ if __name__ == "__main__":
         print(f"  Input: {args.input}")
         print(f"  Output: {args.output}")
 
-    asyncio.run(
-        run_evaluation(
-            args.input,
-            args.output,
-            args.num_problems,
-            args.concurrency,
-            model,
-            repeat_problem=args.repeat_problem,
-            verbosity=args.verbosity,
-            k_shot=args.k_shot,
-            include_mappings=args.include_mappings,
-            mapping_position=args.mapping_position,
-            randomize_n=args.randomize_n,
-            seed_for_n=args.seed_for_n,
-            hop_filter=args.hop,
-            filler_tokens=args.filler_tokens,
+    if args.workers > 1 and args.target_ci_width is not None:
+        parser.error("--target-ci-width needs one process to see every result; drop --workers")
+    if args.workers > 1 and args.trace:
+        parser.error("--trace only records spans from a single process; drop --workers")
+    if args.uvloop and not install_uvloop():
+        print("Warning: uvloop is not installed, using the default asyncio event loop")
+        args.uvloop = False
+    if args.base_url:
+        clients.use_base_url(args.base_url.rstrip("/"))
+    clients.OFFLINE = args.offline
+
+    with profiled(args.profile):
+        asyncio.run(
+            run_evaluation(
+                args.input,
+                args.output,
+                args.num_problems,
+                args.concurrency,
+                model,
+                repeat_problem=args.repeat_problem,
+                verbosity=args.verbosity,
+                k_shot=args.k_shot,
+                include_mappings=args.include_mappings,
+                mapping_position=args.mapping_position,
+                randomize_n=args.randomize_n,
+                seed_for_n=args.seed_for_n,
+                hop_filter=args.hop,
+                filler_tokens=args.filler_tokens,
+                prompt_cache_warmup=not args.no_cache_warmup,
+                max_spend=args.max_spend,
+                status_file=args.status_file,
+                prometheus_file=args.prometheus_file,
+                progress=args.progress,
+                trace_file=args.trace,
+                monitor_loop_lag=args.profile is not None,
+                workers=args.workers,
+                max_rps=args.max_rps,
+                use_uvloop=args.uvloop,
+                target_ci_width=args.target_ci_width,
+                min_per_hop=args.min_per_hop,
+                stratify=args.stratify,
+                allocation=args.allocation,
+                stratum_stds=stratum_stds,
+            )
         )
-    )
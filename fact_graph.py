@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+N-hop problem generation by uniform sampling of paths through the fact graph.
+
+generate_dataset.py composes a number generator with at most one numeric consumer (a birth day or county
+count) and a final consumer, which caps chains at 4 hops. Here the same generators and consumers form a
+graph instead: a node is a number together with the id of the chain that produced it, and each consumer is
+an edge whose steps are lookups in MAPPING_REGISTRY tables. Consumers whose answer is a number (the
+CHAINABLE_CONSUMER_SUFFIXES ones) lead to another node, so chains can be as long as the domain rule allows
+(a consumer never follows a chain whose id contains its excluded_generator, so each domain is used at most
+once).
+
+The number of complete N-hop paths from every node is counted once with memoized dynamic programming.
+A dataset of k problems is then k distinct ranks drawn uniformly from range(total), each turned into
+its path by walking down the counts, so sampling never lists the paths. Problems have the same fields
+and type ids as generate_dataset.py's.
+
+Usage:
+    python fact_graph.py                              # 1000 problems each of 5- to 8-hop
+    python fact_graph.py --hops 6 --num 5000 --seed 1
+    python fact_graph.py --counts                     # just print the number of paths per hop count
+"""
+
+import argparse
+import random
+import time
+from bisect import bisect_right
+from itertools import accumulate
+from typing import List
+
+from generate_dataset import (
+    ALL_CONSUMERS,
+    CHAINABLE_CONSUMER_SUFFIXES,
+    NUMBER_GENERATORS,
+    NumberConsumer,
+    attach_answer_aliases,
+    save_dataset,
+)
+from generate_dataset_constants import MAPPING_REGISTRY
+from problems import Problem
+
+
+def consumer_hops(consumer: NumberConsumer) -> int:
+    """Chain steps one application of the consumer adds (the same for every number it accepts)."""
+    steps = consumer.get_properties(min(consumer.valid_numbers()), "0")["rest_of_chain"]
+    unknown = [step["mapping_id"] for step in steps if step["mapping_id"] not in MAPPING_REGISTRY]
+    assert not unknown, f"{consumer.id} uses mappings missing from MAPPING_REGISTRY: {unknown}"
+    return len(steps)
+
+
+class FactGraph:
+    """Path counts and uniform path sampling over NUMBER_GENERATORS and consumers."""
+
+    def __init__(self, number_generators=NUMBER_GENERATORS, consumers: List[NumberConsumer] = ALL_CONSUMERS):
+        self.number_generators = number_generators
+        # (consumer, hops, chainable) in a fixed order, so ranks map to the same paths on every run
+        self.edges = [
+            (consumer, consumer_hops(consumer), consumer.id.endswith(CHAINABLE_CONSUMER_SUFFIXES))
+            for consumer in consumers
+        ]
+        self._counts = {}
+        self._starts = {}
+
+    def options(self, chain_id: str, number: int, hops_left: int):
+        """[(consumer, hops, chainable, paths)] for every edge out of this node with at least one path."""
+        key = (chain_id, number, hops_left)
+        if key in self._counts:
+            return self._counts[key]
+        options = []
+        for consumer, hops, chainable in self.edges:
+            if hops > hops_left or number not in consumer.valid_numbers_for(chain_id):
+                continue
+            if hops == hops_left:
+                paths = 1
+            elif chainable:
+                answer = consumer.get_properties(number, "")["answer"]
+                paths = self.count(f"{chain_id}_{consumer.id}", answer, hops_left - hops)
+            else:
+                paths = 0
+            if paths:
+                options.append((consumer, hops, chainable, paths))
+        self._counts[key] = options
+        return options
+
+    def count(self, chain_id: str, number: int, hops_left: int) -> int:
+        """Number of paths that start at this node and end after exactly hops_left more steps."""
+        return sum(option[3] for option in self.options(chain_id, number, hops_left))
+
+    def starts(self, hops: int):
+        """([(generator id, item)], cumulative path counts) over every generator item, for hops-hop paths."""
+        if hops not in self._starts:
+            starts = []
+            counts = []
+            for generator in self.number_generators:
+                for item in generator["items"]:
+                    number, _, start_of_chain = item
+                    hops_left = hops - len(start_of_chain)
+                    paths = self.count(generator["id"], number, hops_left) if hops_left > 0 else 0
+                    if paths:
+                        starts.append((generator["id"], item))
+                        counts.append(paths)
+            self._starts[hops] = (starts, list(accumulate(counts)))
+        return self._starts[hops]
+
+    def total(self, hops: int) -> int:
+        _, cumulative = self.starts(hops)
+        return cumulative[-1] if cumulative else 0
+
+    def problem(self, hops: int, rank: int) -> Problem:
+        """The rank-th hops-hop path (0 <= rank < total(hops)) as a Problem."""
+        starts, cumulative = self.starts(hops)
+        index = bisect_right(cumulative, rank)
+        rank -= cumulative[index - 1] if index else 0
+        chain_id, (number, num_expr, start_of_chain) = starts[index]
+        chain = list(start_of_chain)
+        hops_left = hops - len(chain)
+        while True:
+            for consumer, consumer_hops_, chainable, paths in self.options(chain_id, number, hops_left):
+                if rank < paths:
+                    break
+                rank -= paths
+            props = consumer.get_properties(number, num_expr)
+            chain += props["rest_of_chain"]
+            hops_left -= consumer_hops_
+            if hops_left == 0:
+                return Problem.create(
+                    type=f"{hops}hop_{chain_id}_{consumer.id}",
+                    question=props["question"],
+                    answer=props["answer"],
+                    hops=hops,
+                    chain=chain,
+                )
+            # Same rewrite generate_dataset.py uses to turn a numeric answer into the next number expression
+            chain_id = f"{chain_id}_{consumer.id}"
+            number = props["answer"]
+            num_expr = f"({props['question'].replace('?', '')})"
+
+    def sample(self, hops: int, num: int, seed: int) -> List[Problem]:
+        """num distinct hops-hop problems drawn uniformly (all of them if there are fewer), in draw order."""
+        total = self.total(hops)
+        ranks = random.Random(seed).sample(range(total), min(num, total))
+        return [self.problem(hops, rank) for rank in ranks]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate N-hop problems by uniform sampling of fact-graph paths")
+    parser.add_argument("--hops", type=int, nargs="+", default=[5, 6, 7, 8], help="Hop counts to generate")
+    parser.add_argument("--num", type=int, default=1000, help="Problems per hop count (default: 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed (default: 0)")
+    parser.add_argument("--output-dir", type=str, default="data", help="Writes problems_{N}hop.jsonl here")
+    parser.add_argument("--counts", action="store_true", help="Only print the number of paths per hop count")
+    args = parser.parse_args()
+
+    graph = FactGraph()
+    for hops in args.hops:
+        start = time.perf_counter()
+        total = graph.total(hops)
+        if args.counts:
+            print(f"{hops}-hop: {total:,} paths ({time.perf_counter() - start:.2f}s)")
+            continue
+        problems = graph.sample(hops, args.num, seed=args.seed + hops)
+        attach_answer_aliases(problems)
+        print(f"{hops}-hop: sampled {len(problems)} of {total:,} paths in {time.perf_counter() - start:.2f}s")
+        if problems:
+            save_dataset(problems, f"{args.output_dir}/problems_{hops}hop.jsonl")
+            example = problems[0]
+            print(f"  Q: {example['question']}")
+            print(f"  A: {example['answer']}")
+            print(f"  Chain: {' -> '.join(str(step['value']) for step in example['chain'])}")
+
+
+if __name__ == "__main__":
+    main()
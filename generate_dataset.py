@@ -13,6 +13,14 @@ import argparse
 from typing import Counter, Dict, List, Any
 from pathlib import Path
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from problems import Problem, problem_json
+from profiling import profiled
+from sampling import Reservoir
+from sharding import MP_CONTEXT
+from scoring import accepted_answers, normalizer_version
 
 from generate_dataset_constants import (
     AGE_FACTS,
@@ -144,16 +152,40 @@ NOBEL_AWARD_CONFIGS = {
 
 
 class NumberConsumer(ABC):
-    """Base class for number consumers that transform a number into an answer."""
+    """
+    Base class for number consumers that transform a number into an answer.
+
+    Validity is declared up front rather than checked per number: valid_numbers() is the set of numbers
+    the consumer has facts for, and a generator can feed it unless its id contains excluded_generator
+    (e.g. no two Oscar lookups in one chain). gen_hop_generic intersects these with each generator's numbers.
+    """
+
+    # Generators whose id contains this can't feed this consumer
+    excluded_generator: str | None = None
+    # Numbers up to this from the fixed_num generator are excluded (too easy to make a real hop)
+    fixed_num_cutoff = 0
 
     def __init__(self):
         self.id: str = ""
 
     @abstractmethod
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        """Check if this number is valid for this consumer."""
+    def valid_numbers(self) -> set:
+        """Every number this consumer can build a problem from."""
         pass
 
+    def accepts_generator(self, num_gen_id: str) -> bool:
+        return self.excluded_generator is None or self.excluded_generator not in num_gen_id
+
+    @lru_cache(maxsize=None)
+    def valid_numbers_for(self, num_gen_id: str) -> frozenset:
+        """The numbers from generator num_gen_id that this consumer can take (empty if it takes none)."""
+        if not self.accepts_generator(num_gen_id):
+            return frozenset()
+        valid = self.valid_numbers()
+        if num_gen_id == "fixed_num" and self.fixed_num_cutoff:
+            valid = {num for num in valid if num > self.fixed_num_cutoff}
+        return frozenset(valid)
+
     @abstractmethod
     def get_properties(self, num: int, num_expr: str) -> Dict:
         """
@@ -175,17 +207,19 @@ class NumberConsumer(ABC):
 
 CUT_OFF_EARLY_FIXED_NUM_STATES = 5
 
+# Consumers whose (numeric) answers become the numbers of a further hop
+CHAINABLE_CONSUMER_SUFFIXES = ("birth_day", "join_day", "num_counties")
+
 
 class StateOrderConsumer(NumberConsumer):
+    excluded_generator = "state_order"
+    fixed_num_cutoff = CUT_OFF_EARLY_FIXED_NUM_STATES
+
     def __init__(self):
         self.id = "state_order"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if num_gen_id == "fixed_num" and num <= CUT_OFF_EARLY_FIXED_NUM_STATES:
-            return False
-        if "state_order" in num_gen_id:
-            return False
-        return num in US_STATE_BY_ORDER
+    def valid_numbers(self) -> set:
+        return set(US_STATE_BY_ORDER)
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         answer = US_STATE_BY_ORDER[num]
@@ -195,16 +229,17 @@ class StateOrderConsumer(NumberConsumer):
 
 
 class ElementConsumer(NumberConsumer):
+    fixed_num_cutoff = 10
+
     def __init__(self):
         self.id = "element"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
+    def valid_numbers(self) -> set:
+        return set(NUM_TO_ELEMENT)
+
+    def accepts_generator(self, num_gen_id: str) -> bool:
         # Don't use element generator with element consumer (circular)
-        if num_gen_id == "element":
-            return False
-        if num_gen_id == "fixed_num" and num <= 10:
-            return False
-        return num in NUM_TO_ELEMENT
+        return num_gen_id != "element"
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         answer = NUM_TO_ELEMENT[num]
@@ -214,15 +249,14 @@ class ElementConsumer(NumberConsumer):
 
 
 class StateOrderFlowerConsumer(NumberConsumer):
+    excluded_generator = "state_order"
+    fixed_num_cutoff = CUT_OFF_EARLY_FIXED_NUM_STATES
+
     def __init__(self):
         self.id = "state_order_state_flower"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if num_gen_id == "fixed_num" and num <= CUT_OFF_EARLY_FIXED_NUM_STATES:
-            return False
-        if "state_order" in num_gen_id:
-            return False
-        return num in US_STATE_BY_ORDER
+    def valid_numbers(self) -> set:
+        return set(US_STATE_BY_ORDER)
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         state = US_STATE_BY_ORDER[num]
@@ -236,15 +270,14 @@ class StateOrderFlowerConsumer(NumberConsumer):
 
 
 # class StateOrderJoinDayConsumer(NumberConsumer):
+#     excluded_generator = "state_order"
+#     fixed_num_cutoff = CUT_OFF_EARLY_FIXED_NUM_STATES
+
 #     def __init__(self):
 #         self.id = "state_order_join_day"
 
-#     def is_valid(self, num: int, num_gen_id: str) -> bool:
-#         if num_gen_id == "fixed_num" and num <= CUT_OFF_EARLY_FIXED_NUM_STATES:
-#             return False
-#         if "state_order" in num_gen_id:
-#             return False
-#         return num in US_STATE_BY_ORDER
+#     def valid_numbers(self) -> set:
+#         return set(US_STATE_BY_ORDER)
 
 #     def get_properties(self, num: int, num_expr: str) -> Dict:
 #         state = US_STATE_BY_ORDER[num]
@@ -258,15 +291,14 @@ class StateOrderFlowerConsumer(NumberConsumer):
 
 
 class StateOrderNumCountiesConsumer(NumberConsumer):
+    excluded_generator = "state_order"
+    fixed_num_cutoff = CUT_OFF_EARLY_FIXED_NUM_STATES
+
     def __init__(self):
         self.id = "state_order_num_counties"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if num_gen_id == "fixed_num" and num <= CUT_OFF_EARLY_FIXED_NUM_STATES:
-            return False
-        if "state_order" in num_gen_id:
-            return False
-        return num in US_STATE_BY_ORDER and US_STATE_BY_ORDER[num] in US_STATE_TO_COUNTIES
+    def valid_numbers(self) -> set:
+        return {num for num, state in US_STATE_BY_ORDER.items() if state in US_STATE_TO_COUNTIES}
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         state = US_STATE_BY_ORDER[num]
@@ -284,8 +316,8 @@ class MissAmericaConsumer(NumberConsumer):
         self.id = f"miss_america_{start_year}"
         self.start_year = start_year
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        return num < 100 and self.start_year + num in MISS_AMERICA
+    def valid_numbers(self) -> set:
+        return {year - self.start_year for year in MISS_AMERICA if year - self.start_year < 100}
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         year = self.start_year + num
@@ -296,6 +328,8 @@ class MissAmericaConsumer(NumberConsumer):
 
 
 class OscarConsumer(NumberConsumer):
+    excluded_generator = "oscar"
+
     def __init__(self, award_type: str, start_year: int):
         self.award_type = award_type
         self.config = OSCAR_AWARD_CONFIGS[award_type]
@@ -303,10 +337,8 @@ class OscarConsumer(NumberConsumer):
         self.start_year = start_year
         self.mapping_id = f"year_to_oscar_{award_type}"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if "oscar" in num_gen_id:
-            return False
-        return num < 100 and self.start_year + num in self.config["year_dict"]
+    def valid_numbers(self) -> set:
+        return {year - self.start_year for year in self.config["year_dict"] if year - self.start_year < 100}
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         year = self.start_year + num
@@ -320,15 +352,14 @@ class OscarConsumer(NumberConsumer):
 
 
 class StateOrderMottoConsumer(NumberConsumer):
+    excluded_generator = "state_order"
+    fixed_num_cutoff = CUT_OFF_EARLY_FIXED_NUM_STATES
+
     def __init__(self):
         self.id = "state_order_state_motto"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if num_gen_id == "fixed_num" and num <= CUT_OFF_EARLY_FIXED_NUM_STATES:
-            return False
-        if "state_order" in num_gen_id:
-            return False
-        return num in US_STATE_BY_ORDER
+    def valid_numbers(self) -> set:
+        return set(US_STATE_BY_ORDER)
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         state = US_STATE_BY_ORDER[num]
@@ -351,6 +382,8 @@ def get_num_expr_start_year(start_year: int, num_expr: str) -> str:
 
 
 class OscarBirthYearConsumer(NumberConsumer):
+    excluded_generator = "oscar"
+
     def __init__(self, award_type: str, start_year: int):
         self.award_type = award_type
         self.config = OSCAR_AWARD_CONFIGS[award_type]
@@ -359,13 +392,12 @@ class OscarBirthYearConsumer(NumberConsumer):
         self.year_mapping_id = f"year_to_oscar_{award_type}"
         self.birth_year_mapping_id = f"oscar_{award_type}_to_birth_year"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if num >= 100:
-            return False
-        if "oscar" in num_gen_id:
-            return False
-        year = self.start_year + num
-        return year in self.config["year_dict"] and self.config["year_dict"][year] in self.config["birth_year_dict"]
+    def valid_numbers(self) -> set:
+        return {
+            year - self.start_year
+            for year, winner in self.config["year_dict"].items()
+            if year - self.start_year < 100 and winner in self.config["birth_year_dict"]
+        }
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         year = self.start_year + num
@@ -381,6 +413,8 @@ class OscarBirthYearConsumer(NumberConsumer):
 
 
 class OscarBirthDayConsumer(NumberConsumer):
+    excluded_generator = "oscar"
+
     def __init__(self, award_type: str, start_year: int):
         self.award_type = award_type
         self.config = OSCAR_AWARD_CONFIGS[award_type]
@@ -389,13 +423,12 @@ class OscarBirthDayConsumer(NumberConsumer):
         self.year_mapping_id = f"year_to_oscar_{award_type}"
         self.birth_day_mapping_id = f"oscar_{award_type}_to_birth_day"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if num >= 100:
-            return False
-        if "oscar" in num_gen_id:
-            return False
-        year = self.start_year + num
-        return year in self.config["year_dict"] and self.config["year_dict"][year] in self.config["birth_day_dict"]
+    def valid_numbers(self) -> set:
+        return {
+            year - self.start_year
+            for year, winner in self.config["year_dict"].items()
+            if year - self.start_year < 100 and winner in self.config["birth_day_dict"]
+        }
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         year = self.start_year + num
@@ -411,16 +444,16 @@ class OscarBirthDayConsumer(NumberConsumer):
 
 
 class OscarOrderConsumer(NumberConsumer):
+    excluded_generator = "oscar"
+
     def __init__(self, award_type: str):
         self.award_type = award_type
         self.config = OSCAR_AWARD_CONFIGS[award_type]
         self.id = f"oscar_{award_type}_order"
         self.order_mapping_id = f"order_to_oscar_{award_type}"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if "oscar" in num_gen_id:
-            return False
-        return num in self.config["by_order_dict"]
+    def valid_numbers(self) -> set:
+        return set(self.config["by_order_dict"])
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         answer = self.config["by_order_dict"][num]
@@ -433,6 +466,8 @@ class OscarOrderConsumer(NumberConsumer):
 
 
 class OscarOrderBirthYearConsumer(NumberConsumer):
+    excluded_generator = "oscar"
+
     def __init__(self, award_type: str):
         self.award_type = award_type
         self.config = OSCAR_AWARD_CONFIGS[award_type]
@@ -440,12 +475,8 @@ class OscarOrderBirthYearConsumer(NumberConsumer):
         self.order_mapping_id = f"order_to_oscar_{award_type}"
         self.birth_year_mapping_id = f"oscar_{award_type}_to_birth_year"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if "oscar" in num_gen_id:
-            return False
-        return (
-            num in self.config["by_order_dict"] and self.config["by_order_dict"][num] in self.config["birth_year_dict"]
-        )
+    def valid_numbers(self) -> set:
+        return {num for num, winner in self.config["by_order_dict"].items() if winner in self.config["birth_year_dict"]}
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         winner = self.config["by_order_dict"][num]
@@ -462,6 +493,8 @@ class OscarOrderBirthYearConsumer(NumberConsumer):
 
 
 class OscarOrderBirthDayConsumer(NumberConsumer):
+    excluded_generator = "oscar"
+
     def __init__(self, award_type: str):
         self.award_type = award_type
         self.config = OSCAR_AWARD_CONFIGS[award_type]
@@ -469,12 +502,8 @@ class OscarOrderBirthDayConsumer(NumberConsumer):
         self.order_mapping_id = f"order_to_oscar_{award_type}"
         self.birth_day_mapping_id = f"oscar_{award_type}_to_birth_day"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if "oscar" in num_gen_id:
-            return False
-        return (
-            num in self.config["by_order_dict"] and self.config["by_order_dict"][num] in self.config["birth_day_dict"]
-        )
+    def valid_numbers(self) -> set:
+        return {num for num, winner in self.config["by_order_dict"].items() if winner in self.config["birth_day_dict"]}
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         winner = self.config["by_order_dict"][num]
@@ -491,6 +520,8 @@ class OscarOrderBirthDayConsumer(NumberConsumer):
 
 
 class NobelConsumer(NumberConsumer):
+    excluded_generator = "nobel"
+
     def __init__(self, award_type: str, start_year: int):
         self.award_type = award_type
         self.config = NOBEL_AWARD_CONFIGS[award_type]
@@ -498,10 +529,8 @@ class NobelConsumer(NumberConsumer):
         self.start_year = start_year
         self.year_mapping_id = f"year_to_nobel_{award_type}"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if "nobel" in num_gen_id:
-            return False
-        return num < 100 and self.start_year + num in self.config["year_dict"]
+    def valid_numbers(self) -> set:
+        return {year - self.start_year for year in self.config["year_dict"] if year - self.start_year < 100}
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         year = self.start_year + num
@@ -513,6 +542,8 @@ class NobelConsumer(NumberConsumer):
 
 
 class NobelBirthYearConsumer(NumberConsumer):
+    excluded_generator = "nobel"
+
     def __init__(self, award_type: str, start_year: int):
         self.award_type = award_type
         self.config = NOBEL_AWARD_CONFIGS[award_type]
@@ -521,13 +552,12 @@ class NobelBirthYearConsumer(NumberConsumer):
         self.year_mapping_id = f"year_to_nobel_{award_type}"
         self.birth_year_mapping_id = f"nobel_{award_type}_to_birth_year"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if num >= 100:
-            return False
-        if "nobel" in num_gen_id:
-            return False
-        year = self.start_year + num
-        return year in self.config["year_dict"] and self.config["year_dict"][year] in self.config["birth_year_dict"]
+    def valid_numbers(self) -> set:
+        return {
+            year - self.start_year
+            for year, winner in self.config["year_dict"].items()
+            if year - self.start_year < 100 and winner in self.config["birth_year_dict"]
+        }
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         year = self.start_year + num
@@ -545,6 +575,8 @@ class NobelBirthYearConsumer(NumberConsumer):
 
 
 class NobelBirthDayConsumer(NumberConsumer):
+    excluded_generator = "nobel"
+
     def __init__(self, award_type: str, start_year: int):
         self.award_type = award_type
         self.config = NOBEL_AWARD_CONFIGS[award_type]
@@ -553,13 +585,12 @@ class NobelBirthDayConsumer(NumberConsumer):
         self.year_mapping_id = f"year_to_nobel_{award_type}"
         self.birth_day_mapping_id = f"nobel_{award_type}_to_birth_day"
 
-    def is_valid(self, num: int, num_gen_id: str) -> bool:
-        if num >= 100:
-            return False
-        if "nobel" in num_gen_id:
-            return False
-        year = self.start_year + num
-        return year in self.config["year_dict"] and self.config["year_dict"][year] in self.config["birth_day_dict"]
+    def valid_numbers(self) -> set:
+        return {
+            year - self.start_year
+            for year, winner in self.config["year_dict"].items()
+            if year - self.start_year < 100 and winner in self.config["birth_day_dict"]
+        }
 
     def get_properties(self, num: int, num_expr: str) -> Dict:
         year = self.start_year + num
@@ -635,7 +666,7 @@ NUMBER_GENERATORS = [
     },
 ]
 
-# All number consumers (will be filtered by is_valid to determine which generators they work with)
+# All number consumers (valid_numbers_for determines which generators they work with)
 ALL_CONSUMERS = [
     StateOrderConsumer(),
     ElementConsumer(),
@@ -685,19 +716,28 @@ ALL_CONSUMERS = [
 ]
 
 
+def generator_numbers(generator) -> set:
+    """Set of the numbers a generator produces (cached on the generator dict)."""
+    if "numbers" not in generator:
+        generator["numbers"] = {number for number, _, _ in generator["items"]}
+    return generator["numbers"]
+
+
 def gen_hop_generic(generator, consumer: NumberConsumer, seed: int, num: int | None = None) -> List[Dict]:
     """Generic problem generator combining a number generator and consumer."""
-    random.seed(seed)
+    # Most generator/consumer pairs share no numbers; skip those before touching the items
+    valid_numbers = consumer.valid_numbers_for(generator["id"]) & generator_numbers(generator)
+    if not valid_numbers:
+        return []
+
+    # Own RNG rather than the global one, so pairs can run in any process and order
+    rng = random.Random(seed)
     problems = []
 
-    # Get all items from generator and filter by consumer's valid range
+    # Get all items from generator and keep the numbers the consumer can take
     all_items = generator["items"]
-    valid = [
-        (number, num_expr, start_of_chain)
-        for number, num_expr, start_of_chain in all_items
-        if consumer.is_valid(number, generator["id"])
-    ]
-    random.shuffle(valid)
+    valid = [item for item in all_items if item[0] in valid_numbers]
+    rng.shuffle(valid)
 
     # only use non-repeated nums (do this after shuffle to randomize)
     num_used = set()
@@ -722,27 +762,81 @@ def gen_hop_generic(generator, consumer: NumberConsumer, seed: int, num: int | N
         hops = len(chain)
 
         problems.append(
-            {
-                "type": f"{hops}hop_{generator['id']}_{consumer.id}",
-                "question": props["question"],
-                "answer": props["answer"],
-                "hops": hops,
-                "chain": chain,
-            }
+            Problem.create(
+                type=f"{hops}hop_{generator['id']}_{consumer.id}",
+                question=props["question"],
+                answer=props["answer"],
+                hops=hops,
+                chain=chain,
+            )
         )
 
     return problems
 
 
+def gen_hops_for_generator(generator, consumers: List[NumberConsumer], seed: int) -> List[Dict]:
+    """gen_hop_generic for one generator with each consumer in turn (seeds seed, seed + 1, ...)."""
+    problems = []
+    for offset, consumer in enumerate(consumers):
+        problems.extend(gen_hop_generic(generator, consumer, seed=seed + offset, num=None))
+    return problems
+
+
+def gen_hops(generators, consumers: List[NumberConsumer], seed: int, executor=None) -> List[Dict]:
+    """
+    Problems for every (generator, consumer) pair, seeded seed, seed + 1, ... in generator-major order.
+    With an executor each generator is one task; results are merged in submission order, so the output
+    doesn't depend on the executor or its worker count.
+    """
+    seeds = [seed + i * len(consumers) for i in range(len(generators))]
+    tasks = (generators, [consumers] * len(generators), seeds)
+    batches = executor.map(gen_hops_for_generator, *tasks) if executor else map(gen_hops_for_generator, *tasks)
+    return [problem for batch in batches for problem in batch]
+
+
 # =============================================================================
 # MAIN
 # =============================================================================
 
 
-def generate_all_problems(only_salient_facts: bool = False):
-    """Generate all problems."""
-    all_problems = []
+# First-round generator items x consumers below which workers > 1 still generates serially. Starting spawned
+# workers and pickling the generators costs about a second, while the full fact tables (~60k) take ~0.3 s
+MIN_PARALLEL_WORK = 1_000_000
+
+
+def generation_work(number_generators_use, consumers_use) -> int:
+    """Size of the first round: generator items x consumers."""
+    return sum(len(generator["items"]) for generator in number_generators_use) * len(consumers_use)
 
+
+def generate_all_problems(only_salient_facts: bool = False, workers: int = 1):
+    """
+    Generate all problems. workers > 1 spreads the (generator, consumer) pairs over a process pool once the
+    work reaches MIN_PARALLEL_WORK; smaller fact tables are generated serially.
+    """
+    number_generators_use, consumers_use = generation_inputs(only_salient_facts)
+
+    work = generation_work(number_generators_use, consumers_use)
+    if workers > 1 and work < MIN_PARALLEL_WORK:
+        print(f"Generating serially: {work:,} item-consumer pairs is below the {MIN_PARALLEL_WORK:,} where --workers pays off")
+        workers = 1
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=MP_CONTEXT) if workers > 1 else None
+    try:
+        all_problems = generate_problems_in_rounds(number_generators_use, consumers_use, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # Separate by hop count (filtering out elements with 1 hop)
+    by_hops = defaultdict(list)
+    for p in all_problems:
+        by_hops[p["hops"]].append(p)
+
+    return by_hops[1], by_hops[2], by_hops[3], by_hops[4]
+
+
+def generation_inputs(only_salient_facts: bool = False):
+    """(number generators, consumers) to generate from."""
     number_generators_use = NUMBER_GENERATORS
     consumers_use = ALL_CONSUMERS
 
@@ -756,23 +850,53 @@ def generate_all_problems(only_salient_facts: bool = False):
             ElementConsumer(),
         ]
 
+    return number_generators_use, consumers_use
 
 
+def generate_problems_in_rounds(number_generators_use, consumers_use, executor=None) -> List[Dict]:
+    """
+    Two rounds of gen_hops: every number generator with every consumer, then the numeric answers of the
+    first round (birth days, county counts) as new generators with every consumer.
+    """
     seed = 128
-    for gen in number_generators_use:
-        for cons in consumers_use:
-            problems = gen_hop_generic(gen, cons, seed=seed, num=None)
-            all_problems.extend(problems)
+    all_problems = gen_hops(number_generators_use, consumers_use, seed, executor)
+    seed += len(number_generators_use) * len(consumers_use)
+
+    all_problems.extend(gen_hops(numeric_generators(all_problems), consumers_use, seed, executor))
+    return all_problems
+
+
+def iter_problems_in_rounds(number_generators_use, consumers_use):
+    """
+    generate_problems_in_rounds as a stream: yields the same problems in the same order, holding only the
+    first-round problems with numeric answers (the second round's generators) rather than every problem.
+    """
+    seed = 128
+    chainable = []
+    for generator in number_generators_use:
+        for consumer in consumers_use:
+            for problem in gen_hop_generic(generator, consumer, seed=seed, num=None):
+                if problem["type"].endswith(CHAINABLE_CONSUMER_SUFFIXES):
+                    chainable.append(problem)
+                yield problem
             seed += 1
 
+    for generator in numeric_generators(chainable):
+        for consumer in consumers_use:
+            yield from gen_hop_generic(generator, consumer, seed=seed, num=None)
+            seed += 1
+
+
+def numeric_generators(problems) -> List[Dict]:
+    """Number generators made from the problems with numeric answers, one per problem type."""
     new_numeric_generators = defaultdict(list)
-    for p in all_problems:
+    for p in problems:
 
         assert int(p["type"][0]) in [1, 2, 3, 4]
         clean_type_id = p["type"][1:]
         assert clean_type_id.startswith("hop_")
         clean_type_id = clean_type_id.removeprefix("hop_")
-        if p["type"].endswith("birth_day") or p["type"].endswith("join_day") or p["type"].endswith("num_counties"):
+        if p["type"].endswith(CHAINABLE_CONSUMER_SUFFIXES):
             assert isinstance(p["answer"], int)
             # assert 0 < p["answer"] < 100
             new_numeric_generators[clean_type_id].append(
@@ -783,21 +907,7 @@ def generate_all_problems(only_salient_facts: bool = False):
                 )
             )
 
-    new_numeric_generators_fin = [{"id": k, "items": v} for k, v in new_numeric_generators.items()]
-
-    for gen in new_numeric_generators_fin:
-        for cons in consumers_use:
-            problems = gen_hop_generic(gen, cons, seed=seed, num=None)
-            all_problems.extend(problems)
-            seed += 1
-
-    # Separate by hop count (filtering out elements with 1 hop)
-    all_1hop = [p for p in all_problems if p["hops"] == 1]
-    all_2hop = [p for p in all_problems if p["hops"] == 2]
-    all_3hop = [p for p in all_problems if p["hops"] == 3]
-    all_4hop = [p for p in all_problems if p["hops"] == 4]
-
-    return all_1hop, all_2hop, all_3hop, all_4hop
+    return [{"id": k, "items": v} for k, v in new_numeric_generators.items()]
 
 
 def generate_single_hop_questions_auto():
@@ -808,6 +918,26 @@ def generate_single_hop_questions_auto():
     return out
 
 
+# Downsampling keep rates per hop count: (Oscar, Nobel). Both apply to a problem using both.
+DOWNSAMPLE_KEEP_RATES = {
+    2: (0.2, 0.3),
+    3: (0.13, 0.25),
+    4: (0.1, 0.13),
+}
+
+
+def attach_answer_aliases(problems: List[Dict]):
+    """
+    Store each problem's normalized accepted answers (the answer plus its ANSWER_ALIASES) as "answer_aliases",
+    and the normalizer_version that normalized them (scoring.problem_aliases ignores aliases from another
+    version). Problems with the same answer share one frozenset; it is saved as a sorted list.
+    """
+    version = normalizer_version()
+    for p in problems:
+        p["answer_aliases"] = accepted_answers(p["answer"], p["chain"][-1]["mapping_id"])
+        p["normalizer_version"] = version
+
+
 def save_dataset(problems: List[Dict], filepath: str):
     """Save problems to JSONL file."""
     import os
@@ -815,7 +945,7 @@ def save_dataset(problems: List[Dict], filepath: str):
     os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
     with open(filepath, "w", encoding="utf-8") as f:
         for problem in problems:
-            f.write(json.dumps(problem, ensure_ascii=False) + "\n")
+            f.write(problem_json(problem) + "\n")
     print(f"Saved {len(problems)} problems to {filepath}")
 
 
@@ -847,10 +977,91 @@ def main():
         help="Only use salient facts for generation (fewer problems)",
 
     )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="profiles/generate_dataset.prof",
+        default=None,
+        metavar="PROF_FILE",
+        help="Run under cProfile and save pstats to PROF_FILE (default: profiles/generate_dataset.prof)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=(
+            "Downsample and cut the generated problems as they are produced, holding only the samples in memory "
+            "(one reservoir per hop level, written to JSONL once generation ends). Generation is serial, so "
+            "--workers is not supported"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Processes to generate (generator, consumer) pairs in; the output is the same for any count. Only "
+            "pays off for fact tables much larger than the current ones, so smaller runs stay serial (default: 1)"
+        ),
+    )
     args = parser.parse_args()
+    if args.stream and args.workers > 1:
+        parser.error("--stream generates serially and cannot use --workers")
+
+    with profiled(args.profile):
+        generate_datasets(args)
+
+
+def generate_datasets(args):
+    """Generate, shuffle, downsample and save every dataset for the parsed command line arguments."""
+    if args.stream:
+        all_2hop, all_3hop, all_4hop = stream_datasets(args)
+    else:
+        all_2hop, all_3hop, all_4hop = sample_datasets(args)
+
+    report_and_save_datasets(all_2hop, all_3hop, all_4hop, args)
+
+
+def keep_rate(problem: Dict) -> float:
+    """Probability that downsampling keeps the problem (the product of its DOWNSAMPLE_KEEP_RATES)."""
+    oscar_keep_rate, nobel_keep_rate = DOWNSAMPLE_KEEP_RATES[problem["hops"]]
+    rate = 1.0
+    if "oscar" in problem["type"]:
+        rate *= oscar_keep_rate
+    if "nobel" in problem["type"]:
+        rate *= nobel_keep_rate
+    return rate
+
+
+def stream_datasets(args):
+    """
+    --stream: the downsampled, cut 2-, 3- and 4-hop datasets drawn from generated problems as they are
+    produced, one Reservoir per hop level, so memory depends on --num-Nhop rather than the candidate pool.
+    Same distribution as sample_datasets, but not the same draws.
+    """
+    rng = random.Random(101)
+    targets = {2: args.num_2hop, 3: args.num_3hop, 4: args.num_4hop}
+    reservoirs = {
+        hops: Reservoir(target if target is not None else float("inf"), rng) for hops, target in targets.items()
+    }
+    for p in iter_problems_in_rounds(*generation_inputs(args.only_salient_facts)):
+        if p["hops"] in reservoirs:
+            reservoirs[p["hops"]].add(p, keep_rate(p))
+
+    samples = {hops: reservoir.items() for hops, reservoir in reservoirs.items()}
+    for hops, reservoir in reservoirs.items():
+        print(
+            f"Streamed {reservoir.seen} {hops}-hop problems: {reservoir.kept} after downsampling, "
+            f"sampled {len(samples[hops])}"
+        )
+    return samples[2], samples[3], samples[4]
 
+
+def sample_datasets(args):
+    """The downsampled, cut 2-, 3- and 4-hop datasets, from every generated problem held in memory."""
     # Generate all problems
-    _, all_2hop, all_3hop, all_4hop = generate_all_problems(only_salient_facts=args.only_salient_facts)
+    _, all_2hop, all_3hop, all_4hop = generate_all_problems(
+        only_salient_facts=args.only_salient_facts, workers=args.workers
+    )
 
     print(f"Generated {len(all_2hop)} 2-hop problems")
     print(f"Generated {len(all_3hop)} 3-hop problems")
@@ -878,9 +1089,9 @@ def main():
             result.append(p)
         return result
 
-    all_2hop = downsample(all_2hop, oscar_keep_rate=0.2, nobel_keep_rate=0.3)
-    all_3hop = downsample(all_3hop, oscar_keep_rate=0.13, nobel_keep_rate=0.25)
-    all_4hop = downsample(all_4hop, oscar_keep_rate=0.1, nobel_keep_rate=0.13)
+    all_2hop = downsample(all_2hop, *DOWNSAMPLE_KEEP_RATES[2])
+    all_3hop = downsample(all_3hop, *DOWNSAMPLE_KEEP_RATES[3])
+    all_4hop = downsample(all_4hop, *DOWNSAMPLE_KEEP_RATES[4])
 
     print(f"After downsampling problems:")
     print(f"  {len(all_2hop)} 2-hop problems")
@@ -898,6 +1109,11 @@ def main():
         all_4hop = all_4hop[: args.num_4hop]
         print(f"Cut 4-hop to {len(all_4hop)} problems")
 
+    return all_2hop, all_3hop, all_4hop
+
+
+def report_and_save_datasets(all_2hop, all_3hop, all_4hop, args):
+    """Print the Oscar/Nobel fractions, save each dataset (with answer aliases) and print examples."""
     # Print Oscar problem fractions
     def print_oscar_fraction(problems, label):
         """Print fraction of problems that are Oscar problems."""
@@ -932,6 +1148,8 @@ def main():
     # all_problems_for_counts = all_2hop + all_3hop + all_4hop
     # print_type_counts(all_problems_for_counts, "ALL")
 
+    attach_answer_aliases(all_2hop + all_3hop + all_4hop)
+
     # Save individual datasets
     prefix = "data/salient_" if args.only_salient_facts else "data/"
     save_dataset(all_2hop, f"{prefix}problems_2hop.jsonl")
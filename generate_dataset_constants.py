@@ -1,6 +1,10 @@
 import json
+import os
 from typing import Counter
 
+# Fact files live next to this module, so importing it works from any working directory
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
 # =============================================================================
 # FACT TABLES
 # =============================================================================
@@ -3256,14 +3260,14 @@ US_STATE_MOTTOS = {
 
 
 # Load facts
-with open("data/age_facts.json") as f:
+with open(os.path.join(DATA_DIR, "age_facts.json")) as f:
     AGE_FACTS = json.load(f)
     AGE_FACTS = [
         fact
         for fact in AGE_FACTS
         if all(x not in fact["question"] for x in ["Agnes Pockels", "Antonín Dvořák", "Fred Sersen", "L. B. Abbott"])
     ]
-with open("data/static_facts.json") as f:
+with open(os.path.join(DATA_DIR, "static_facts.json")) as f:
     STATIC_FACTS = json.load(f)
 
 # Create mappings by answer value for quick lookup
@@ -3732,3 +3736,33 @@ def get_mapping_registry():
 
 # Export a singleton for convenience
 MAPPING_REGISTRY = get_mapping_registry()
+
+
+# Other accepted spellings of specific answer values, keyed by mapping_id then value. generate_dataset.py
+# normalizes these into each problem's "answer_aliases", so scoring a prediction is a single set lookup
+# however many aliases there are.
+ANSWER_ALIASES = {
+    "year_to_nobel_chemistry": {
+        "Robert Bruce Merrifield": ["Bruce Merrifield"],
+        "Emil Fischer": ["Hermann Emil Fischer"],
+        "Petrus Debye": ["Peter Debye"],
+        "Adolf Otto Reinhold Windaus": ["Adolf Windaus"],
+    },
+    "year_to_nobel_peace": {
+        "Óscar Arias": ["Óscar Arias Sánchez"],
+        "John Boyd Orr": ["Boyd Orr"],
+        "Randal Cremer": ["William Randal Cremer"],
+        "Rigoberta Menchú": ["Rigoberta Menchú Tum"],
+    },
+    "state_to_motto": {
+        "Fatti Maschii, Parole Femine": ["Fatti Maschi, Parole Femine"],
+        "We Dare Defend Our Rights": ["Audemus Jura Nostra Defendere"],
+    },
+    "state_to_flower": {
+        "Hawaiian Hibiscus": ["Hibiscus"],
+        "White Hawthorn Blossom": ["Hawthorn"],
+        "Common Meadow Violet": ["Violet"],
+        "Violet": ["Common Meadow Violet"],
+        "Yucca Flower": ["Yucca"],
+    },
+}
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Local mock LLM server for load-testing the eval harness without paying a provider.
+
+Speaks the Anthropic Messages API (POST /v1/messages) and the OpenAI/OpenRouter chat-completions API
+(POST /v1/chat/completions). Answers come from the gold answers in the dataset files: the question is
+taken from the "Question: ..." line of the last user message, and whether the reply is right is a
+deterministic function of (question, seed), so the same run gets the same answers every time.
+
+Failure modes are injected at configurable rates: 429 rate limits, 529 overloaded errors, hangs
+(longer than the harness timeout), empty responses, and for Gemini models the `reasoning` field that
+makes the harness retry.
+
+Usage:
+    python mock_llm_server.py --port 8765 --latency lognormal:0.8:0.5 --rate-limit-rate 0.05
+    python eval_multi_hop.py --model opus-4 --base-url http://127.0.0.1:8765 -n 500 -c 100
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUESTION_RE = re.compile(r"^Question(?: \(repeat #\d+\))?: (.*)$", re.MULTILINE)
+
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution spec into a zero-argument sampler returning seconds.
+
+    fixed:S, uniform:LO:HI, exponential:MEAN, lognormal:MEDIAN:SIGMA
+    """
+    kind, *params = spec.split(":")
+    params = [float(p) for p in params]
+    if kind == "fixed" and len(params) == 1:
+        return lambda rng: params[0]
+    if kind == "uniform" and len(params) == 2:
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == "exponential" and len(params) == 1:
+        return lambda rng: rng.expovariate(1 / params[0]) if params[0] > 0 else 0.0
+    if kind == "lognormal" and len(params) == 2:
+        return lambda rng: rng.lognormvariate(math.log(params[0]), params[1])
+    raise argparse.ArgumentTypeError(
+        f"Bad latency spec {spec!r} (use fixed:S, uniform:LO:HI, exponential:MEAN or lognormal:MEDIAN:SIGMA)"
+    )
+
+
+def load_answers(paths):
+    """Map question text -> (gold answer, problem type) over all dataset files."""
+    answers = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    problem = json.loads(line)
+                    question = problem.get("question", problem.get("problem", ""))
+                    answers[question] = (problem["answer"], problem.get("type", "unknown"))
+    return answers
+
+
+def message_text(message):
+    content = message.get("content", "")
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def estimate_tokens(messages):
+    return max(1, sum(len(message_text(m)) for m in messages) // 4)
+
+
+class MockLLM:
+    """Answer and failure-injection policy shared by all handler threads."""
+
+    def __init__(self, args):
+        self.answers = load_answers(args.dataset)
+        self.latency = args.latency
+        self.accuracy = args.accuracy
+        self.seed = args.seed
+        self.rate_limit_rate = args.rate_limit_rate
+        self.overloaded_rate = args.overloaded_rate
+        self.timeout_rate = args.timeout_rate
+        self.hang_seconds = args.hang_seconds
+        self.empty_rate = args.empty_rate
+        self.reasoning_rate = args.reasoning_rate
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+        # Wrong answers are drawn from other gold answers of the same problem type
+        self.answers_by_type = defaultdict(list)
+        for answer, problem_type in self.answers.values():
+            self.answers_by_type[problem_type].append(answer)
+
+    def draw(self):
+        """(uniform draw for failure injection, latency in seconds) from the shared seeded RNG."""
+        with self.lock:
+            return self.rng.random(), self.latency(self.rng)
+
+    def count(self, outcome):
+        with self.lock:
+            self.stats[outcome] += 1
+
+    def unit(self, question, salt):
+        digest = hashlib.sha256(f"{self.seed}:{salt}:{question}".encode()).digest()
+        return int.from_bytes(digest[:8], "big") / 2**64
+
+    def answer(self, messages):
+        user_texts = [message_text(m) for m in messages if m.get("role") == "user"]
+        match = QUESTION_RE.search(user_texts[-1]) if user_texts else None
+        if match is None or match.group(1) not in self.answers:
+            self.count("unknown_question")
+            return "I don't know"
+        question = match.group(1)
+        gold, problem_type = self.answers[question]
+        if self.unit(question, "correct") < self.accuracy:
+            return str(gold)
+        others = [a for a in self.answers_by_type[problem_type] if str(a) != str(gold)]
+        if others:
+            return str(others[int(self.unit(question, "wrong") * len(others))])
+        return str(gold + 1) if isinstance(gold, int) else f"Not {gold}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockLLM/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status in (429, 529):
+            self.send_header("retry-after-ms", "0")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.server.llm.lock:
+                self.send_json(200, dict(self.server.llm.stats))
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        llm = self.server.llm
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.endswith("/messages"):
+            api = "anthropic"
+        elif self.path.endswith("/chat/completions"):
+            api = "openai"
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        u, latency = llm.draw()
+        time.sleep(latency)
+
+        # Failure injection: each mode takes its own slice of [0, 1)
+        for outcome, rate, status in [
+            ("rate_limited", llm.rate_limit_rate, 429),
+            ("overloaded", llm.overloaded_rate, 529),
+        ]:
+            if u < rate:
+                llm.count(outcome)
+                self.send_error_json(api, status)
+                return
+            u -= rate
+        if u < llm.timeout_rate:
+            llm.count("hung")
+            time.sleep(llm.hang_seconds)
+            self.close_connection = True
+            return
+        u -= llm.timeout_rate
+
+        messages = body.get("messages", [])
+        text = llm.answer(messages)
+        reasoning = None
+        if u < llm.empty_rate:
+            llm.count("empty")
+            text = ""
+        elif api == "openai" and "gemini" in body.get("model", "") and u - llm.empty_rate < llm.reasoning_rate:
+            llm.count("reasoning")
+            reasoning = "Let me work through this step by step."
+        else:
+            llm.count("ok")
+        # With an assistant prefill ("Answer:") the reply continues the prefill
+        if text and messages and messages[-1].get("role") == "assistant":
+            text = " " + text
+
+        input_tokens = estimate_tokens(messages)
+        output_tokens = max(1, len(text) // 4)
+        if api == "anthropic":
+            self.send_json(
+                200,
+                {
+                    "id": f"msg_mock_{llm.stats.total()}",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": body.get("model"),
+                    "content": [{"type": "text", "text": text}],
+                    "stop_reason": "end_turn",
+                    "stop_sequence": None,
+                    "usage": {
+                        "input_tokens": input_tokens,
+                        "output_tokens": output_tokens,
+                        "cache_creation_input_tokens": 0,
+                        "cache_read_input_tokens": 0,
+                    },
+                },
+            )
+        else:
+            message = {"role": "assistant", "content": text}
+            if reasoning is not None:
+                message["reasoning"] = reasoning
+            self.send_json(
+                200,
+                {
+                    "id": f"chatcmpl-mock-{llm.stats.total()}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                    "usage": {
+                        "prompt_tokens": input_tokens,
+                        "completion_tokens": output_tokens,
+                        "total_tokens": input_tokens + output_tokens,
+                        "prompt_tokens_details": {"cached_tokens": 0},
+                    },
+                },
+            )
+
+    def send_error_json(self, api, status):
+        error_type, message = {
+            429: ("rate_limit_error", "Mock rate limit exceeded"),
+            529: ("overloaded_error", "Mock server overloaded"),
+        }[status]
+        if api == "anthropic":
+            self.send_json(status, {"type": "error", "error": {"type": error_type, "message": message}})
+        else:
+            self.send_json(status, {"error": {"message": message, "type": error_type, "code": status}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Anthropic/OpenAI-compatible LLM server for load tests")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--dataset",
+        type=str,
+        nargs="+",
+        default=["data/problems_all.jsonl", "data/addition_problems.jsonl"],
+        help="JSONL files whose gold answers the server replies with",
+    )
+    parser.add_argument("--accuracy", type=float, default=0.5, help="Fraction of questions answered correctly")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for answers and failure injection")
+    parser.add_argument(
+        "--latency",
+        type=parse_latency,
+        default="lognormal:0.5:0.4",
+        help="Latency distribution: fixed:S, uniform:LO:HI, exponential:MEAN or lognormal:MEDIAN:SIGMA",
+    )
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--overloaded-rate", type=float, default=0.0, help="Fraction of requests answered with 529")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Fraction of requests that hang")
+    parser.add_argument(
+        "--hang-seconds", type=float, default=130.0, help="How long hung requests stall (default: past the 120s timeout)"
+    )
+    parser.add_argument("--empty-rate", type=float, default=0.0, help="Fraction of replies with empty text")
+    parser.add_argument(
+        "--reasoning-rate", type=float, default=0.0, help="Fraction of Gemini replies carrying a reasoning field"
+    )
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.llm = MockLLM(args)
+    print(f"Mock LLM server on http://{args.host}:{args.port} ({len(server.llm.answers)} questions loaded)")
+    print(f"Point the eval scripts at it with --base-url http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\nServed: {dict(server.llm.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Near-miss diagnostics: incorrect multi-hop predictions that are almost the gold answer.
+
+Scans every incorrect result in the stored eval results and reports predictions whose normalized form is
+within a small edit distance of the normalized gold answer, or shares most of its tokens with it (e.g.
+"Cardinal" vs "Northern Cardinal"). These are usually normalizer gaps rather than model errors. Hits are
+grouped by the mapping_id of the answer's chain step, and --aliases-out writes them in the shape of
+ANSWER_ALIASES so the ones that really are the same answer can be pasted into the alias table in bulk.
+
+Usage:
+    python near_miss_report.py                              # eval_results/eval_*.json and salient_eval_*.json
+    python near_miss_report.py --max-distance 3 --min-overlap 0.6
+    python near_miss_report.py --aliases-out near_miss_aliases.json
+"""
+
+import argparse
+import glob
+import json
+from collections import Counter, defaultdict
+
+from scoring import normalize_answer
+from rescore_results import DEFAULT_PATTERNS
+
+
+def banded_levenshtein(a, b, max_distance):
+    """
+    Edit distance between a and b if it is at most max_distance, else None.
+
+    Only cells within max_distance of the diagonal can lead to a distance that small, so each row fills
+    just that band (O(len * max_distance) rather than O(len^2)), and it gives up as soon as every cell in
+    a row's band is over the limit.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    if len(a) > len(b):
+        a, b = b, a
+    # Cells outside the band stay at `over`, which is already too far
+    over = max_distance + 1
+    previous = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    current = [over] * (len(b) + 1)
+    for i in range(1, len(a) + 1):
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current[low - 1] = i if low == 1 and i <= max_distance else over
+        row_min = current[low - 1]
+        char = a[i - 1]
+        for j in range(low, high + 1):
+            # min(delete, insert, substitute) without the cost of calling min()
+            cell = previous[j - 1] + (char != b[j - 1])
+            if previous[j] < cell:
+                cell = previous[j] + 1
+            if current[j - 1] < cell:
+                cell = current[j - 1] + 1
+            current[j] = cell
+            if cell < row_min:
+                row_min = cell
+        if row_min > max_distance:
+            return None
+        if high < len(b):
+            current[high + 1] = over
+        previous, current = current, previous
+    distance = previous[len(b)]
+    return distance if distance <= max_distance else None
+
+
+def token_overlap(a, b):
+    """Jaccard overlap of the two strings' word sets."""
+    tokens_a, tokens_b = set(a.split()), set(b.split())
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+def load_incorrect(paths):
+    """Counter of (mapping_id, gold answer, predicted answer) over incorrect, scorable results."""
+    misses = Counter()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            results = json.load(f).get("results", [])
+        for r in results:
+            if r["is_correct"] or r.get("error") is not None or not r.get("predicted_answer") or not r.get("chain"):
+                continue
+            # Numeric answers that are close are just wrong numbers, not spelling variants
+            if isinstance(r["correct_answer"], int):
+                continue
+            misses[(r["chain"][-1].get("mapping_id"), r["correct_answer"], r["predicted_answer"])] += 1
+    return misses
+
+
+def find_near_misses(misses, max_distance, min_overlap):
+    """
+    [(mapping_id, gold, predicted, count, distance, overlap)] for the misses within either threshold.
+    Each distinct normalized pair is compared once; pairs whose lengths differ by more than max_distance
+    are rejected by banded_levenshtein before any cell is filled, leaving only the token-overlap test.
+    """
+    verdicts = {}
+    hits = []
+    for (mapping_id, gold, predicted), count in misses.items():
+        pair = (normalize_answer(str(predicted)), normalize_answer(str(gold)))
+        if pair not in verdicts:
+            distance = banded_levenshtein(*pair, max_distance)
+            overlap = token_overlap(*pair)
+            verdicts[pair] = (distance, overlap) if distance is not None or overlap >= min_overlap else None
+        if verdicts[pair] is not None:
+            hits.append((mapping_id, gold, predicted, count, *verdicts[pair]))
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report incorrect predictions that nearly match the gold answer")
+    parser.add_argument("files", nargs="*", help=f"Results files (default: {' and '.join(DEFAULT_PATTERNS)})")
+    parser.add_argument("--max-distance", type=int, default=2, help="Edit distance counted as a near miss")
+    parser.add_argument("--min-overlap", type=float, default=0.5, help="Token (Jaccard) overlap counted as a near miss")
+    parser.add_argument("--show", type=int, default=15, help="Near misses to print per mapping_id")
+    parser.add_argument(
+        "--aliases-out", type=str, default=None, help="Write the hits as {mapping_id: {gold: [predictions]}} JSON"
+    )
+    args = parser.parse_args()
+
+    paths = args.files or sorted(path for pattern in DEFAULT_PATTERNS for path in glob.glob(pattern))
+    misses = load_incorrect(paths)
+    hits = find_near_misses(misses, args.max_distance, args.min_overlap)
+    print(
+        f"{sum(misses.values()):,} incorrect non-numeric predictions ({len(misses):,} distinct) in {len(paths)} files; "
+        f"{sum(hit[3] for hit in hits):,} near misses ({len(hits):,} distinct)"
+    )
+
+    by_mapping = defaultdict(list)
+    for hit in hits:
+        by_mapping[hit[0]].append(hit[1:])
+    for mapping_id, mapping_hits in sorted(by_mapping.items(), key=lambda item: -sum(hit[2] for hit in item[1])):
+        mapping_hits.sort(key=lambda hit: -hit[2])
+        print(f"\n{mapping_id}: {sum(hit[2] for hit in mapping_hits)} near misses ({len(mapping_hits)} distinct)")
+        for gold, predicted, count, distance, overlap in mapping_hits[: args.show]:
+            distance_str = f"distance {distance}" if distance is not None else f"distance >{args.max_distance}"
+            print(f"  {gold!r} <- {predicted!r} x{count} ({distance_str}, overlap {overlap:.2f})")
+
+    if args.aliases_out:
+        aliases = defaultdict(lambda: defaultdict(list))
+        for mapping_id, mapping_hits in sorted(by_mapping.items()):
+            for gold, predicted, *_ in sorted(mapping_hits, key=lambda hit: -hit[2]):
+                aliases[mapping_id][gold].append(predicted)
+        with open(args.aliases_out, "w", encoding="utf-8") as f:
+            json.dump(aliases, f, indent=4, ensure_ascii=False)
+        print(f"\nCandidate aliases saved to: {args.aliases_out} (review before adding to ANSWER_ALIASES)")
+
+
+if __name__ == "__main__":
+    main()
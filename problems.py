@@ -0,0 +1,221 @@
+"""
+Compact in-memory form of multi-hop problems: Problem and ChainStep objects with __slots__.
+
+The JSONL form stores every chain step as a {"fact", "value", "mapping_id"} dict, although the same
+step (e.g. "State that joined the union 22th" -> "Alabama") appears in thousands of problems. Here each
+distinct step is a single shared ChainStep, and the strings that repeat across problems (facts, mapping
+ids, string values, problem types) are interned, so a problem costs one small object plus a list of
+references. Both classes support the dict-style reads the rest of the code uses (problem["chain"],
+step.get("mapping_id")), and to_dict() gives back exactly the dict that was loaded, so writing a loaded
+dataset reproduces the file byte for byte.
+
+The tables that make steps and key orders shared are bounded: a ChainStep stays in ChainStep._interned
+only while some problem still refers to it, and at most KEY_ORDER_CACHE_SIZE key orders are kept.
+"""
+
+import json
+import sys
+import weakref
+from functools import lru_cache
+
+PROBLEM_FIELDS = ("type", "question", "answer", "hops", "chain", "answer_aliases", "normalizer_version")
+STEP_FIELDS = ("fact", "value", "mapping_id")
+GENERATED_KEY_ORDER = ("type", "question", "answer", "hops", "chain")
+
+# Datasets have a handful of distinct key orders; more only means some equal orders are stored twice
+KEY_ORDER_CACHE_SIZE = 256
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@lru_cache(maxsize=KEY_ORDER_CACHE_SIZE)
+def _shared_key_order(key_order):
+    return key_order
+
+
+class ChainStep:
+    """One fact lookup of a chain. Instances are shared between problems: get them with ChainStep.of."""
+
+    __slots__ = (*STEP_FIELDS, "__weakref__")
+
+    _interned = weakref.WeakValueDictionary()
+
+    def __init__(self, fact, value, mapping_id=None):
+        self.fact = fact
+        self.value = value
+        self.mapping_id = mapping_id
+
+    @classmethod
+    def of(cls, step):
+        """The shared ChainStep for a step dict (or ChainStep)."""
+        if step.__class__ is ChainStep:
+            return step
+        fact, value, mapping_id = step["fact"], step["value"], step.get("mapping_id")
+        # The value's type is part of the key so that e.g. 1 and True stay distinct
+        key = (fact, value, mapping_id, value.__class__)
+        interned = cls._interned.get(key)
+        if interned is None:
+            interned = cls._interned[key] = cls(_intern(fact), _intern(value), _intern(mapping_id))
+        return interned
+
+    def __getitem__(self, key):
+        if key not in STEP_FIELDS or (key == "mapping_id" and self.mapping_id is None):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        # Steps never hold None, so None means the field is absent (only mapping_id can be)
+        value = getattr(self, key, None) if key in STEP_FIELDS else None
+        return default if value is None else value
+
+    def to_dict(self):
+        step = {"fact": self.fact, "value": self.value}
+        if self.mapping_id is not None:
+            step["mapping_id"] = self.mapping_id
+        return step
+
+    def __eq__(self, other):
+        if isinstance(other, ChainStep):
+            return (self.fact, self.value, self.mapping_id) == (other.fact, other.value, other.mapping_id)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.fact, self.value, self.mapping_id))
+
+    def __repr__(self):
+        return f"ChainStep({self.fact!r}, {self.value!r}, {self.mapping_id!r})"
+
+
+class Problem:
+    """
+    A multi-hop problem. Fields other than PROBLEM_FIELDS (e.g. in hand-written problem files) are kept in
+    `extra`, and `key_order` records the dict's key order (one shared tuple per distinct order).
+    """
+
+    __slots__ = (*PROBLEM_FIELDS, "extra", "key_order")
+
+    def __init__(
+        self,
+        type=None,
+        question=None,
+        answer=None,
+        hops=None,
+        chain=None,
+        answer_aliases=None,
+        normalizer_version=None,
+        *,
+        key_order,
+        extra=None,
+    ):
+        self.type = type
+        self.question = question
+        self.answer = answer
+        self.hops = hops
+        self.chain = chain
+        self.answer_aliases = answer_aliases
+        self.normalizer_version = normalizer_version
+        self.key_order = _shared_key_order(key_order)
+        self.extra = extra
+
+    @classmethod
+    def create(cls, type, question, answer, hops, chain):
+        """A newly generated problem (the fields generation writes, in its key order)."""
+        return cls(
+            sys.intern(type),
+            question,
+            _intern(answer),
+            hops,
+            [ChainStep.of(step) for step in chain],
+            key_order=GENERATED_KEY_ORDER,
+        )
+
+    @classmethod
+    def from_dict(cls, problem):
+        """
+        Compact form of a problem dict: chain steps shared, repeated strings interned, answer_aliases as a
+        frozenset (what check_answer takes).
+        """
+        fields = {field: problem[field] for field in PROBLEM_FIELDS if field in problem}
+        extra = {key: value for key, value in problem.items() if key not in PROBLEM_FIELDS} or None
+        if "type" in fields:
+            fields["type"] = _intern(fields["type"])
+        if "answer" in fields:
+            fields["answer"] = _intern(fields["answer"])
+        if "normalizer_version" in fields:
+            fields["normalizer_version"] = _intern(fields["normalizer_version"])
+        if "chain" in fields:
+            fields["chain"] = [ChainStep.of(step) for step in fields["chain"]]
+        if "answer_aliases" in fields:
+            fields["answer_aliases"] = frozenset(fields["answer_aliases"])
+        return cls(**fields, key_order=tuple(problem), extra=extra)
+
+    def to_dict(self):
+        """The problem as the dict it was loaded from (answer_aliases as a sorted list, as generated)."""
+        problem = {key: self[key] for key in self.key_order}
+        if "chain" in problem:
+            problem["chain"] = [step.to_dict() for step in problem["chain"]]
+        if "answer_aliases" in problem:
+            problem["answer_aliases"] = sorted(problem["answer_aliases"])
+        return problem
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def __getitem__(self, key):
+        if key not in self.key_order:
+            raise KeyError(key)
+        return getattr(self, key) if key in PROBLEM_FIELDS else self.extra[key]
+
+    def __setitem__(self, key, value):
+        if key not in self.key_order:
+            self.key_order = _shared_key_order((*self.key_order, key))
+        if key in PROBLEM_FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in self.key_order
+
+    def get(self, key, default=None):
+        if key not in self.key_order:
+            return default
+        return getattr(self, key) if key in PROBLEM_FIELDS else self.extra[key]
+
+    def __eq__(self, other):
+        if isinstance(other, Problem):
+            return self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Problem({self.type!r}, {self.question!r}, {self.answer!r})"
+
+
+def load_problems(filepath):
+    """Problems from a JSONL file, as compact Problem objects."""
+    with open(filepath, "r", encoding="utf-8") as f:
+        return [Problem.from_dict(json.loads(line)) for line in f]
+
+
+def save_problems(problems, filepath):
+    """Write problems (Problem objects or dicts) as JSONL, in the same form they are loaded from."""
+    with open(filepath, "w", encoding="utf-8") as f:
+        for problem in problems:
+            f.write(problem_json(problem) + "\n")
+
+
+def problem_json(problem):
+    if isinstance(problem, Problem):
+        return problem.to_json()
+    return json.dumps(problem, ensure_ascii=False)
+
+
+def chain_dicts(chain):
+    """A chain (of ChainSteps or dicts) as plain dicts, for JSON output."""
+    return [step.to_dict() if isinstance(step, ChainStep) else step for step in chain]
@@ -0,0 +1,63 @@
+"""
+Profiling helpers behind the scripts' --profile flag: cProfile with a pstats dump, and an event-loop lag
+sampler for the async eval scripts.
+"""
+
+import asyncio
+import cProfile
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+from request_timing import percentile
+
+
+@contextmanager
+def profiled(output_path, sort="cumulative", limit=30):
+    """Profile the enclosed block if output_path is set: write pstats there and print the top functions."""
+    if not output_path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        profiler.dump_stats(output_path)
+        print(f"\n=== Profile: top {limit} functions by {sort} time ===")
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats(sort).print_stats(limit)
+        print(f"Full profile saved to: {output_path} (inspect with `python -m pstats {output_path}`)")
+
+
+class LoopLagMonitor:
+    """
+    Samples event-loop scheduling delay: how much later than requested a sleep(interval) wakes up.
+    Large values mean something blocked the loop, e.g. a synchronous cache flush or a CPU-heavy callback.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.lags = []
+
+    async def run(self):
+        """Sample until cancelled."""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def summary(self):
+        if not self.lags:
+            return None
+        lags = sorted(self.lags)
+        return {
+            "samples": len(lags),
+            "interval_ms": self.interval * 1000,
+            "p50_ms": percentile(lags, 50) * 1000,
+            "p99_ms": percentile(lags, 99) * 1000,
+            "max_ms": lags[-1] * 1000,
+        }
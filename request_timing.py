@@ -0,0 +1,87 @@
+"""
+Per-request timing for evaluate_problem: semaphore wait, time to first byte, API time, retries and scoring.
+"""
+
+import math
+import time
+from contextvars import ContextVar
+
+# (timing dict, attempt start time) of the API call the current asyncio task is making; read by the HTTP hook
+CURRENT_ATTEMPT = ContextVar("current_attempt", default=None)
+
+TIMING_METRICS = [
+    "total_s",
+    "semaphore_wait_s",
+    "ttfb_s",
+    "api_s",
+    "backoff_s",
+    "scoring_s",
+    "rate_limit_retries",
+    "timeout_retries",
+    "gemini_retries",
+]
+
+
+def new_timing():
+    """Timing record for one problem. API fields stay None for cached responses."""
+    return {metric: None for metric in TIMING_METRICS}
+
+
+def start_api_timing(timing):
+    """Mark the start of the API retry loop for an uncached problem."""
+    timing.update(api_s=0.0, backoff_s=0.0, rate_limit_retries=0, timeout_retries=0, gemini_retries=0)
+    return time.perf_counter()
+
+
+def start_attempt(timing):
+    """Mark the start of one API call attempt, so the response hook can compute time to first byte."""
+    CURRENT_ATTEMPT.set((timing, time.perf_counter()))
+
+
+async def record_first_byte(response):
+    """httpx response event hook: runs once the response headers arrive, before the body is read."""
+    attempt = CURRENT_ATTEMPT.get()
+    if attempt is not None:
+        timing, start = attempt
+        timing["ttfb_s"] = time.perf_counter() - start
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def timing_percentiles(results):
+    """p50/p95/p99 of each timing metric over the results that have it (API metrics: uncached only)."""
+    summary = {}
+    for metric in TIMING_METRICS:
+        values = sorted(
+            r["timing"][metric] for r in results if r.get("timing") and r["timing"].get(metric) is not None
+        )
+        if not values:
+            continue
+        summary[metric] = {
+            "n": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": values[-1],
+        }
+    return summary
+
+
+def print_timing_summary(timing_stats, loop_lag_stats=None):
+    """Print timing_percentiles output (p50 / p95 / p99 per metric) and LoopLagMonitor.summary() if given."""
+    if timing_stats:
+        print(f"\nTiming (p50 / p95 / p99):")
+        for metric, stats in timing_stats.items():
+            fmt = "{:.3f}s" if metric.endswith("_s") else "{:g}"
+            values = " / ".join(fmt.format(stats[p]) for p in ["p50", "p95", "p99"])
+            print(f"  {metric}: {values} (n={stats['n']})")
+
+    if loop_lag_stats:
+        print(
+            f"Event-loop lag: p99 {loop_lag_stats['p99_ms']:.1f}ms, worst {loop_lag_stats['max_ms']:.1f}ms "
+            f"({loop_lag_stats['samples']} samples)"
+        )
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Re-score stored multi-hop eval results with the current answer scorer, without any API calls.
+
+Each results file records the normalizer_version it was scored with. Files scored by an older version (or
+before versions were recorded) are re-scored in a process pool, one file per task: is_correct is
+recomputed from every stored response, the summary's correct/accuracy/hop_stats (and stratified
+estimates) are rebuilt, and the problems whose verdict flipped are reported. Files already scored by the
+current version are skipped unless --force.
+
+Usage:
+    python rescore_results.py                       # eval_results/eval_*.json and salient_eval_*.json
+    python rescore_results.py --dry-run             # report flips without rewriting any file
+    python rescore_results.py eval_results/eval_opus-4_all.json --force
+"""
+
+import argparse
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from scoring import (
+    chain_accepted_answers,
+    compute_hop_stats,
+    compute_stratified_stats,
+    normalizer_version,
+    score_answers,
+    was_skipped,
+)
+from sharding import MP_CONTEXT
+
+DEFAULT_PATTERNS = ["eval_results/eval_*.json", "eval_results/salient_eval_*.json"]
+
+
+def stored_response(r):
+    return r.get("response", r.get("predicted_answer"))
+
+
+def result_aliases(r):
+    # The same aliases evaluate_problem scores against (see scoring.problem_aliases)
+    return chain_accepted_answers(r["correct_answer"], r.get("chain"))
+
+
+def rescore_data(data, force=False):
+    """
+    Re-score loaded results data (a results file's JSON) in memory, also used by the analysis scripts.
+    Returns {"status", "flips", "old_accuracy", "accuracy"} where status is "skipped" (already current),
+    "unchanged" or "rescored", and flips lists the problems whose verdict changed.
+    """
+    summary = data.get("summary", {})
+    version = normalizer_version()
+    if summary.get("normalizer_version") == version and not force:
+        accuracy = summary.get("accuracy")
+        return {"status": "skipped", "flips": [], "old_accuracy": accuracy, "accuracy": accuracy}
+
+    results = data.get("results", [])
+    # Errors and skipped problems have no response to score and keep their verdict
+    scorable = [r for r in results if r.get("error") is None and stored_response(r) is not None]
+    verdicts = score_answers(
+        [stored_response(r) for r in scorable],
+        [r["correct_answer"] for r in scorable],
+        [result_aliases(r) for r in scorable],
+    )
+    flips = []
+    for r, is_correct in zip(scorable, verdicts.tolist()):
+        if is_correct != r["is_correct"]:
+            flips.append(
+                {
+                    "problem_index": r.get("problem_index"),
+                    "hops": r.get("hops"),
+                    "predicted_answer": r.get("predicted_answer"),
+                    "correct_answer": r["correct_answer"],
+                    "is_correct": is_correct,
+                }
+            )
+            r["is_correct"] = is_correct
+
+    # Files written before skipped problems were dropped from results still hold them; they count nowhere
+    counted = [r for r in results if not was_skipped(r)]
+    correct_count = sum(1 for r in counted if r["is_correct"])
+    old_accuracy = summary.get("accuracy", 0)
+    summary["total"] = len(counted)
+    summary["correct"] = correct_count
+    summary["accuracy"] = correct_count / len(counted) if counted else 0
+    hop_stats = compute_hop_stats(results)
+    summary["hop_stats"] = {str(k): v for k, v in hop_stats.items()}
+    if summary.get("stratified"):
+        stratum_sizes = {k: s["population"] for k, s in summary["stratified"]["strata"].items()}
+        summary["stratified"] = compute_stratified_stats(
+            results, stratum_sizes, summary["stratified"]["allocation"], hop_stats
+        )
+    summary["normalizer_version"] = version
+    data["summary"] = summary
+    return {
+        "status": "rescored" if flips else "unchanged",
+        "flips": flips,
+        "old_accuracy": old_accuracy,
+        "accuracy": summary["accuracy"],
+    }
+
+
+def rescore_file(path, force=False, dry_run=False):
+    """Re-score one results file in place. Returns rescore_data's report with "path" added."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    report = rescore_data(data, force)
+    if report["status"] != "skipped" and not dry_run:
+        # Write beside the original and swap it in, so an interrupted run never leaves a truncated file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    return {"path": path, **report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored eval results with the current answer scorer")
+    parser.add_argument("files", nargs="*", help=f"Results files (default: {' and '.join(DEFAULT_PATTERNS)})")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Re-score files already scored by the current version")
+    parser.add_argument("--dry-run", action="store_true", help="Report flips without rewriting any file")
+    parser.add_argument("--show", type=int, default=10, help="Flipped problems to print per file")
+    args = parser.parse_args()
+
+    paths = args.files or sorted(path for pattern in DEFAULT_PATTERNS for path in glob.glob(pattern))
+    if not paths:
+        print("No results files found")
+        return
+    print(f"Normalizer version {normalizer_version()}; checking {len(paths)} results files with {args.jobs} workers")
+
+    counts = {"skipped": 0, "unchanged": 0, "rescored": 0}
+    total_flips = 0
+    with ProcessPoolExecutor(max_workers=args.jobs, mp_context=MP_CONTEXT) as executor:
+        futures = [executor.submit(rescore_file, path, args.force, args.dry_run) for path in paths]
+        for future in as_completed(futures):
+            report = future.result()
+            counts[report["status"]] += 1
+            if not report["flips"]:
+                continue
+            total_flips += len(report["flips"])
+            to_correct = sum(1 for flip in report["flips"] if flip["is_correct"])
+            print(
+                f"\n{report['path']}: {len(report['flips'])} flipped ({to_correct} now correct, "
+                f"{len(report['flips']) - to_correct} now incorrect); accuracy "
+                f"{report['old_accuracy']:.2%} -> {report['accuracy']:.2%}"
+            )
+            for flip in report["flips"][: args.show]:
+                verdict = "CORRECT" if flip["is_correct"] else "INCORRECT"
+                print(
+                    f"  problem {flip['problem_index']} ({flip['hops']}-hop): now {verdict} "
+                    f"({flip['predicted_answer']!r} vs {flip['correct_answer']!r})"
+                )
+
+    action = "would be rewritten" if args.dry_run else "rewritten"
+    print(
+        f"\n{counts['rescored'] + counts['unchanged']} files re-scored ({action}), {counts['skipped']} already current; "
+        f"{total_flips} verdicts flipped in {counts['rescored']} files"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,12 +9,14 @@ import hashlib
 import atexit
 import signal
 
+from tracing import TRACER
+
 # Global registry of cache instances for cleanup
 _cache_instances = []
 
 
 class ResponseCache:
-    """Cache for API responses to avoid duplicate calls."""
+    """Cache for API responses to avoid duplicate calls. cache_file=None keeps it in memory only."""
 
     def __init__(self, cache_file, save_every=100):
         self.cache_file = cache_file
@@ -27,7 +29,7 @@ class ResponseCache:
 
     def load_cache(self):
         """Load cache from disk."""
-        if os.path.exists(self.cache_file):
+        if self.cache_file is not None and os.path.exists(self.cache_file):
             with open(self.cache_file, "r", encoding="utf-8") as f:
                 self.cache = json.load(f)
             print(f"Loaded {len(self.cache)} cached responses from {self.cache_file}")
@@ -42,11 +44,12 @@ class ResponseCache:
             # Re-check under lock in case another task just saved
             if not force and self.unsaved_count < self.save_every:
                 return
-            self._save_cache_sync()
+            with TRACER.span("cache flush", entries=len(self.cache), unsaved=self.unsaved_count):
+                self._save_cache_sync()
 
     def _save_cache_sync(self):
         """Synchronous cache save (for use in signal handlers and atexit)."""
-        if self.unsaved_count == 0:
+        if self.unsaved_count == 0 or self.cache_file is None:
             return
         try:
             # Ensure directory exists
@@ -69,7 +72,10 @@ class ResponseCache:
 
     async def set(self, key_dict, response_data):
         """Store response in cache and periodically save to disk."""
-        cache_key = self.make_cache_key(key_dict)
+        await self.set_hashed(self.make_cache_key(key_dict), response_data)
+
+    async def set_hashed(self, cache_key, response_data):
+        """set() for a key already hashed with make_cache_key (e.g. one forwarded by a worker process)."""
         async with self.lock:
             self.cache[cache_key] = response_data
             self.unsaved_count += 1
@@ -77,6 +83,25 @@ class ResponseCache:
         await self.save_cache()
 
 
+class WorkerResponseCache(ResponseCache):
+    """
+    Cache for a --workers process: reads its own copy of the entries and forwards new ones with
+    forward(cache_key, response_data) to the parent, the only process that writes the cache file.
+    """
+
+    def __init__(self, cache, forward):
+        self.cache_file = None
+        self.cache = cache
+        self.lock = asyncio.Lock()
+        self.save_every = 0
+        self.unsaved_count = 0
+        self.forward = forward
+
+    async def set_hashed(self, cache_key, response_data):
+        self.cache[cache_key] = response_data
+        self.forward(cache_key, response_data)
+
+
 def _save_all_caches_sync():
     """Save all registered caches (for use in signal handlers and atexit)."""
     for cache in _cache_instances:
@@ -3,6 +3,7 @@
 Run all evaluations for multi-hop reasoning experiments.
 """
 
+import argparse
 import subprocess
 import json
 import os
@@ -46,13 +47,25 @@ total_costs = {
     "estimated_cost_usd": 0.0,
 }
 
+# Sweep-wide spend cap in USD (set from --max-spend); each run gets whatever budget is left
+MAX_SPEND = None
 
-def run_eval(model, repeat, input_key="all", verbosity=2, filler=None):
+
+def run_eval(model, repeat, input_key="all", verbosity=2, filler=None, target_ci_width=None):
     """Run a single evaluation."""
     input_file = INPUT_FILES[input_key]
     repeat_suffix = f"_r{repeat}" if repeat else ""
     filler_suffix = f"_f{filler}" if filler else ""
-    output_file = f"eval_results/eval_{model}_{input_key}{repeat_suffix}{filler_suffix}.json"
+    # Early-stopped runs are partial, so they must not overwrite (or be read as) the full run of a config
+    ci_suffix = f"_ci{target_ci_width:g}" if target_ci_width else ""
+    output_file = f"eval_results/eval_{model}_{input_key}{repeat_suffix}{filler_suffix}{ci_suffix}.json"
+
+    remaining_budget = None
+    if MAX_SPEND is not None:
+        remaining_budget = MAX_SPEND - total_costs["estimated_cost_usd"]
+        if remaining_budget <= 0:
+            print(f"\nSkipping {model}, repeat={repeat}, filler={filler}: --max-spend ${MAX_SPEND:.2f} reached")
+            return None
 
     cmd = [
         "python", "eval_multi_hop.py",
@@ -68,6 +81,10 @@ def run_eval(model, repeat, input_key="all", verbosity=2, filler=None):
         cmd.extend(["-r", str(repeat)])
     if filler:
         cmd.extend(["-f", str(filler)])
+    if remaining_budget is not None:
+        cmd.extend(["--max-spend", f"{remaining_budget:.4f}"])
+    if target_ci_width:
+        cmd.extend(["--target-ci-width", str(target_ci_width)])
 
     print(f"\n{'='*60}")
     print(f"Running: {model}, repeat={repeat}, filler={filler}, input={input_key}")
@@ -88,6 +105,12 @@ def run_eval(model, repeat, input_key="all", verbosity=2, filler=None):
         total_costs["output_tokens"] += cost_tracker.get("output_tokens", 0)
         total_costs["cache_read_tokens"] += cost_tracker.get("cache_read_tokens", 0)
         total_costs["cache_creation_tokens"] += cost_tracker.get("cache_creation_tokens", 0)
+        total_costs["estimated_cost_usd"] += cost_tracker.get("cost_usd", 0.0)
+        print(f"Run cost: ${cost_tracker.get('cost_usd', 0.0):.4f} (sweep total so far: ${total_costs['estimated_cost_usd']:.2f})")
+        if summary.get("early_stopping"):
+            print(f"Early stopping saved {summary['early_stopping']['calls_saved']} calls")
+        if summary.get("skipped_spend_cap"):
+            print(f"Skipped {summary['skipped_spend_cap']} uncached problems at --max-spend (not in total/accuracy)")
 
         return summary
     return None
@@ -95,6 +118,16 @@ def run_eval(model, repeat, input_key="all", verbosity=2, filler=None):
 
 def main():
     """Run all evaluations."""
+    global MAX_SPEND
+    parser = argparse.ArgumentParser(description="Run all multi-hop evaluations")
+    parser.add_argument("--max-spend", type=float, default=None,
+                        help="Total USD budget for the whole sweep; runs stop sending uncached requests once it is used up")
+    parser.add_argument("--target-ci-width", type=float, default=None,
+                        help="Early stopping for the extra repeat and filler sweeps: stop each hop level once its "
+                             "95%% Wilson interval is narrower than this")
+    args = parser.parse_args()
+    MAX_SPEND = args.max_spend
+
     print("="*60)
     print("MULTI-HOP REASONING EVALUATION")
     print(f"Started at: {datetime.now()}")
@@ -127,7 +160,7 @@ def main():
 
     # Run extra repeat values for opus-4 only
     for repeat in OPUS4_EXTRA_REPEATS:
-        summary = run_eval("opus-4", repeat, "all")
+        summary = run_eval("opus-4", repeat, "all", target_ci_width=args.target_ci_width)
         if summary:
             results.append({
                 "model": "opus-4",
@@ -138,7 +171,7 @@ def main():
 
     # Run extra repeat values for opus-4-5
     for repeat in OPUS45_EXTRA_REPEATS:
-        summary = run_eval("opus-4-5", repeat, "all")
+        summary = run_eval("opus-4-5", repeat, "all", target_ci_width=args.target_ci_width)
         if summary:
             results.append({
                 "model": "opus-4-5",
@@ -149,7 +182,7 @@ def main():
 
     # Run filler sweep for opus-4
     for filler in OPUS4_FILLER_SWEEP:
-        summary = run_eval("opus-4", None, "all", filler=filler)
+        summary = run_eval("opus-4", None, "all", filler=filler, target_ci_width=args.target_ci_width)
         if summary:
             results.append({
                 "model": "opus-4",
@@ -161,7 +194,7 @@ def main():
 
     # Run filler sweep for opus-4-5
     for filler in OPUS45_FILLER_SWEEP:
-        summary = run_eval("opus-4-5", None, "all", filler=filler)
+        summary = run_eval("opus-4-5", None, "all", filler=filler, target_ci_width=args.target_ci_width)
         if summary:
             results.append({
                 "model": "opus-4-5",
@@ -225,6 +258,24 @@ def main():
         hop_stats = r.get("hop_stats", {})
         print(f"{model_str:<{col_model}}  {repeat_str:>{col_repeat}}  {filler_str:>{col_filler}}  {fmt_hop(hop_stats, 2):>{col_2hop}}  {fmt_hop(hop_stats, 3):>{col_3hop}}  {fmt_hop(hop_stats, 4):>{col_4hop}}")
 
+    # Print prompt cache effectiveness per config
+    print("\n\nPROMPT CACHE (read/write token ratio):")
+    for r in results:
+        prompt_cache = r.get("prompt_cache") or {}
+        ratio = prompt_cache.get("read_write_ratio")
+        hit_rate = prompt_cache.get("hit_rate")
+        if ratio is None:
+            continue
+        print(f"{get_val(r, 'model', 'unknown'):<{col_model}}  {get_val(r, 'repeat'):>{col_repeat}}  {get_val(r, 'filler'):>{col_filler}}  {ratio:>8.1f}  ({hit_rate:.1%} of input read from cache)")
+
+    # Print cost per config
+    print("\n\nCOST PER CONFIG (non-cached calls only):")
+    for r in results:
+        cost_usd = (r.get("cost_tracker") or {}).get("cost_usd")
+        if cost_usd is None:
+            continue
+        print(f"{get_val(r, 'model', 'unknown'):<{col_model}}  {get_val(r, 'repeat'):>{col_repeat}}  {get_val(r, 'filler'):>{col_filler}}  ${cost_usd:>9.4f}")
+
     # Print cost summary
     print("\n" + "="*60)
     print("COST SUMMARY (non-cached calls only)")
@@ -234,15 +285,10 @@ def main():
     print(f"Cache read tokens:     {total_costs['cache_read_tokens']:,}")
     print(f"Cache creation tokens: {total_costs['cache_creation_tokens']:,}")
 
-    # Estimate total cost (using average pricing)
-    # This is approximate since we're mixing models
-    avg_input_price = 9.0  # Average of opus and sonnet
-    avg_output_price = 45.0
-    estimated_cost = (
-        total_costs["input_tokens"] * avg_input_price / 1_000_000
-        + total_costs["output_tokens"] * avg_output_price / 1_000_000
-    )
-    print(f"\nEstimated total cost: ${estimated_cost:.2f}")
+    # Sum of per-run costs, each computed with that run's model pricing
+    print(f"\nEstimated total cost: ${total_costs['estimated_cost_usd']:.2f}")
+    if MAX_SPEND is not None:
+        print(f"Budget (--max-spend): ${MAX_SPEND:.2f}")
 
     # Save summary
     summary_file = "eval_results/all_runs_summary.json"
@@ -0,0 +1,261 @@
+"""
+Sampling helpers for evaluations: Wilson intervals, stratified problem ordering and sampling with
+weighted estimates, and sequential early stopping. Also the reservoir that dataset generation samples
+from in streaming mode.
+"""
+
+import heapq
+import json
+import math
+import random
+from collections import defaultdict
+from statistics import NormalDist
+
+
+def wilson_score_interval(successes, n, confidence=0.95):
+    """
+    Calculate Wilson score confidence interval for a proportion.
+    Same as analyze_results.wilson_score_interval, but without the scipy/numpy dependency.
+    """
+    if n == 0:
+        return 0, 0
+
+    p = successes / n
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    denominator = 1 + z**2 / n
+    center = (p + z**2 / (2 * n)) / denominator
+    margin = z * math.sqrt((p * (1 - p) + z**2 / (4 * n)) / n) / denominator
+
+    return max(0, center - margin), min(1, center + margin)
+
+
+def stratified_order(items, key_fn, seed=42):
+    """
+    Shuffle items within each stratum (given by key_fn) and interleave the strata so that every
+    prefix of the returned list contains each stratum in roughly its overall proportion.
+    """
+    rng = random.Random(seed)
+    strata = defaultdict(list)
+    for item in items:
+        strata[key_fn(item)].append(item)
+
+    keyed = []
+    for members in strata.values():
+        rng.shuffle(members)
+        n = len(members)
+        for i, item in enumerate(members):
+            # Evenly spaced positions in [0, 1) per stratum, with a random tie-break between strata
+            keyed.append(((i + 0.5) / n, rng.random(), item))
+    keyed.sort(key=lambda x: (x[0], x[1]))
+    return [item for _, _, item in keyed]
+
+
+# Problem type families, matched against the mapping_id of the last chain step (what the answer is)
+TYPE_FAMILIES = ["oscar", "nobel", "miss_america", "element", "state"]
+
+ALLOCATIONS = ["proportional", "equal", "neyman"]
+
+
+def type_family(problem):
+    """Coarse family of a problem (or result) by what kind of answer it asks for, e.g. "oscar" or "element"."""
+    chain = problem.get("chain") or []
+    answer_kind = chain[-1].get("mapping_id", "") if chain else problem.get("type", "")
+    for family in TYPE_FAMILIES:
+        if family in answer_kind:
+            return family
+    return "other"
+
+
+def stratum_key(problem):
+    """Sampling stratum of a problem (or result): hop count and type family, e.g. "3hop/oscar"."""
+    return f"{problem.get('hops', 'unknown')}hop/{type_family(problem)}"
+
+
+def allocate(stratum_sizes, n, allocation="proportional", stratum_stds=None):
+    """
+    Split a total sample size n across strata, never exceeding a stratum's size.
+    proportional: n_h ~ N_h; equal: same n_h everywhere; neyman: n_h ~ N_h * S_h, where S_h is the
+    per-stratum standard deviation of correctness (strata missing from stratum_stds get the mean S_h).
+    """
+    if allocation not in ALLOCATIONS:
+        raise ValueError(f"Unknown allocation {allocation!r}, expected one of {ALLOCATIONS}")
+    if allocation == "neyman" and not stratum_stds:
+        raise ValueError("Neyman allocation needs per-stratum standard deviations from past runs")
+
+    n = min(n, sum(stratum_sizes.values()))
+    if allocation == "neyman":
+        known = [stratum_stds[k] for k in stratum_sizes if k in stratum_stds]
+        default_std = sum(known) / len(known) if known else 0.5
+        # Floor so strata that were all-correct/all-wrong in past runs still get sampled
+        scores = {k: size * max(stratum_stds.get(k, default_std), 0.05) for k, size in stratum_sizes.items()}
+    elif allocation == "equal":
+        scores = {k: 1.0 for k in stratum_sizes}
+    else:
+        scores = {k: float(size) for k, size in stratum_sizes.items()}
+
+    # Every stratum gets at least 2 draws when possible so its variance can be estimated
+    min_count = 2 if n >= 2 * len(stratum_sizes) else 0
+    counts = {k: min(min_count, size) for k, size in stratum_sizes.items()}
+    remaining = n - sum(counts.values())
+    open_strata = {k for k in stratum_sizes if counts[k] < stratum_sizes[k]}
+    # Repeatedly share out what's left among strata that aren't full yet (largest remainder rounding)
+    while remaining > 0 and open_strata:
+        total_score = sum(scores[k] for k in open_strata) or len(open_strata)
+        shares = {k: remaining * (scores[k] or 1) / total_score for k in open_strata}
+        floors = {k: int(shares[k]) for k in open_strata}
+        leftover = remaining - sum(floors.values())
+        for i, k in enumerate(sorted(open_strata, key=lambda k: shares[k] - floors[k], reverse=True)):
+            take = floors[k] + (1 if i < leftover else 0)
+            counts[k] += min(take, stratum_sizes[k] - counts[k])
+        remaining = n - sum(counts.values())
+        open_strata = {k for k in open_strata if counts[k] < stratum_sizes[k]}
+    return counts
+
+
+def stratified_sample(items, key_fn, n, allocation="proportional", stratum_stds=None, seed=42):
+    """
+    Draw n items with a simple random sample inside each stratum.
+    Returns (sample, stratum_sizes) where stratum_sizes are the population sizes used for weighting.
+    """
+    rng = random.Random(seed)
+    strata = defaultdict(list)
+    for item in items:
+        strata[key_fn(item)].append(item)
+    stratum_sizes = {k: len(v) for k, v in strata.items()}
+    counts = allocate(stratum_sizes, n, allocation, stratum_stds)
+
+    sample = []
+    for k in sorted(strata):
+        sample.extend(rng.sample(strata[k], counts[k]))
+    return sample, stratum_sizes
+
+
+def stratum_stds_from_results(result_files, key_fn=stratum_key):
+    """Per-stratum standard deviation of is_correct, pooled over past eval results files (for Neyman allocation)."""
+    counts = defaultdict(lambda: {"total": 0, "correct": 0})
+    for path in result_files:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for r in data.get("results", []):
+            if "error" in r:
+                continue
+            c = counts[key_fn(r)]
+            c["total"] += 1
+            c["correct"] += bool(r.get("is_correct"))
+    # Smooth with a uniform prior so small strata don't get a variance of exactly 0
+    return {
+        k: math.sqrt(p * (1 - p))
+        for k, c in counts.items()
+        for p in [(c["correct"] + 1) / (c["total"] + 2)]
+    }
+
+
+def stratified_estimate(stratum_counts, stratum_sizes, confidence=0.95):
+    """
+    Population-weighted accuracy from per-stratum {"total", "correct"} counts and population sizes,
+    with a normal-approximation interval (including finite population correction).
+    Strata with population but no sampled results are left out and reported in "unsampled_strata".
+    """
+    sampled = {k: c for k, c in stratum_counts.items() if c["total"] > 0 and stratum_sizes.get(k, 0) > 0}
+    population = sum(stratum_sizes[k] for k in sampled)
+    if population == 0:
+        return {"accuracy": None, "stderr": None, "ci": None, "unsampled_strata": sorted(stratum_sizes)}
+
+    accuracy = 0.0
+    variance = 0.0
+    for k, c in sampled.items():
+        weight = stratum_sizes[k] / population
+        p = c["correct"] / c["total"]
+        accuracy += weight * p
+        if c["total"] > 1:
+            fpc = 1 - c["total"] / stratum_sizes[k]
+            variance += weight**2 * fpc * p * (1 - p) / (c["total"] - 1)
+    stderr = math.sqrt(variance)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    return {
+        "accuracy": accuracy,
+        "stderr": stderr,
+        "ci": [max(0.0, accuracy - z * stderr), min(1.0, accuracy + z * stderr)],
+        "unsampled_strata": sorted(k for k in stratum_sizes if k not in sampled),
+    }
+
+
+class Reservoir:
+    """
+    Uniform sample of at most `size` items from a stream of unknown length, in O(size) memory.
+
+    add(item, weight) first keeps the item with probability weight (a Bernoulli downsampling rate), then
+    gives it a random priority; the `size` highest priorities are retained. That is the same distribution
+    as thinning the whole pool with the rates, shuffling the survivors and taking the first `size`.
+    Priority-weighted keys (u ** (1 / weight)) are deliberately not used: when size is close to the thinned
+    pool they shift the mix back toward the down-weighted items.
+    """
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.seen = 0
+        self.kept = 0
+        self._heap = []
+
+    def add(self, item, weight=1.0):
+        self.seen += 1
+        if weight < 1.0 and self.rng.random() > weight:
+            return
+        self.kept += 1
+        # The counter breaks priority ties, so items themselves are never compared
+        entry = (self.rng.random(), self.kept, item)
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self):
+        """The sample in random (descending priority) order."""
+        return [item for _, _, item in sorted(self._heap, reverse=True)]
+
+
+class EarlyStopper:
+    """
+    Sequential stopping rule: a stratum (e.g. hop level) stops once its Wilson interval is narrower
+    than target_width, and the whole run once every stratum has stopped. min_per_stratum guards
+    against stopping on a lucky streak.
+    """
+
+    def __init__(self, strata, target_width, min_per_stratum=30, confidence=0.95):
+        self.target_width = target_width
+        self.min_per_stratum = min_per_stratum
+        self.confidence = confidence
+        self.counts = {stratum: {"total": 0, "correct": 0} for stratum in strata}
+        self.calls_saved = 0
+
+    def record(self, stratum, is_correct):
+        counts = self.counts.setdefault(stratum, {"total": 0, "correct": 0})
+        counts["total"] += 1
+        if is_correct:
+            counts["correct"] += 1
+
+    def interval(self, stratum):
+        counts = self.counts.get(stratum, {"total": 0, "correct": 0})
+        return wilson_score_interval(counts["correct"], counts["total"], self.confidence)
+
+    def should_stop(self, stratum):
+        """Whether no new requests are needed for this stratum."""
+        counts = self.counts.get(stratum)
+        if counts is None or counts["total"] < self.min_per_stratum:
+            return False
+        low, high = self.interval(stratum)
+        return high - low < self.target_width
+
+    def all_stopped(self):
+        return all(self.should_stop(stratum) for stratum in self.counts)
+
+    def summary(self):
+        return {
+            "target_ci_width": self.target_width,
+            "min_per_stratum": self.min_per_stratum,
+            "calls_saved": self.calls_saved,
+            "stopped": self.all_stopped(),
+            "intervals": {str(stratum): list(self.interval(stratum)) for stratum in self.counts},
+        }
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
-import json
 import sys
 from collections import Counter
 
+from problems import load_problems
+
 
 def check_question_format(questions_file="data/problems_all.jsonl"):
     """Check that questions don't leak intermediate values."""
@@ -10,8 +11,7 @@ def check_question_format(questions_file="data/problems_all.jsonl"):
     print("CHECKING QUESTION FORMAT")
     print("="*80)
 
-    with open(questions_file) as f:
-        problems = [json.loads(l) for l in f]
+    problems = load_problems(questions_file)
 
     issues = []
     for p in problems:
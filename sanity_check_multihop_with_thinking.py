@@ -13,7 +13,8 @@ from pathlib import Path
 from collections import defaultdict
 from anthropic import AsyncAnthropic
 import os
-from eval_multi_hop import check_answer
+from scoring import check_answer
+from problems import load_problems
 from response_cache import ResponseCache
 
 
@@ -128,15 +129,6 @@ Question: {problem['question']}"""
         return None
 
 
-def load_problems(filepath):
-    """Load problems from JSONL file."""
-    problems = []
-    with open(filepath, "r") as f:
-        for line in f:
-            problems.append(json.loads(line))
-    return problems
-
-
 async def evaluate_multihop(problems, max_per_hop=50):
     """Evaluate Opus 4.5 on multi-hop questions with thinking."""
     print("="*80)
@@ -12,7 +12,7 @@ from pathlib import Path
 from collections import defaultdict
 from anthropic import AsyncAnthropic
 import os
-from eval_multi_hop import check_answer
+from scoring import check_answer
 from response_cache import ResponseCache
 
 # Add parent directory to path to import generate_dataset
@@ -0,0 +1,419 @@
+"""
+Answer scoring shared by the eval scripts, dataset generation and the analysis tools.
+
+Multi-hop answers are compared after normalize_answer, against the gold answer's accepted spellings
+(accepted_answers); addition answers are parsed to an int (normalize_addition_answer). Importing this
+module has no side effects (no API keys, clients, caches or signal handlers), so generate_dataset.py and
+the offline tools can use the exact scorer the eval scripts use. NumPy is imported only by the functions
+that return arrays.
+"""
+
+import hashlib
+import inspect
+import json
+import re
+from functools import lru_cache
+from typing import Optional
+
+from unidecode import unidecode
+
+from generate_dataset_constants import ANSWER_ALIASES, US_STATE_FLOWERS, US_STATE_MOTTOS
+from sampling import stratified_estimate, stratum_key
+
+
+def remove_middle_names(name_str: str) -> str:
+    """
+    Remove middle names from a person's name (conservative approach).
+    Only applied to names with 3+ words where all words are alphabetic.
+    Preserves suffixes like Jr., Sr., I, II, III.
+    """
+    words = name_str.split()
+    if len(words) < 3:
+        return name_str
+    if len(words) > 4:
+        return name_str
+
+    # Only apply to names that look like person names (all words are alphabetic)
+    # Allow apostrophes and hyphens which are common in names
+    if not all(word.replace("'", "").replace("-", "").isalpha() for word in words):
+        return name_str
+
+    # Preserve common suffixes
+    suffixes = {"jr", "sr", "i", "ii", "iii", "iv", "v"}
+    if words[-1] in suffixes and len(words) in [3, 4]:
+        if len(words) == 4:
+            return f"{words[0]} {words[-2]} {words[-1]}"
+        else:
+            # Only 3 words with suffix (e.g., "John Smith Jr"), don't modify
+            return name_str
+    if len(words) > 3:
+        return name_str
+
+    if len(words) == 3:
+        return f"{words[0]} {words[2]}"
+
+    raise ValueError("shoudn't be reachable")
+
+
+PARENTHETICAL_RE = re.compile(r"\s*\([^)]*\)")
+ANSWER_PREFIXES = ("answer:", "the answer is", "it is", "it's")
+TITLE_PREFIXES = ("mr", "sir", "lord")
+REGION_PREFIXES = ("northern", "western", "eastern", "southern", "american")
+# Deleting these never moves whitespace away from the ends, so one strip() afterwards matches stripping
+# after each one
+DROPPED_PUNCTUATION = str.maketrans("", "", "-,.'`")
+
+
+@lru_cache(maxsize=1 << 18)
+def normalize_answer(answer_str: str, skip_middle_name_normalization: bool = False) -> str:
+    """
+    Normalize answer string for comparison.
+
+    Memoized, since gold answers and common predictions are normalized over and over. Each group of steps
+    is skipped when a cheap test shows it can't change the (already stripped) string, so the output is the
+    same as running every step in order. Other spellings of specific answers are not rewritten here; they
+    are accepted through the gold answer's aliases (see accepted_answers).
+    """
+    answer_str = answer_str.strip().lower()
+    if not answer_str.isascii():
+        answer_str = unidecode(answer_str)
+
+    # Remove common prefixes
+    if answer_str.startswith(ANSWER_PREFIXES):
+        for prefix in ANSWER_PREFIXES:
+            if answer_str.startswith(prefix):
+                answer_str = answer_str[len(prefix) :].strip()
+
+    answer_str = answer_str.replace("t.s.", "t. s.")
+    answer_str = answer_str.replace("j.j.", "j. j.")
+    if answer_str.lstrip().startswith(TITLE_PREFIXES):
+        answer_str = answer_str.removeprefix("mr. ").strip()
+        answer_str = answer_str.removeprefix("sir. ").strip()
+        answer_str = answer_str.removeprefix("mr ").strip()
+        answer_str = answer_str.removeprefix("sir ").strip()
+        answer_str = answer_str.removeprefix("lord ").strip()
+    else:
+        answer_str = answer_str.strip()
+
+    # Remove parenthetical explanations (e.g., "Cardinal (Northern Cardinal)" -> "Cardinal")
+    if "(" in answer_str:
+        answer_str = PARENTHETICAL_RE.sub("", answer_str).strip()
+
+    if "and " in answer_str:
+        answer_str = answer_str.replace("and ", "").strip()
+
+    # Remove hyphens, commas, periods, apostrophes and backticks (Hawaiian ʻokina after unidecode)
+    answer_str = answer_str.translate(DROPPED_PUNCTUATION).strip()
+
+    # some overkill here
+    if answer_str and (
+        answer_str[0] in ".,!?;:[" or answer_str[-1] in ".,!?;:]" or answer_str.startswith("the ")
+    ):
+        answer_str = answer_str.strip(".,!?;:").strip()
+        answer_str = answer_str.removeprefix("the ").strip()
+        answer_str = answer_str.removeprefix("[").removesuffix("]").strip()
+        answer_str = answer_str.strip(".,!?;:").strip()
+        answer_str = answer_str.removeprefix("the ").strip()
+
+    if answer_str.startswith(REGION_PREFIXES):
+        answer_str = answer_str.removeprefix("northern").strip()
+        answer_str = answer_str.removeprefix("western").strip()
+        answer_str = answer_str.removeprefix("eastern").strip()
+        answer_str = answer_str.removeprefix("southern").strip()
+        answer_str = answer_str.removeprefix("american").strip()
+
+    if (not skip_middle_name_normalization) and (answer_str not in NORMALIZED_NON_NAME_SET):
+        # Remove middle names from person names (conservative, only affects 3+ word names)
+        answer_str = remove_middle_names(answer_str)
+
+    return answer_str
+
+
+NORMALIZED_NON_NAME_SET = set(
+    normalize_answer(x, skip_middle_name_normalization=True)
+    for x in [*US_STATE_MOTTOS.values(), *US_STATE_FLOWERS.values()]
+)
+
+
+# ANSWER_ALIASES merged over mappings, for gold answers whose mapping_id isn't known
+ANSWER_ALIASES_BY_VALUE = {}
+for _aliases in ANSWER_ALIASES.values():
+    for _value, _spellings in _aliases.items():
+        ANSWER_ALIASES_BY_VALUE.setdefault(_value, []).extend(_spellings)
+
+
+@lru_cache(maxsize=None)
+def accepted_answers(correct, mapping_id: Optional[str] = None) -> frozenset:
+    """
+    Normalized forms accepted for a gold answer: the answer itself plus its ANSWER_ALIASES entries (under
+    mapping_id, or under any mapping if it is None). generate_dataset.py stores these in each problem as
+    "answer_aliases"; this is the fallback for datasets generated before that.
+    """
+    if mapping_id is None:
+        spellings = ANSWER_ALIASES_BY_VALUE.get(correct, [])
+    else:
+        spellings = ANSWER_ALIASES.get(mapping_id, {}).get(correct, [])
+    return frozenset(normalize_answer(str(answer)) for answer in [correct, *spellings])
+
+
+def chain_accepted_answers(correct, chain) -> frozenset:
+    """accepted_answers for a gold answer under the mapping of its chain's last step."""
+    return accepted_answers(correct, chain[-1].get("mapping_id") if chain else None)
+
+
+def problem_aliases(problem):
+    """
+    The accepted answers to score a problem against: its stored "answer_aliases" if they were normalized by
+    the current normalizer_version, else recomputed with chain_accepted_answers (what rescore_results.py
+    uses), so a dataset generated before a normalizer change can't reject correct predictions.
+    """
+    aliases = problem.get("answer_aliases")
+    if aliases is not None and problem.get("normalizer_version") == normalizer_version():
+        return aliases
+    return chain_accepted_answers(problem["answer"], problem.get("chain"))
+
+
+def check_answer(predicted: str, correct, aliases=None) -> bool:
+    """
+    Check if predicted answer matches correct answer.
+
+    aliases is the problem's precomputed "answer_aliases" (normalized accepted answers), if it has them.
+    """
+    pred_norm = normalize_answer(str(predicted))
+    if aliases is None:
+        aliases = accepted_answers(correct)
+
+    # Direct match (includes middle name removal since it's in normalize_answer)
+    if pred_norm in aliases:
+        return True
+
+    # For numeric answers, try parsing
+    try:
+        pred_num = int(pred_norm)
+        correct_num = int(correct)
+        if pred_num == correct_num:
+            return True
+    except ValueError:
+        pass
+
+    return False
+
+    # # Check if correct answer is contained in prediction (for names)
+    # if correct_norm in pred_norm:
+    #     return True
+
+    # # Check if prediction is contained in correct (handles partial matches)
+    # if pred_norm in correct_norm and len(pred_norm) > 3:
+    #     return True
+
+    # return False
+
+
+def score_answers(predictions, corrects, aliases=None):
+    """
+    check_answer over parallel sequences, returned as a NumPy bool array.
+
+    Sweeps repeat the same (prediction, gold) pairs many times, so each distinct pair is scored once (and
+    normalize_answer's memo normalizes each distinct string once). aliases holds each gold answer's
+    accepted answers as a frozenset (see problem_aliases) or None; without it every gold answer uses
+    accepted_answers.
+    """
+    import numpy as np
+
+    columns = [map(str, predictions), corrects] if aliases is None else [map(str, predictions), corrects, aliases]
+    pairs = list(zip(*columns))
+    verdicts = {pair: check_answer(*pair) for pair in dict.fromkeys(pairs)}
+    return np.fromiter((verdicts[pair] for pair in pairs), dtype=bool, count=len(pairs))
+
+
+@lru_cache(maxsize=None)
+def normalizer_version() -> str:
+    """
+    Short hash of the answer scorer: the scoring functions' source and the tables they use. Saved in each
+    results summary, so rescore_results.py only re-processes files scored by an older version.
+    """
+    source = "".join(
+        inspect.getsource(fn) for fn in [remove_middle_names, normalize_answer, accepted_answers, check_answer]
+    )
+    tables = json.dumps(
+        [
+            ANSWER_ALIASES,
+            ANSWER_PREFIXES,
+            TITLE_PREFIXES,
+            REGION_PREFIXES,
+            PARENTHETICAL_RE.pattern,
+            sorted(DROPPED_PUNCTUATION),
+            sorted(NORMALIZED_NON_NAME_SET),
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256((source + tables).encode()).hexdigest()[:12]
+
+
+# Markers of results for problems that were never sent and so have no verdict. run_evaluation drops them
+# (the summary only counts them), and no total, accuracy or estimate includes them.
+SKIP_MARKERS = ("skipped_early_stop", "skipped_spend_cap", "skipped_offline")
+
+
+def was_skipped(result) -> bool:
+    return any(result.get(marker) for marker in SKIP_MARKERS)
+
+
+def compute_hop_stats(results):
+    """{hops: {"total", "correct"}} over results (skipped ones excluded)."""
+    hop_stats = {}
+    for r in results:
+        if was_skipped(r):
+            continue
+        hop = r.get("hops", "unknown")
+        if hop not in hop_stats:
+            hop_stats[hop] = {"total": 0, "correct": 0}
+        hop_stats[hop]["total"] += 1
+        if r["is_correct"]:
+            hop_stats[hop]["correct"] += 1
+    return hop_stats
+
+
+def compute_stratified_stats(results, stratum_sizes, allocation, hop_stats):
+    """Population-weighted estimates (overall and per hop level) for a stratified sample."""
+    stratum_counts = {k: {"total": 0, "correct": 0} for k in stratum_sizes}
+    for r in results:
+        if was_skipped(r):
+            continue
+        counts = stratum_counts[stratum_key(r)]
+        counts["total"] += 1
+        if r["is_correct"]:
+            counts["correct"] += 1
+    return {
+        "allocation": allocation,
+        "strata": {k: {"population": stratum_sizes[k], **stratum_counts[k]} for k in sorted(stratum_sizes)},
+        "overall": stratified_estimate(stratum_counts, stratum_sizes),
+        "by_hop": {
+            str(hop): stratified_estimate(
+                {k: c for k, c in stratum_counts.items() if k.startswith(f"{hop}hop/")},
+                {k: n for k, n in stratum_sizes.items() if k.startswith(f"{hop}hop/")},
+            )
+            for hop in hop_stats
+        },
+    }
+
+
+# Addition problems (eval_addition.py)
+
+def normalize_addition_answer(answer_str: str) -> Optional[int]:
+    """
+    Normalize an addition answer for comparison.
+    Remove common prefixes, strip, and try to parse as int.
+    Returns None if doesn't parse as int.
+    """
+    answer_str = answer_str.strip().lower()
+
+    # Remove common prefixes
+    for prefix in ["answer:", "the answer is", "it is", "it's", "=", "equals"]:
+        if answer_str.startswith(prefix):
+            answer_str = answer_str[len(prefix):].strip()
+
+    # Remove trailing punctuation
+    answer_str = answer_str.strip(".,!?;:")
+
+    # Remove any remaining whitespace
+    answer_str = answer_str.strip()
+
+    # Try to extract a number from the string
+    # First try direct parsing
+    try:
+        return int(answer_str)
+    except ValueError:
+        pass
+
+    # Try to find a number in the string
+    match = re.search(r'^-?\d+', answer_str)
+    if match:
+        try:
+            return int(match.group())
+        except ValueError:
+            pass
+
+    return None
+
+
+def check_addition_answer(predicted: str, correct: int) -> bool:
+    """Check if predicted answer matches correct answer of an addition problem."""
+    pred_norm = normalize_addition_answer(str(predicted))
+
+    if pred_norm is None:
+        return False
+
+    return pred_norm == correct
+
+
+# Largest magnitude a parsed prediction may have; anything bigger counts as unparsed (no gold sum comes
+# close), so parsed predictions always fit the int64 columns of the .npz export
+INT64_MAX = 2**63 - 1
+
+
+def parse_prediction(predicted) -> Optional[int]:
+    """normalize_addition_answer, or None if the number doesn't fit in int64."""
+    value = normalize_addition_answer(str(predicted))
+    if value is None or not -INT64_MAX <= value <= INT64_MAX:
+        return None
+    return value
+
+
+def parse_answers(predictions):
+    """
+    parse_prediction over a sequence, each distinct string parsed once. Returns (values, parsed) NumPy
+    arrays: int64 values, and a bool mask that is False where nothing parsed; values there are 0.
+    """
+    import numpy as np
+
+    parsed_by_string = {}
+    values = np.zeros(len(predictions), dtype=np.int64)
+    parsed = np.zeros(len(predictions), dtype=bool)
+    for i, predicted in enumerate(predictions):
+        predicted = str(predicted)
+        if predicted not in parsed_by_string:
+            parsed_by_string[predicted] = parse_prediction(predicted)
+        value = parsed_by_string[predicted]
+        if value is not None:
+            values[i] = value
+            parsed[i] = True
+    return values, parsed
+
+
+def score_addition_answers(predictions, corrects):
+    """check_addition_answer over parallel sequences, returned as a NumPy bool array."""
+    import numpy as np
+
+    values, parsed = parse_answers(predictions)
+    return parsed & (values == np.asarray(corrects, dtype=np.int64))
+
+
+def result_columns(results):
+    """
+    Columnar NumPy view of eval_addition.py results, for vectorized analysis: problem_index, num_addends (-1 if
+    unknown), correct_answer, is_correct, cached, errored, parse_failed, and parsed_answer and signed_error
+    (both 0 where parse_failed). Results saved before parsed_answer was recorded are parsed here.
+    """
+    import numpy as np
+
+    if all("parse_failed" in r for r in results):
+        parse_failed = np.array([r["parse_failed"] for r in results], dtype=bool)
+        parsed_answer = np.array([r["parsed_answer"] or 0 for r in results], dtype=np.int64)
+    else:
+        parsed_answer, parsed = parse_answers([r.get("predicted_answer") or "" for r in results])
+        parse_failed = ~parsed
+    correct_answer = np.array([r["correct_answer"] for r in results], dtype=np.int64)
+    return {
+        "problem_index": np.array([r["problem_index"] for r in results], dtype=np.int64),
+        "num_addends": np.array(
+            [r["num_addends"] if isinstance(r.get("num_addends"), int) else -1 for r in results], dtype=np.int64
+        ),
+        "correct_answer": correct_answer,
+        "is_correct": np.array([r["is_correct"] for r in results], dtype=bool),
+        "cached": np.array([r.get("cached", False) for r in results], dtype=bool),
+        "errored": np.array(["error" in r for r in results], dtype=bool),
+        "parse_failed": parse_failed,
+        "parsed_answer": parsed_answer,
+        "signed_error": np.where(parse_failed, 0, parsed_answer - correct_answer),
+    }
@@ -0,0 +1,314 @@
+"""
+Multi-process sharding for very high concurrency (--workers): each worker process runs its own event loop
+(optionally uvloop) over one shard of the problems and reports back to the parent over a queue.
+
+The parent is the only process that writes the response cache; workers read from their own copy of it
+and forward new entries. A SharedRateBudget limits request starts per second across all processes, and
+workers reserve --max-spend budget from the parent's SpendCap (see ParentSpendCap) and forward request
+telemetry to the parent's Telemetry (see ForwardedTelemetry). The eval-specific
+modules are imported inside run_shard_worker and evaluate_sharded, so dataset generation (which only
+needs MP_CONTEXT) doesn't load API keys or register the response cache's exit handlers.
+"""
+
+import asyncio
+import importlib
+import itertools
+import multiprocessing
+import queue as queue_module
+import threading
+import time
+
+# Spawn (not fork) so workers don't inherit the parent's running event loop or open HTTP connections
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def shard(items, num_shards):
+    """Deterministic round-robin split, so every shard gets a similar mix of hops and types."""
+    return [items[i::num_shards] for i in range(num_shards)]
+
+
+def install_uvloop():
+    """Use uvloop's event loop for subsequent asyncio.run calls if it is installed; returns whether it was."""
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+class SharedRateBudget:
+    """
+    At most `rate` request starts per second in total, shared by every process it is passed to.
+    Each acquire() claims the next free start slot (1/rate seconds after the previous one) and sleeps
+    until it; time.monotonic is system-wide, so slots are comparable across processes.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = MP_CONTEXT.Lock()
+        self._next_slot = MP_CONTEXT.Value("d", 0.0, lock=False)
+
+    async def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.value)
+            self._next_slot.value = slot + 1 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class WorkerFailed(Exception):
+    pass
+
+
+def _drain(message_queue, timeout=0.5):
+    """Block for one message (up to timeout), then take whatever else is already queued."""
+    try:
+        messages = [message_queue.get(timeout=timeout)]
+    except queue_module.Empty:
+        return []
+    while True:
+        try:
+            messages.append(message_queue.get_nowait())
+        except queue_module.Empty:
+            return messages
+
+
+async def run_worker_processes(target, worker_args, on_message):
+    """
+    Start one process per entry of worker_args running target(worker_id, message_queue, *args).
+
+    Workers put (kind, worker_id, payload) tuples on the queue. "done" and "error" end a worker; every other
+    message is awaited as on_message(kind, worker_id, payload) on the parent's event loop. Returns the "done"
+    payloads indexed by worker_id, or raises WorkerFailed (after stopping the rest) if any worker fails.
+    """
+    message_queue = MP_CONTEXT.Queue()
+    processes = [
+        MP_CONTEXT.Process(target=target, args=(worker_id, message_queue, *args), daemon=True)
+        for worker_id, args in enumerate(worker_args)
+    ]
+    for process in processes:
+        process.start()
+
+    loop = asyncio.get_running_loop()
+    done = {}
+    try:
+        while len(done) < len(processes):
+            messages = await loop.run_in_executor(None, _drain, message_queue)
+            for kind, worker_id, payload in messages:
+                if kind == "done":
+                    done[worker_id] = payload
+                elif kind == "error":
+                    raise WorkerFailed(f"Worker {worker_id} failed:\n{payload}")
+                else:
+                    await on_message(kind, worker_id, payload)
+            if not messages:
+                for worker_id, process in enumerate(processes):
+                    if worker_id not in done and not process.is_alive():
+                        raise WorkerFailed(f"Worker {worker_id} exited with code {process.exitcode} before finishing")
+    finally:
+        for process in processes:
+            if process.is_alive() and len(done) < len(processes):
+                process.terminate()
+            process.join()
+    return [done[worker_id] for worker_id in range(len(processes))]
+
+
+class ParentSpendCap:
+    """
+    SpendCap of a --workers process. Each reservation is a ("reserve", worker_id, (request_id, estimate))
+    message to the parent, whose SpendCap sees the spend and in-flight requests of every process; the
+    parent answers (request_id, reserved amount or None) on reply_queue. Releases report the worker's
+    cost so far, so the parent counts it before the worker's cost tracker is merged at the end.
+    Skips are counted by the parent's SpendCap.
+    """
+
+    def __init__(self, worker_id, message_queue, reply_queue, max_spend, tracker):
+        self.worker_id = worker_id
+        self.message_queue = message_queue
+        self.reply_queue = reply_queue
+        self.max_spend = max_spend
+        self.tracker = tracker
+        self._request_ids = itertools.count()
+        self._pending = {}
+        self._reader = None
+
+    def _read_replies(self, loop):
+        while True:
+            request_id, reserved = self.reply_queue.get()
+            loop.call_soon_threadsafe(self._resolve, request_id, reserved)
+
+    def _resolve(self, request_id, reserved):
+        self._pending.pop(request_id).set_result(reserved)
+
+    async def reserve(self, tracker, estimate_fn):
+        if self.max_spend is None:
+            return 0.0
+        loop = asyncio.get_running_loop()
+        if self._reader is None:
+            self._reader = threading.Thread(target=self._read_replies, args=(loop,), daemon=True)
+            self._reader.start()
+        request_id = next(self._request_ids)
+        future = self._pending[request_id] = loop.create_future()
+        self.message_queue.put(("reserve", self.worker_id, (request_id, estimate_fn())))
+        return await future
+
+    async def release(self, estimate):
+        if self.max_spend is None:
+            return
+        self.message_queue.put(("release", self.worker_id, (estimate, self.tracker["cost_usd"])))
+
+
+class ForwardedTelemetry:
+    """
+    Telemetry of a --workers process: request starts, finishes and rate limits become ("telemetry",
+    worker_id, method name) messages, replayed on the parent's Telemetry so its in-flight and 429 counts
+    cover every process. Finished problems reach the parent as results already.
+    """
+
+    def __init__(self, worker_id, message_queue):
+        self.worker_id = worker_id
+        self.message_queue = message_queue
+
+    def request_started(self):
+        self.message_queue.put(("telemetry", self.worker_id, "request_started"))
+
+    def request_finished(self):
+        self.message_queue.put(("telemetry", self.worker_id, "request_finished"))
+
+    def record_rate_limit(self):
+        self.message_queue.put(("telemetry", self.worker_id, "record_rate_limit"))
+
+
+def run_shard_worker(
+    worker_id,
+    message_queue,
+    reply_queue,
+    module_name,
+    shard_problems,
+    problem_args,
+    problem_kwargs,
+    concurrency,
+    max_spend,
+    rate_budget,
+    base_url,
+    cache_file,
+    cache_entries,
+    use_uvloop,
+    offline,
+    forward_telemetry,
+):
+    """
+    Entry point of a --workers process: evaluate one shard with the evaluate_problem of the eval script
+    module_name on its own event loop, reporting to the parent. The response cache starts from cache_entries
+    if given (the parent's in-memory cache under --base-url), otherwise from cache_file.
+    """
+    try:
+        import clients
+        from response_cache import WorkerResponseCache
+
+        # The globals evaluate_problem sees: a script run as __main__ is re-run here as __mp_main__, a module
+        # that only holds a copy of the namespace its functions were defined in
+        harness = importlib.import_module(module_name).evaluate_problem.__globals__
+        if base_url:
+            clients.use_base_url(base_url)
+        clients.OFFLINE = offline
+        if use_uvloop:
+            install_uvloop()
+        harness["SPEND_CAP"] = ParentSpendCap(worker_id, message_queue, reply_queue, max_spend, harness["COST_TRACKER"])
+        harness["RATE_BUDGET"] = rate_budget
+        if forward_telemetry:
+            harness["TELEMETRY"] = ForwardedTelemetry(worker_id, message_queue)
+        if cache_entries is None:
+            cache_entries = clients.open_response_cache(cache_file).cache
+        clients.response_cache = WorkerResponseCache(
+            cache_entries,
+            lambda key, data: message_queue.put(("cache", worker_id, (key, data))),
+        )
+
+        async def evaluate_shard():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def run_one(problem_idx, problem):
+                result = await harness["evaluate_problem"](
+                    problem, problem_idx, semaphore, *problem_args, **problem_kwargs
+                )
+                message_queue.put(("result", worker_id, result))
+
+            await asyncio.gather(*[run_one(idx, p) for idx, p in shard_problems])
+
+        asyncio.run(evaluate_shard())
+        message_queue.put(("done", worker_id, {"cost_tracker": harness["COST_TRACKER"]}))
+    except BaseException:
+        import traceback
+
+        message_queue.put(("error", worker_id, traceback.format_exc()))
+
+
+async def evaluate_sharded(harness, problems, workers, concurrency, problem_args, problem_kwargs, use_uvloop):
+    """
+    Evaluate problems in `workers` processes (round-robin shards) with harness.evaluate_problem, where harness
+    is the eval script's module (its COST_TRACKER, SPEND_CAP, TELEMETRY and RATE_BUDGET are used too).
+    Concurrency is split evenly between the workers, which reserve --max-spend budget from harness.SPEND_CAP.
+    This process stays the only writer of the response cache and merges their results and cost.
+    Returns results in arrival order.
+    """
+    import clients
+    from scoring import was_skipped
+
+    results = []
+    worker_concurrency = -(-concurrency // workers)
+    spend_cap = harness.SPEND_CAP
+    reply_queues = [MP_CONTEXT.Queue() for _ in range(workers)]
+    grants = set()
+
+    async def grant(worker_id, request_id, estimate):
+        reserved = await spend_cap.reserve(harness.COST_TRACKER, lambda: estimate)
+        reply_queues[worker_id].put((request_id, reserved))
+
+    async def on_message(kind, worker_id, payload):
+        if kind == "result":
+            results.append(payload)
+            if was_skipped(payload):
+                harness.TELEMETRY.total -= 1
+            else:
+                harness.TELEMETRY.problem_done(payload)
+        elif kind == "cache":
+            await clients.response_cache.set_hashed(*payload)
+        elif kind == "reserve":
+            # In a task: a reservation may wait for releases, which arrive as later messages
+            task = asyncio.create_task(grant(worker_id, *payload))
+            grants.add(task)
+            task.add_done_callback(grants.discard)
+        elif kind == "release":
+            estimate, worker_cost = payload
+            spend_cap.worker_spend[worker_id] = worker_cost
+            await spend_cap.release(estimate)
+        elif kind == "telemetry":
+            getattr(harness.TELEMETRY, payload)()
+
+    # Workers load the cache file themselves, so flush what this process has added (e.g. the warm-up);
+    # an in-memory cache (--base-url) has no file, so its entries are sent to them instead
+    await clients.response_cache.save_cache(force=True)
+    cache_file = clients.response_cache.cache_file
+    worker_settings = (
+        worker_concurrency,
+        spend_cap.max_spend,
+        harness.RATE_BUDGET,
+        clients.BASE_URL,
+        cache_file,
+        clients.response_cache.cache if cache_file is None else None,
+        use_uvloop,
+        clients.OFFLINE,
+        harness.TELEMETRY.enabled,
+    )
+    worker_args = [
+        (reply_queue, harness.__name__, shard_problems, problem_args, problem_kwargs, *worker_settings)
+        for reply_queue, shard_problems in zip(reply_queues, shard(problems, workers))
+    ]
+    for summary in await run_worker_processes(run_shard_worker, worker_args, on_message):
+        for key, value in summary["cost_tracker"].items():
+            harness.COST_TRACKER[key] += value
+    spend_cap.worker_spend.clear()
+    return results
@@ -0,0 +1,176 @@
+"""
+Live progress and telemetry for long evaluation runs.
+
+While a run is going, Telemetry periodically writes:
+- a JSON status file (completion, throughput, in-flight requests, 429 rate, cache hit ratio, spend, ETA)
+- a Prometheus text-format file for node_exporter's textfile collector
+- a single-line progress display on stdout
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+
+# Throughput and 429 rate are computed over this trailing window
+RATE_WINDOW_S = 60.0
+
+
+def write_atomic(path, text):
+    """Write via a temp file and rename, so readers (e.g. node_exporter) never see a partial file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "--"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class Telemetry:
+    """Counters updated by evaluate_problem/run_evaluation, plus a periodic emitter (see run())."""
+
+    def __init__(self):
+        self.configure(total=0)
+
+    def configure(
+        self,
+        total,
+        labels=None,
+        cost_tracker=None,
+        status_file=None,
+        prometheus_file=None,
+        progress=False,
+        interval=2.0,
+    ):
+        self.total = total
+        self.labels = labels or {}
+        self.cost_tracker = cost_tracker
+        self.status_file = status_file
+        self.prometheus_file = prometheus_file
+        self.progress = progress
+        self.interval = interval
+
+        self.start_time = time.monotonic()
+        self.completed = 0
+        self.correct = 0
+        self.cached = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.completion_times = deque()
+        self.rate_limit_times = deque()
+
+    @property
+    def enabled(self):
+        return bool(self.status_file or self.prometheus_file or self.progress)
+
+    def request_started(self):
+        self.in_flight += 1
+        self.requests += 1
+
+    def request_finished(self):
+        self.in_flight -= 1
+
+    def record_rate_limit(self):
+        self.rate_limited += 1
+        self.rate_limit_times.append(time.monotonic())
+
+    def problem_done(self, result):
+        self.completed += 1
+        self.correct += bool(result.get("is_correct"))
+        self.cached += bool(result.get("cached"))
+        self.errors += "error" in result
+        self.completion_times.append(time.monotonic())
+
+    def snapshot(self):
+        now = time.monotonic()
+        for times in (self.completion_times, self.rate_limit_times):
+            while times and now - times[0] > RATE_WINDOW_S:
+                times.popleft()
+        elapsed = now - self.start_time
+        window = min(elapsed, RATE_WINDOW_S) or 1e-9
+        throughput = len(self.completion_times) / window
+        remaining = max(self.total - self.completed, 0)
+        return {
+            **self.labels,
+            "timestamp": time.time(),
+            "elapsed_s": elapsed,
+            "total": self.total,
+            "completed": self.completed,
+            "correct": self.correct,
+            "errors": self.errors,
+            "accuracy": self.correct / self.completed if self.completed else None,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "throughput_per_s": throughput,
+            "rate_limited": self.rate_limited,
+            "rate_limited_per_min": len(self.rate_limit_times) * 60 / window,
+            "cache_hit_ratio": self.cached / self.completed if self.completed else None,
+            "spend_usd": self.cost_tracker["cost_usd"] if self.cost_tracker else None,
+            "eta_s": remaining / throughput if throughput > 0 else None,
+        }
+
+    def prometheus_text(self, snap):
+        labels = ",".join(f'{k}="{v}"' for k, v in self.labels.items())
+        metrics = [
+            ("problems_in_run", "gauge", "Problems in this run", snap["total"]),
+            ("problems_completed", "gauge", "Problems completed so far", snap["completed"]),
+            ("problems_correct", "gauge", "Problems answered correctly so far", snap["correct"]),
+            ("problems_errors", "gauge", "Problems that ended in an error", snap["errors"]),
+            ("requests_in_flight", "gauge", "API requests currently in flight", snap["in_flight"]),
+            ("requests_total", "counter", "API requests started", snap["requests"]),
+            ("rate_limited_total", "counter", "Rate-limited (429) responses", snap["rate_limited"]),
+            ("throughput_per_second", "gauge", "Problems completed per second (trailing minute)", snap["throughput_per_s"]),
+            ("cache_hit_ratio", "gauge", "Fraction of completed problems served from the response cache", snap["cache_hit_ratio"]),
+            ("spend_usd", "gauge", "Estimated API spend so far in USD", snap["spend_usd"]),
+            ("eta_seconds", "gauge", "Estimated seconds until the run completes", snap["eta_s"]),
+        ]
+        lines = []
+        for name, metric_type, help_text, value in metrics:
+            if value is None:
+                continue
+            lines.append(f"# HELP llm_eval_{name} {help_text}")
+            lines.append(f"# TYPE llm_eval_{name} {metric_type}")
+            lines.append(f"llm_eval_{name}{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def progress_line(self, snap):
+        pct = snap["completed"] / snap["total"] if snap["total"] else 0
+        line = (
+            f"[{snap['completed']:>{len(str(snap['total']))}}/{snap['total']} {pct:>4.0%}] "
+            f"{snap['throughput_per_s']:.1f}/s  in-flight {snap['in_flight']}  "
+            f"429s {snap['rate_limited_per_min']:.1f}/min"
+        )
+        if snap["cache_hit_ratio"] is not None:
+            line += f"  cache {snap['cache_hit_ratio']:.0%}"
+        if snap["spend_usd"] is not None:
+            line += f"  ${snap['spend_usd']:.2f}"
+        line += f"  ETA {format_duration(snap['eta_s'])}"
+        return line
+
+    def emit(self, final=False):
+        snap = self.snapshot()
+        if self.status_file:
+            write_atomic(self.status_file, json.dumps(snap, indent=2))
+        if self.prometheus_file:
+            write_atomic(self.prometheus_file, self.prometheus_text(snap))
+        if self.progress:
+            sys.stdout.write("\r\033[K" + self.progress_line(snap) + ("\n" if final else ""))
+            sys.stdout.flush()
+
+    async def run(self):
+        """Emit every interval until cancelled."""
+        while True:
+            self.emit()
+            await asyncio.sleep(self.interval)
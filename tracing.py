@@ -0,0 +1,83 @@
+"""
+Chrome trace-event recording for evaluation runs (load the output in Perfetto or chrome://tracing).
+
+Spans are complete ("X") events. Each problem gets its own track (tid = problem index + 1), so
+concurrency gaps and retry storms are visible; track 0 holds run-level spans such as cache flushes.
+Tracing is off unless TRACER.enable() is called, and then span()/begin() are near no-ops.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+
+RUN_TRACK = 0
+
+
+def problem_track(problem_index):
+    return problem_index + 1
+
+
+class Tracer:
+    def __init__(self):
+        self.events = None
+        self.named_tracks = set()
+
+    @property
+    def enabled(self):
+        return self.events is not None
+
+    def enable(self):
+        self.events = []
+        self.named_tracks = set()
+        self.name_track(RUN_TRACK, "run")
+
+    def name_track(self, track, name):
+        if self.events is None or track in self.named_tracks:
+            return
+        self.named_tracks.add(track)
+        self.events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": track, "args": {"name": name}})
+
+    def begin(self, name, track=RUN_TRACK, **args):
+        """Start a span; pass the returned token to end(). Returns None when tracing is off."""
+        if self.events is None:
+            return None
+        return {"name": name, "tid": track, "start": time.perf_counter_ns(), "args": args}
+
+    def end(self, token, **args):
+        """Finish a span started with begin(), adding any extra args (e.g. outcome)."""
+        if token is None or self.events is None or token.get("done"):
+            return
+        token["done"] = True
+        now = time.perf_counter_ns()
+        self.events.append(
+            {
+                "name": token["name"],
+                "ph": "X",
+                "pid": 1,
+                "tid": token["tid"],
+                "ts": token["start"] / 1000,
+                "dur": (now - token["start"]) / 1000,
+                "args": {**token["args"], **args},
+            }
+        )
+
+    @contextmanager
+    def span(self, name, track=RUN_TRACK, **args):
+        """Record the enclosed block as a span; an exception is recorded as the span's "error" arg."""
+        token = self.begin(name, track, **args)
+        try:
+            yield
+        except BaseException as e:
+            self.end(token, error=type(e).__name__)
+            raise
+        self.end(token)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events or [], "displayTimeUnit": "ms"}, f)
+
+
+# Shared by the eval scripts and response_cache
+TRACER = Tracer()